@@ -0,0 +1,473 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessArchive is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# A binary file of Chess 2 games, about one byte per ply, small enough to
+# hold a whole archive in memory and read without parsing any text.
+#
+# The file starts with "C2GB" and its version, then one record per game:
+#   the header     armies, stones and result, see GAME_HEADER, and the FEN
+#                  the game started from if it didn't start from the usual
+#                  position of its armies
+#   the plies      one byte per ply: the index of the move in the sorted
+#                  moves of the player to move (see moveOptions), or
+#                  PLY_WHIRLWIND, PLY_SKIP (the Warrior King skipped its second
+#                  move) or PLY_EXTENDED and a 2 byte index
+#   side records   what the plies leave out: duel bids, called bluffs,
+#                  promotions and the square of a whirlwind, each as the
+#                  number of plies since the last record, its kind and its value
+#
+#   python ChessArchive.py games.pgn games.c2b       # PGN to binary
+#   python ChessArchive.py games.c2b games.pgn       # binary to PGN
+#   python ChessArchive.py games.c2b --replay        # size, and decoding and replay speed
+
+import argparse
+import struct
+import sys
+import time
+from collections import namedtuple
+from ChessBoard import ChessBoard
+from ChessIndex import RESULTS
+from ChessPGN import PGNWriter, boardTags, gameArmies, gameBoard, readGames, replayText
+
+ARCHIVE_HEADER = struct.Struct("<4sH")
+ARCHIVE_MAGIC = b"C2GB"
+ARCHIVE_VERSION = 1
+
+# white army, black army, white stones, black stones, result (see RESULTS),
+# flags, bytes of plies, bytes of side records
+GAME_HEADER = struct.Struct("<BBBBBBII")
+# the game has a FEN, its length (2 bytes) and text follow the header
+FLAG_FEN = 1
+FEN_LENGTH = struct.Struct("<H")
+
+# the bytes of the plies that aren't move indices
+PLY_EXTENDED = 0xFD
+PLY_WHIRLWIND = 0xFE
+PLY_SKIP = 0xFF
+EXTENDED_INDEX = struct.Struct("<H")
+
+# the plies of a decoded game that aren't move indices
+WHIRLWIND = -1
+SKIP = -2
+
+# the kinds of side records and their values
+SIDE_DUEL = 0           # white bid * 3 + black bid
+SIDE_BLUFF = 1          # 0 for "+", 1 for "-"
+SIDE_PROMOTION = 2      # 0-3 for QRNB
+SIDE_WHIRLWIND = 3      # y * 8 + x of the Warrior King
+
+PROMOTIONS = "QRNB"
+BLUFFS = "+-"
+
+# A game of an archive: its armies, (white, black) stones at the start, its
+# result ("1-0", ...), the FEN it started from ("" for the usual position),
+# its plies (move indices, WHIRLWIND or SKIP) and its side records as
+# (ply, kind, value)
+BinaryGame = namedtuple('BinaryGame', 'white black stones result fen plies sides')
+
+
+def moveOptions(board):
+    """
+    Returns the moves of the player to move that a ply indexes, as sorted
+    (fromPos, toPos, special). The moves are pseudo legal, the king guard is
+    only checked when a move is made, see ChessBoard.getMoves.
+    """
+    return sorted(set((fromPos, toPos, special) for fromPos, toPos, special, duel in board.getMoves(legal=False)))
+
+
+def encodeVarint(value):
+    # value in 7 bit groups, the low ones first
+    data = bytearray()
+    while value > 0x7F:
+        data.append(0x80 | (value & 0x7F))
+        value >>= 7
+    data.append(value)
+    return data
+
+
+def decodeVarint(data, offset):
+    # (value, offset after it) of a varint of encodeVarint
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def startBoard(game):
+    """
+    Returns a new ChessBoard in the position a BinaryGame starts from.
+    """
+    board = ChessBoard(game.white, game.black)
+    if game.fen:
+        board.setFEN(game.fen)
+    elif game.stones != (board._white_stones, board._black_stones):
+        board.setPosition(ChessBoard.parseFEN(board.getFEN())._replace(stones=game.stones))
+    return board
+
+
+def encodeGame(game):
+    """
+    Returns the archive record of a PGNGame. Every move is played on a
+    ChessBoard to find its index, a ValueError is raised at an illegal one,
+    or if the White or Black tag isn't an army.
+    """
+    white, black = gameArmies(game)
+    board = gameBoard(game)
+    fen = game.tags.get("FEN", "")
+    stones = (board._white_stones, board._black_stones)
+    result = game.result
+    if result == "*":
+        result = game.tags.get("Result", "*")
+    if result not in RESULTS:
+        result = "*"
+
+    plies = bytearray()
+    sides = bytearray()
+    # the plies so far, counting a PLY_EXTENDED and its index as one
+    plies_done = []
+    # the ply of the last side record
+    last = 0
+
+    def side(kind, value):
+        sides.extend(encodeVarint(len(plies_done) - last))
+        sides.append(kind)
+        sides.append(value)
+        return len(plies_done)
+
+    for move in game.moves:
+        if board._secondTurn and not move.secondTurn:
+            board.skipSecondTurn()
+            plies.append(PLY_SKIP)
+            plies_done.append(SKIP)
+        options = moveOptions(board)
+        if not board.replay([replayText(move)], trusted=False):
+            raise ValueError("illegal move {}. {}: {}".format(
+                move.number, move.text, board.move_reason_list[board.getReason()]))
+        made = board._moves[-1]
+        fromPos, toPos = tuple(made[1]), tuple(made[2])
+        if fromPos == toPos:
+            last = side(SIDE_WHIRLWIND, toPos[1] * 8 + toPos[0])
+            plies.append(PLY_WHIRLWIND)
+            plies_done.append(WHIRLWIND)
+            continue
+        index = [(o[0], o[1]) for o in options].index((fromPos, toPos))
+        if made[6]:
+            last = side(SIDE_PROMOTION, PROMOTIONS.index(board.formatPieceNames(made[6]).upper()))
+        if made[4]:
+            last = side(SIDE_DUEL, made[4][0] * 3 + made[4][1])
+            if made[5]:
+                last = side(SIDE_BLUFF, BLUFFS.index(made[5]))
+        if index < PLY_EXTENDED:
+            plies.append(index)
+        else:
+            plies.append(PLY_EXTENDED)
+            plies.extend(EXTENDED_INDEX.pack(index))
+        plies_done.append(index)
+
+    flags = 0
+    record = bytearray()
+    if fen:
+        flags |= FLAG_FEN
+        fen = fen.encode("ascii")
+        record.extend(FEN_LENGTH.pack(len(fen)))
+        record.extend(fen)
+    header = GAME_HEADER.pack(white, black, stones[0], stones[1], RESULTS.index(result), flags, len(plies), len(sides))
+    return bytes(header + record + plies + sides)
+
+
+def decodePlies(data):
+    """
+    Returns the plies of the bytes of a game: move indices, WHIRLWIND and SKIP.
+    """
+    if PLY_EXTENDED not in data and PLY_WHIRLWIND not in data and PLY_SKIP not in data:
+        return list(data)
+    plies = []
+    n = 0
+    while n < len(data):
+        byte = data[n]
+        n += 1
+        if byte == PLY_EXTENDED:
+            plies.append(EXTENDED_INDEX.unpack_from(data, n)[0])
+            n += EXTENDED_INDEX.size
+        elif byte == PLY_WHIRLWIND:
+            plies.append(WHIRLWIND)
+        elif byte == PLY_SKIP:
+            plies.append(SKIP)
+        else:
+            plies.append(byte)
+    return plies
+
+
+def decodeSides(data):
+    # the (ply, kind, value) side records of the bytes of a game
+    sides = []
+    ply = 0
+    n = 0
+    while n < len(data):
+        delta, n = decodeVarint(data, n)
+        ply += delta
+        sides.append((ply, data[n], data[n + 1]))
+        n += 2
+    return sides
+
+
+def decodeGame(data, offset=0):
+    """
+    Returns (BinaryGame, offset of the next game) of the record at offset of data.
+    """
+    white, black, wstones, bstones, result, flags, plies, sides = GAME_HEADER.unpack_from(data, offset)
+    offset += GAME_HEADER.size
+    fen = ""
+    if flags & FLAG_FEN:
+        length = FEN_LENGTH.unpack_from(data, offset)[0]
+        offset += FEN_LENGTH.size
+        fen = bytes(data[offset:offset + length]).decode("ascii")
+        offset += length
+    ply_data = data[offset:offset + plies]
+    offset += plies
+    side_data = data[offset:offset + sides]
+    offset += sides
+    return BinaryGame(white, black, (wstones, bstones), RESULTS[result], fen,
+                      decodePlies(ply_data), decodeSides(side_data)), offset
+
+
+def playBinary(board, game, trusted=True):
+    """
+    Plays the plies of a BinaryGame on board, which must be in its start
+    position (see startBoard), and returns True if all of them were played,
+    see board.getReason if not. With trusted=True (the plies of a valid
+    archive are legal) only the last move and the result of the game are
+    checked, as ChessBoard.replay does.
+    """
+    sides = {}
+    for ply, kind, value in game.sides:
+        sides.setdefault(ply, {})[kind] = value
+    last = len(game.plies) - 1
+    for ply, code in enumerate(game.plies):
+        check = not trusted or ply == last
+        secondTurn = board._secondTurn
+        side = sides.get(ply, {})
+        if code == SKIP:
+            board.skipSecondTurn()
+            continue
+        if code == WHIRLWIND:
+            square = side.get(SIDE_WHIRLWIND, 0)
+            pos = (square % 8, square // 8)
+            if not board.addMove(pos, pos, secondTurn=secondTurn, whirlwind=True, trusted=not check):
+                return False
+            continue
+
+        options = moveOptions(board)
+        if code >= len(options):
+            board._reason = board.INVALID_MOVE
+            return False
+        fromPos, toPos, special = options[code]
+        if SIDE_PROMOTION in side:
+            board.setPromotion(PROMOTIONS[side[SIDE_PROMOTION]])
+
+        clearLocation = False
+        duel = None
+        if SIDE_DUEL in side:
+            white_bid, black_bid = divmod(side[SIDE_DUEL], 3)
+            if board._turn == board.WHITE:
+                attacking_bid, defending_bid = white_bid, black_bid
+            else:
+                attacking_bid, defending_bid = black_bid, white_bid
+            cost = board.checkDuel(fromPos, toPos)
+            if cost is True or cost is False:
+                cost = 0
+            bluff = None
+            if SIDE_BLUFF in side:
+                bluff = BLUFFS[side[SIDE_BLUFF]]
+            clearLocation = defending_bid > attacking_bid
+            duel = (cost, attacking_bid, defending_bid, bluff)
+
+        specialMoves = None
+        if not check:
+            specialMoves = {toPos: special}
+        if not board.addMove(fromPos, toPos, clearLocation=clearLocation, secondTurn=secondTurn,
+                             duel=duel, specialMoves=specialMoves, trusted=not check):
+            return False
+    return True
+
+
+def replayBinary(game, trusted=True):
+    """
+    Plays a BinaryGame on a new ChessBoard and returns (board, ok), see playBinary.
+    """
+    board = startBoard(game)
+    ok = playBinary(board, game, trusted)
+    return board, ok
+
+
+class GameArchive:
+    """
+    The games of an archive file, or of its bytes, held in memory as they
+    are in the file. Games are decoded as they're read: archive[n] or
+    "for game in archive" give BinaryGames.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                source = f.read()
+        self.data = source
+        magic, version = ARCHIVE_HEADER.unpack_from(source, 0)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ValueError("not a Chess 2 game archive")
+        # the offset of every game, from its header alone
+        self.offsets = []
+        offset = ARCHIVE_HEADER.size
+        while offset < len(source):
+            self.offsets.append(offset)
+            flags, plies, sides = GAME_HEADER.unpack_from(source, offset)[5:]
+            offset += GAME_HEADER.size + plies + sides
+            if flags & FLAG_FEN:
+                offset += FEN_LENGTH.size + FEN_LENGTH.unpack_from(source, offset - plies - sides)[0]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, n):
+        return decodeGame(self.data, self.offsets[n])[0]
+
+    def __iter__(self):
+        for offset in self.offsets:
+            yield decodeGame(self.data, offset)[0]
+
+
+class ArchiveWriter:
+    """
+    Adds games to an archive file, given its path (the games are added at
+    its end) or an open binary file.
+    """
+
+    def __init__(self, out):
+        self.owned = isinstance(out, str)
+        if self.owned:
+            out = open(out, "ab")
+        self.out = out
+        if self.out.tell() == 0:
+            self.out.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION))
+
+    def addGame(self, game):
+        """
+        Adds a PGNGame, see encodeGame.
+        """
+        self.out.write(encodeGame(game))
+
+    def close(self):
+        if self.owned:
+            self.out.close()
+
+
+def pgnToArchive(source, out):
+    """
+    Adds the games of a PGN file (a path or an open text file) to an archive
+    and returns (games added, [(game number from 1, why it wasn't)]).
+    """
+    writer = ArchiveWriter(out)
+    added = 0
+    skipped = []
+    try:
+        for n, game in enumerate(readGames(source), 1):
+            try:
+                writer.addGame(game)
+            except ValueError as e:
+                skipped.append((n, str(e)))
+                continue
+            added += 1
+    finally:
+        writer.close()
+    return added, skipped
+
+
+def archiveToPGN(source, out, notation=ChessBoard.SAN):
+    """
+    Writes the games of an archive (a path, its bytes or a GameArchive) to a
+    PGN file, see PGNWriter, and returns (games written, [(game number from
+    1, why it couldn't be replayed)]). Only the tags the archive keeps are
+    written: the armies, the result and the FEN.
+    """
+    if not isinstance(source, GameArchive):
+        source = GameArchive(source)
+    writer = PGNWriter(out, notation)
+    written = 0
+    failed = []
+    try:
+        for n, game in enumerate(source, 1):
+            board = startBoard(game)
+            tags = boardTags(board, Date="????.??.??", Result=game.result)
+            if game.fen:
+                tags["SetUp"] = "1"
+                tags["FEN"] = game.fen
+            writer.follow(board, tags)
+            if not playBinary(board, game):
+                failed.append((n, board.move_reason_list[board.getReason()]))
+            writer.endGame(game.result)
+            written += 1
+    finally:
+        writer.close()
+    return written, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converts Chess 2 games between PGN and the binary archive format.")
+    parser.add_argument("source", help="a .pgn file to convert, or an archive to convert or measure")
+    parser.add_argument("dest", nargs="?", help="the archive (or PGN file) to add the games to")
+    parser.add_argument("--lan", action="store_true", help="write the PGN in long algebraic notation")
+    parser.add_argument("--replay", action="store_true", help="also time replaying the archive on ChessBoards")
+    args = parser.parse_args(argv)
+
+    if args.source.lower().endswith(".pgn"):
+        if not args.dest:
+            parser.error("give the archive to write")
+        added, skipped = pgnToArchive(args.source, args.dest)
+        for n, reason in skipped:
+            print("game {} skipped: {}".format(n, reason))
+        print("{} games added to {}".format(added, args.dest))
+        return 1 if skipped else 0
+
+    archive = GameArchive(args.source)
+    if args.dest:
+        notation = ChessBoard.SAN
+        if args.lan:
+            notation = ChessBoard.LAN
+        written, failed = archiveToPGN(archive, args.dest, notation)
+        for n, reason in failed:
+            print("game {} stopped early: {}".format(n, reason))
+        print("{} games written to {}".format(written, args.dest))
+        return 1 if failed else 0
+
+    start = time.perf_counter()
+    games = list(archive)
+    seconds = time.perf_counter() - start
+    plies = sum(len(game.plies) for game in games)
+    print("{} games, {} plies in {} bytes, {:.2f} bytes/ply".format(
+        len(games), plies, len(archive.data), len(archive.data) / plies if plies else 0))
+    print("decoded in {:.3f}s, {:.0f} plies/s".format(seconds, plies / seconds if seconds else 0))
+    if args.replay:
+        start = time.perf_counter()
+        failed = 0
+        for game in games:
+            board, ok = replayBinary(game)
+            if not ok:
+                failed += 1
+        seconds = time.perf_counter() - start
+        print("replayed in {:.3f}s, {:.0f} plies/s, {} failed".format(
+            seconds, plies / seconds if seconds else 0, failed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
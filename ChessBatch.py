@@ -0,0 +1,304 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessBatch is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+import numpy as np
+from ChessBoard import ChessBoard
+
+
+def buildRayIndex():
+    # every square's rays as square indices (y * 8 + x), shaped (64, 8, 7) in
+    # the order of ChessBoard.all_dirs, nearest square first, padded with -1
+    index = np.full((64, 8, 7), -1, dtype=np.int16)
+    for (x, y), rays in ChessBoard.ray_table.items():
+        for d, direction in enumerate(ChessBoard.all_dirs):
+            for step, (rx, ry) in enumerate(rays[direction]):
+                index[y * 8 + x, d, step] = ry * 8 + rx
+    return index
+
+
+def buildJumpIndex(table):
+    # every square's jump destinations as square indices, shaped (64, 8) and padded with -1
+    index = np.full((64, 8), -1, dtype=np.int16)
+    for (x, y), squares in table.items():
+        for j, (tx, ty) in enumerate(squares):
+            index[y * 8 + x, j] = ty * 8 + tx
+    return index
+
+
+def buildPatternTables(patterns):
+    # per array code (see ChessBoard.array_pieces) the ray directions as a
+    # mask over all_dirs, the max steps along a ray and the knight jump flag
+    dirs = np.zeros((len(ChessBoard.array_pieces) + 1, 8), dtype=bool)
+    steps = np.zeros(len(ChessBoard.array_pieces) + 1, dtype=np.int8)
+    knight = np.zeros(len(ChessBoard.array_pieces) + 1, dtype=bool)
+    for p, (pdirs, maxSteps, jumps) in patterns.items():
+        code = ChessBoard.array_pieces.index(p) + 1
+        for d in pdirs:
+            dirs[code, ChessBoard.all_dirs.index(d)] = True
+        steps[code] = maxSteps
+        knight[code] = jumps
+    return dirs, steps, knight
+
+
+def pieceCodes(pieces):
+    # the array codes of the pieces, see ChessBoard.array_pieces
+    return np.array([ChessBoard.array_pieces.index(p) + 1 for p in pieces], dtype=np.int8)
+
+
+class ChessBatch:
+    """
+    Many Chess 2 positions stored side by side as numpy arrays, so the moves
+    and attacks of every board are generated at once.
+
+    boards is (N, 64) int8, indexed y * 8 + x with the codes of ChessBoard.getBoardArray.
+    turn is (N,), stones and armies are (N, 2) indexed by color, ep is (N, 2)
+    holding (x, y) and castling is (N, 4) holding the white king, white
+    queen, black king and black queen castles, like ChessBoard.state2str.
+    """
+
+    # Square indices of the rays and jumps, see buildRayIndex
+    ray_index = buildRayIndex()
+    knight_index = buildJumpIndex(ChessBoard.knight_table)
+
+    # ray_index padded with the extra square 64 past the board, which is always empty
+    ray_squares = np.where(ray_index < 0, 64, ray_index)
+
+    # steps taken to reach each square of a ray, and if it's too far to
+    # take an Elephant from (see ChessBoard.isPieceInvulnerable)
+    ray_steps = np.arange(1, 8, dtype=np.int8)
+    ray_far = np.array([[(s * s * (2 if dx and dy else 1)) >= 9 for s in range(1, 8)]
+                        for dx, dy in ChessBoard.all_dirs])
+
+    # the destination of every move slot of a square: 56 ray squares then 8 knight jumps
+    slot_index = np.concatenate((ray_index.reshape(64, 56), knight_index), axis=1)
+
+    diagonal_mask = np.array([d in ChessBoard.diagonal_dirs for d in ChessBoard.all_dirs])
+    orthogonal_mask = np.array([d in ChessBoard.orthogonal_dirs for d in ChessBoard.all_dirs])
+
+    # The leapers and sliders of every army. Kings step one square, castling
+    # is left to ChessBoard along with the pawns, Ghost and Reaper.
+    move_patterns = dict(ChessBoard.move_pattern_dict)
+    move_patterns.update({
+        "K": (ChessBoard.all_dirs, 1, False), "C": (ChessBoard.all_dirs, 1, False),
+        "U": (ChessBoard.all_dirs, 1, False), "W": (ChessBoard.all_dirs, 1, False)})
+    move_dirs, move_steps, move_knight = buildPatternTables(move_patterns)
+
+    # What each piece attacks before Empowered sharing, like ChessBoard.sweepThreats
+    attack_patterns = {
+        "B": (ChessBoard.diagonal_dirs, 8, False), "N": ((), 0, True), "R": (ChessBoard.orthogonal_dirs, 8, False),
+        "Q": (ChessBoard.all_dirs, 8, False), "K": (ChessBoard.all_dirs, 1, False),
+        "M": (ChessBoard.all_dirs, 8, False),
+        "X": (ChessBoard.diagonal_dirs, 8, False), "Y": ((), 0, True), "Z": (ChessBoard.orthogonal_dirs, 8, False),
+        "O": (ChessBoard.all_dirs, 1, False),
+        "U": (ChessBoard.all_dirs, 1, False), "W": (ChessBoard.all_dirs, 1, False),
+        "T": (ChessBoard.diagonal_dirs, 2, False), "H": ((), 0, True), "E": (ChessBoard.orthogonal_dirs, 3, False),
+        "J": (ChessBoard.orthogonal_dirs, 8, True)}
+    attack_dirs, attack_steps, attack_knight = buildPatternTables(attack_patterns)
+
+    pawn_codes = pieceCodes("PL")
+    empowered_codes = pieceCodes("XYZ")
+    king_codes = pieceCodes("KWUC")
+    royal_codes = pieceCodes("KCW")
+    X_CODE, Y_CODE, Z_CODE = pieceCodes("XYZ")
+    E_CODE, H_CODE, M_CODE, G_CODE, C_CODE, K_CODE = pieceCodes("EHMGCK")
+
+    def __init__(self, size):
+        self.boards = np.zeros((size, 64), dtype=np.int8)
+        self.turn = np.zeros(size, dtype=np.int8)
+        self.stones = np.full((size, 2), 3, dtype=np.int8)
+        self.armies = np.ones((size, 2), dtype=np.int8)
+        self.ep = np.zeros((size, 2), dtype=np.int8)
+        self.castling = np.ones((size, 4), dtype=bool)
+
+    def __len__(self):
+        return len(self.boards)
+
+    @classmethod
+    def fromBoards(cls, boards):
+        """
+        Returns a ChessBatch holding copies of the positions of the ChessBoards in boards.
+        """
+        batch = cls(len(boards))
+        for i, board in enumerate(boards):
+            batch.setBoard(i, board)
+        return batch
+
+    def setBoard(self, i, board):
+        """
+        Copies the position of a ChessBoard into board i of the batch.
+        """
+        self.boards[i] = board.getBoardArray().reshape(64)
+        self.turn[i] = board.getTurn()
+        self.stones[i] = (board._white_stones, board._black_stones)
+        self.armies[i] = (board._white_army, board._black_army)
+        self.ep[i] = board._ep
+        self.castling[i] = (board._white_king_castle, board._white_queen_castle,
+                            board._black_king_castle, board._black_queen_castle)
+
+    def sides(self, color=None):
+        # +1 for the boards where color (default the player to move) is white, -1 for black
+        if color is None:
+            color = self.turn
+        color = np.broadcast_to(color, len(self))
+        return np.where(color == ChessBoard.WHITE, 1, -1).astype(np.int8)
+
+    def sharedPatterns(self, own, pieces, dirs, steps, knight):
+        # adds what the Empowered pieces borrow from their orthogonal
+        # neighbours of the same color to the per square patterns
+        empowered = own & np.isin(pieces, self.empowered_codes)
+        if not empowered.any():
+            return
+        for code, mask, jumps in ((self.X_CODE, self.diagonal_mask, False),
+                                  (self.Y_CODE, None, True),
+                                  (self.Z_CODE, self.orthogonal_mask, False)):
+            near = (own & (pieces == code)).reshape(-1, 8, 8)
+            shared = near.copy()
+            shared[:, 1:, :] |= near[:, :-1, :]
+            shared[:, :-1, :] |= near[:, 1:, :]
+            shared[:, :, 1:] |= near[:, :, :-1]
+            shared[:, :, :-1] |= near[:, :, 1:]
+            shared = shared.reshape(-1, 64) & empowered
+            if not shared.any():
+                continue
+            if jumps:
+                knight |= shared
+            else:
+                dirs |= shared[:, :, None] & mask
+            steps[shared] = 8
+
+    def reachable(self, dirs, steps, knight):
+        # the ray squares each square can reach, the first piece in the way
+        # included, and its knight jumps, as an (N, 64, 64) mask over the
+        # move slots of slot_index
+        occupied = np.concatenate((self.boards != 0, np.zeros((len(self), 1), dtype=bool)), axis=1)
+        rays = occupied[:, self.ray_squares].astype(np.int8)
+        before = np.cumsum(rays, axis=3) - rays
+        rays = (before == 0) & (self.ray_index >= 0)
+        rays &= dirs[:, :, :, None] & (self.ray_steps <= steps[:, :, None, None])
+        jumps = knight[:, :, None] & (self.knight_index >= 0)
+        return np.concatenate((rays.reshape(len(self), 64, 56), jumps), axis=2)
+
+    def getPseudoMoves(self):
+        """
+        Returns the pseudo legal moves of the leapers and sliders of the player
+        to move on every board as (moves, counts). moves is (N, M, 2) int16
+        holding (fromSquare, toSquare) indexed y * 8 + x, ordered by fromSquare
+        and padded with -1, counts is (N,) with the number of moves per board.
+        The king guard isn't checked and king moves aren't checked for attacked
+        squares. Pawns, Ghosts, Reapers and castling are left to ChessBoard.
+        """
+        sides = self.sides()
+        colored = self.boards * sides[:, None]
+        own = colored > 0
+        pieces = np.where(own, np.abs(self.boards), 0)
+
+        dirs = self.move_dirs[pieces]
+        steps = self.move_steps[pieces]
+        knight = self.move_knight[pieces]
+        self.sharedPatterns(own, pieces, dirs, steps, knight)
+        reach = self.reachable(dirs, steps, knight)
+
+        # what's on the destination of every slot, as seen by the player to move
+        padded = np.concatenate((colored, np.zeros((len(self), 1), dtype=np.int8)), axis=1)
+        targets = padded[:, np.where(self.slot_index < 0, 64, self.slot_index)]
+        target_pieces = np.abs(targets)
+        mover = pieces[:, :, None]
+
+        allowed = targets <= 0
+        allowed |= mover == self.E_CODE
+        allowed |= (mover == self.H_CODE) & (targets != self.C_CODE)
+        nemesis = mover == self.M_CODE
+        allowed &= ~nemesis | (targets == 0) | np.isin(-targets, self.royal_codes)
+
+        # invulnerable pieces, see ChessBoard.isPieceInvulnerable
+        kings = np.isin(mover, self.king_codes)
+        allowed &= target_pieces != self.G_CODE
+        allowed &= kings | (target_pieces != self.M_CODE)
+        far = np.concatenate((np.broadcast_to(self.ray_far, (64, 8, 7)).reshape(64, 56),
+                              np.zeros((64, 8), dtype=bool)), axis=1)
+        allowed &= ~((target_pieces == self.E_CODE) & far)
+
+        return self.padMoves(reach & allowed)
+
+    def padMoves(self, slots):
+        # turns an (N, 64, 64) slot mask into padded (moves, counts)
+        counts = slots.sum(axis=(1, 2))
+        moves = np.full((len(self), max(int(counts.max(initial=0)), 1), 2), -1, dtype=np.int16)
+        n, fromSquares, slot = np.nonzero(slots)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        position = np.arange(len(n)) - starts[n]
+        moves[n, position, 0] = fromSquares
+        moves[n, position, 1] = self.slot_index[fromSquares, slot]
+        return moves, counts
+
+    def getAttacks(self, color=None):
+        """
+        Returns (N, 64) int8 counts of the pieces of color (default the player
+        to move on each board) attacking every square, indexed y * 8 + x,
+        the same as ChessBoard.threatMap.
+        """
+        sides = self.sides(color)
+        own = self.boards * sides[:, None] > 0
+        pieces = np.where(own, np.abs(self.boards), 0)
+
+        dirs = self.attack_dirs[pieces]
+        steps = self.attack_steps[pieces]
+        knight = self.attack_knight[pieces]
+        self.sharedPatterns(own, pieces, dirs, steps, knight)
+        reach = self.reachable(dirs, steps, knight)
+
+        n, fromSquares, slot = np.nonzero(reach)
+        squares = n * 64 + self.slot_index[fromSquares, slot]
+
+        # pawns attack the two squares diagonally forward
+        pawns = (own & np.isin(pieces, self.pawn_codes)).reshape(-1, 8, 8)
+        attacks = np.zeros((len(self), 10, 10), dtype=np.int8)
+        white = (sides == 1)[:, None, None]
+        forward = np.where(white, pawns, False)
+        backward = np.where(white, False, pawns)
+        attacks[:, 0:8, 0:8] += forward
+        attacks[:, 0:8, 2:10] += forward
+        attacks[:, 2:10, 0:8] += backward
+        attacks[:, 2:10, 2:10] += backward
+        attacks = attacks[:, 1:9, 1:9].reshape(-1, 64)
+
+        attacks += np.bincount(squares, minlength=len(self) * 64).reshape(-1, 64).astype(np.int8)
+        return attacks
+
+    def makeMoves(self, moves):
+        """
+        Plays one move per board in lockstep. moves is (N, 2) with
+        (fromSquare, toSquare) like a row of getPseudoMoves, boards with a
+        fromSquare of -1 are left alone. The piece moves to its destination,
+        taking a pawn gains a stone, castles are lost when kings and rooks
+        leave their squares, en passant is cleared and the turn passes.
+        Duels, Elephant rampages and Two Kings second turns are left to ChessBoard.
+        """
+        moves = np.asarray(moves)
+        n = np.nonzero(moves[:, 0] >= 0)[0]
+        fromSquares = moves[n, 0]
+        toSquares = moves[n, 1]
+        turn = self.turn[n]
+
+        piece = np.abs(self.boards[n, fromSquares])
+        taken = np.abs(self.boards[n, toSquares])
+        self.boards[n, toSquares] = self.boards[n, fromSquares]
+        self.boards[n, fromSquares] = 0
+
+        gain = np.isin(taken, self.pawn_codes)
+        self.stones[n[gain], turn[gain]] = np.minimum(self.stones[n[gain], turn[gain]] + 1, 6)
+
+        king = piece == self.K_CODE
+        self.castling[n[king], turn[king] * 2] = False
+        self.castling[n[king], turn[king] * 2 + 1] = False
+        for right, square in enumerate((63, 56, 7, 0)):
+            touched = (fromSquares == square) | (toSquares == square)
+            self.castling[n[touched], right] = False
+
+        self.ep[n] = 0
+        self.turn[n] ^= 1
@@ -0,0 +1,312 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessBench is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Times the ChessBoard hot paths over a fixed corpus of positions for each
+# army, writes the results as JSON and compares them with a stored baseline.
+#
+#   python ChessBench.py                      # compare with ChessBench.json if there is one
+#   python ChessBench.py --update-baseline    # store these results as the baseline
+#   python ChessBench.py --output now.json --baseline before.json --threshold 0.2
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from copy import deepcopy
+from ChessBoard import ChessBoard
+
+# where the baseline is kept unless --baseline says otherwise
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ChessBench.json")
+
+
+def buildCorpus(army, games=2, plies=48, every=4, seed=0):
+    # copies of the positions every few plies of seeded random games of army
+    # against itself, with their histories
+    positions = []
+    for game in range(games):
+        rnd = random.Random((seed * 6 + army) * 1000 + game)
+        board = ChessBoard(army, army)
+        for ply in range(plies):
+            if board.isGameOver():
+                break
+            moves = board.getMoves()
+            if not moves:
+                if not board.skipSecondTurn():
+                    break
+                continue
+            fromPos, toPos, special, duel = rnd.choice(moves)
+            board.setPromotion(rnd.choice("QRNB"))
+            board.addMove(fromPos, toPos, secondTurn=board._secondTurn)
+            board.updateRoyalLocations()
+            if ply % every == every - 1 and not board.isGameOver():
+                positions.append(deepcopy(board))
+    return positions
+
+
+class Corpus:
+    # a corpus and what the benchmarks need from it, worked out once
+
+    def __init__(self, army, positions):
+        self.army = army
+        self.positions = positions
+        # (board, fromPos, moves, specialMoves) of every piece of the player to move
+        self.pieces = []
+        # (board, fromPos, toPos, text) of a legal move of every position
+        self.moves = []
+        # the FEN of every position that has one
+        self.fens = []
+        for board in positions:
+            for y in range(8):
+                for x in range(8):
+                    if board.getColor(x, y) == board.getTurn():
+                        moves, specialMoves = board.getPieceMoves((x, y), guard=False)
+                        self.pieces.append((board, (x, y), moves, specialMoves))
+            legal = board.getMoves()
+            if legal:
+                fromPos, toPos, special, duel = legal[len(legal) // 2]
+                text = self.moveText(board, fromPos, toPos)
+                self.moves.append((board, fromPos, toPos, text))
+            try:
+                self.fens.append(board.getFEN())
+            except IndexError:
+                pass
+
+    def moveText(self, board, fromPos, toPos):
+        # the LAN of a move if addTextMove plays it back, or None
+        secondTurn = board._secondTurn
+        board.setPromotion('Q')
+        board.addMove(fromPos, toPos, secondTurn=secondTurn)
+        text = board.getLastTextMove(board.LAN)
+        board.undo()
+        board._secondTurn = secondTurn
+        if text[-1] in "qrnb":
+            text = text[:-1] + text[-1].upper()
+        if board.addTextMove(text, secondTurn=secondTurn):
+            board.undo()
+            board._secondTurn = secondTurn
+            return text
+        board._secondTurn = secondTurn
+        return None
+
+
+def benchValidMoves(corpus):
+    for board, fromPos, moves, specialMoves in corpus.pieces:
+        board.getValidMoves(fromPos)
+    return len(corpus.pieces)
+
+
+def benchThreatened(corpus):
+    calls = 0
+    for board in corpus.positions:
+        turn = board.getTurn()
+        for y in range(8):
+            for x in range(8):
+                board.isThreatened((x, y), turn)
+        calls += 64
+    return calls
+
+
+def benchKingGuard(corpus):
+    for board, fromPos, moves, specialMoves in corpus.pieces:
+        board.checkKingGuard(fromPos, moves, specialMoves)
+    return len(corpus.pieces)
+
+
+def benchMoveUndo(corpus):
+    for board, fromPos, toPos, text in corpus.moves:
+        secondTurn = board._secondTurn
+        board.setPromotion('Q')
+        board.addMove(fromPos, toPos, secondTurn=secondTurn)
+        board.undo()
+        board._secondTurn = secondTurn
+    return len(corpus.moves)
+
+
+def benchTextMove(corpus):
+    calls = 0
+    for board, fromPos, toPos, text in corpus.moves:
+        if text is None:
+            continue
+        secondTurn = board._secondTurn
+        board.addTextMove(text, secondTurn=secondTurn)
+        board.undo()
+        board._secondTurn = secondTurn
+        calls += 1
+    return calls
+
+
+def benchFEN(corpus):
+    board = ChessBoard(corpus.army, corpus.army)
+    for fen in corpus.fens:
+        board.setFEN(fen)
+        board.getFEN()
+    return len(corpus.fens)
+
+
+def benchTextMoves(corpus):
+    for board in corpus.positions:
+        board.getAllTextMoves(board.SAN)
+    return len(corpus.positions)
+
+
+def benchRepetitions(corpus):
+    for board in corpus.positions:
+        board.threeRepetitions()
+    return len(corpus.positions)
+
+
+# name and function of every benchmark, the function returns the calls it made
+BENCHMARKS = (
+    ("getValidMoves", benchValidMoves),
+    ("isThreatened", benchThreatened),
+    ("checkKingGuard", benchKingGuard),
+    ("addMove+undo", benchMoveUndo),
+    ("addTextMove+undo", benchTextMove),
+    ("setFEN+getFEN", benchFEN),
+    ("getAllTextMoves", benchTextMoves),
+    ("threeRepetitions", benchRepetitions))
+
+
+def calibrate(repeat=5):
+    # the best time in microseconds of a fixed pure Python loop, like the
+    # calibration of sunfish/test.py, to tell a slower or busier machine from
+    # a slower ChessBoard
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        total = 0
+        for n in range(300000):
+            total += n % 7
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best * 1e6
+
+
+def timeBenchmark(bench, corpus, number):
+    # runs bench over the corpus number times, returns (seconds, calls)
+    calls = 0
+    start = time.perf_counter()
+    for i in range(number):
+        calls += bench(corpus)
+    return time.perf_counter() - start, calls
+
+
+def runBenchmarks(repeat=5, seed=0, minimum=0.05):
+    """
+    Runs every benchmark over the corpus of each army and returns the results
+    as a dict: army name -> benchmark -> {"us": mean microseconds per call, "calls": calls}.
+    Like timeit, a run goes over the corpus as many times as it takes to last
+    minimum seconds. Every benchmark of every army runs once per round, for
+    repeat rounds, and the fastest run is kept, so a busy moment of the
+    machine doesn't land on one benchmark only.
+    """
+    corpora = [Corpus(army, buildCorpus(army, seed=seed)) for army in range(1, 7)]
+
+    runs = []
+    for corpus in corpora:
+        for name, bench in BENCHMARKS:
+            number = 1
+            while True:
+                seconds, calls = timeBenchmark(bench, corpus, number)
+                if seconds >= minimum or not calls:
+                    break
+                number *= 2
+            runs.append([corpus, name, bench, number, calls, seconds])
+
+    for i in range(repeat - 1):
+        for run in runs:
+            corpus, name, bench, number, calls, best = run
+            run[5] = min(best, timeBenchmark(bench, corpus, number)[0])
+
+    results = {}
+    for corpus, name, bench, number, calls, best in runs:
+        timings = results.setdefault(ChessBoard.army_name_dict[corpus.army], {})
+        timings[name] = {"us": best * 1e6 / calls if calls else 0.0, "calls": calls}
+    return results
+
+
+def compareResults(results, baseline, threshold=0.2, scale=1.0):
+    """
+    Returns (army, benchmark, baseline us, us, change) for every benchmark that
+    is more than threshold (0.2 = 20%) slower than in the baseline, after
+    scaling the baseline times by scale (see calibrate).
+    """
+    regressions = []
+    for army, timings in results.items():
+        for name, timing in timings.items():
+            old = baseline.get(army, {}).get(name)
+            if not old or not old["us"]:
+                continue
+            change = timing["us"] / (old["us"] * scale) - 1.0
+            if change > threshold:
+                regressions.append((army, name, old["us"], timing["us"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the ChessBoard hot paths.")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown flagged as a regression, 0.2 = 20%%")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus games")
+    parser.add_argument("--no-calibrate", action="store_true", help="compare raw times, not scaled by machine speed")
+    args = parser.parse_args(argv)
+
+    calibration = calibrate()
+    results = runBenchmarks(args.repeat, args.seed)
+    calibration = min(calibration, calibrate())
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "calibration_us": calibration,
+        "results": results}
+
+    names = [name for name, bench in BENCHMARKS]
+    print("{:<10}".format("us/call") + "".join("{:>18}".format(name) for name in names))
+    for army, timings in results.items():
+        print("{:<10}".format(army) + "".join("{:>18.1f}".format(timings[name]["us"]) for name in names))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("")
+        print("Baseline stored in {}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    scale = 1.0
+    if not args.no_calibrate and baseline.get("calibration_us"):
+        scale = calibration / baseline["calibration_us"]
+    regressions = compareResults(results, baseline["results"], args.threshold, scale)
+    print("")
+    if not regressions:
+        print("No regressions against {} ({}).".format(args.baseline, baseline.get("date", "")))
+        return 0
+    print("Regressions against {} ({}):".format(args.baseline, baseline.get("date", "")))
+    for army, name, old, new, change in regressions:
+        print("  {:<10} {:<18} {:>10.1f}us -> {:>10.1f}us  +{:.0%}".format(army, name, old, new, change))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,10 +13,85 @@
 #####################################################################
 
 from copy import deepcopy
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from itertools import zip_longest
 import numpy as np
 import math
+import os
+import re
+import sys
+import time
+
+
+def buildRayTable():
+    # every square's eight rays towards the edge of the board, nearest square first
+    table = {}
+    for y in range(8):
+        for x in range(8):
+            rays = {}
+            for d in [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]:
+                dx, dy = d
+                ray = []
+                rx = x + dx
+                ry = y + dy
+                while 0 <= rx <= 7 and 0 <= ry <= 7:
+                    ray.append((rx, ry))
+                    rx += dx
+                    ry += dy
+                rays[d] = tuple(ray)
+            table[(x, y)] = rays
+    return table
+
+
+def buildJumpTable(jumps):
+    # every square's on-board destinations for the given (dx, dy) jumps
+    table = {}
+    for y in range(8):
+        for x in range(8):
+            table[(x, y)] = tuple((x + dx, y + dy) for dx, dy in jumps
+                                  if 0 <= x + dx <= 7 and 0 <= y + dy <= 7)
+    return table
+
+
+def buildCodeTable(pieces):
+    # the int8 code of every board character, white pieces are positive and
+    # black pieces negative, see ChessBoard.getBoardArray
+    table = np.zeros(256, dtype=np.int8)
+    for i, p in enumerate(pieces):
+        table[ord(p)] = i + 1
+        table[ord(p.lower())] = -(i + 1)
+    return table
+
+
+def deepSizeOf(obj, seen):
+    # the bytes of obj and of the lists, tuples, dicts, strings and numbers it
+    # holds by sys.getsizeof. Objects whose id is in seen are skipped and the
+    # ones counted are added to it, so shared objects are only counted once
+    size = 0
+    todo = [obj]
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            todo.extend(obj)
+    return size
+
+
+# A text move resolved by ChessBoard.prepareTextMove, ready for ChessBoard.commitMove
+PreparedMove = namedtuple('PreparedMove', 'fromPos toPos piece specialMoves duel cost '
+                                          'promotion promotionPiece secondTurn turn state')
+
+# What changed on the board, sent to the listeners of a ChessBoard (see ChessBoard.addListener)
+BoardDiff = namedtuple('BoardDiff', 'event squares turn stones')
+
+# A position read from a FEN or EPD record, see ChessBoard.parseFEN and ChessBoard.setPosition
+Position = namedtuple('Position', 'board turn castling ep fifty move armies stones')
 
 
 class ChessBoard:
@@ -115,6 +190,15 @@ class ChessBoard:
         "T": "B", "H": "N", "E": "R", "J": "Q",
         "C": "K"}
 
+    # str.translate table from board characters to FEN letters
+    fen_letter_table = str.maketrans(
+        ''.join(army_piece_to_classic_piece_dict) + ''.join(army_piece_to_classic_piece_dict).lower(),
+        ''.join(army_piece_to_classic_piece_dict.values()) + ''.join(army_piece_to_classic_piece_dict.values()).lower())
+
+    # str.translate tables from FEN board letters to board characters, per
+    # (white army, black army), see fenTable
+    _fen_tables = {}
+
     classic_piece_to_army_piece_dict = {
         #      c    n    e    r    t    a
         'P': ['P', 'L', 'P', 'P', 'P', 'P'],
@@ -124,6 +208,54 @@ class ChessBoard:
         'Q': ['Q', 'M', 'O', 'A', 'U', 'J'],
         'K': ['K', 'C', 'C', 'C', 'W', 'C']}
 
+    # Precomputed board geometry, indexed by (x, y)
+    all_dirs = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+    orthogonal_dirs = ((0, -1), (-1, 0), (1, 0), (0, 1))
+    diagonal_dirs = ((-1, -1), (1, -1), (-1, 1), (1, 1))
+
+    ray_table = buildRayTable()
+    king_table = buildJumpTable(all_dirs)
+    knight_table = buildJumpTable(((1, 2), (2, 1), (2, -1), (1, -2),
+                                   (-1, 2), (-2, 1), (-1, -2), (-2, -1)))
+
+    # How a piece can reach a square: ray directions, max steps along a ray
+    # and if it also jumps like a knight. Empowered pieces include everything
+    # they can borrow. Pawns, Ghosts and Reapers are handled in attackersTo.
+    attack_pattern_dict = {
+        "B": (diagonal_dirs, 8, False), "N": ((), 0, True), "R": (orthogonal_dirs, 8, False),
+        "Q": (all_dirs, 8, False), "K": (all_dirs, 1, False),
+        "L": (all_dirs, 1, False), "M": (all_dirs, 8, False),
+        "X": (all_dirs, 8, True), "Y": (all_dirs, 8, True), "Z": (all_dirs, 8, True), "O": (all_dirs, 1, False),
+        "U": (all_dirs, 1, False), "W": (all_dirs, 1, False),
+        "T": (diagonal_dirs, 2, False), "H": ((), 0, True), "E": (orthogonal_dirs, 3, False), "J": (orthogonal_dirs, 8, True),
+        "C": (all_dirs, 1, False)}
+
+    # How a piece moves: ray directions, max steps along a ray and if it also
+    # jumps like a knight. Empowered pieces add what they borrow from their
+    # neighbours. The other pieces generate their moves in getMoveSpecials.
+    move_pattern_dict = {
+        "B": (diagonal_dirs, 8, False), "N": ((), 0, True), "R": (orthogonal_dirs, 8, False),
+        "Q": (all_dirs, 8, False), "M": (all_dirs, 8, False),
+        "X": (diagonal_dirs, 8, False), "Y": ((), 0, True), "Z": (orthogonal_dirs, 8, False), "O": (all_dirs, 1, False),
+        "T": (diagonal_dirs, 2, False), "H": ((), 0, True), "E": (orthogonal_dirs, 3, False), "J": (orthogonal_dirs, 8, True)}
+
+    # Board array codes, see getBoardArray
+    array_pieces = "PBNRQKLMXYZOGAUWTHEJC"
+    array_code_table = buildCodeTable(array_pieces)
+
+    piece_to_moves_dict = {
+        "P": "getValidClassicPawnMoves", "B": "getValidClassicBishopMoves",
+        "N": "getValidClassicKnightMoves", "R": "getValidClassicRookMoves",
+        "Q": "getValidClassicQueenMoves", "K": "getValidClassicKingMoves",
+        "L": "getValidNemesisPawnMoves", "M": "getValidNemesisNemesisMoves",
+        "X": "getValidEmpoweredBishopMoves", "Y": "getValidEmpoweredKnightMoves",
+        "Z": "getValidEmpoweredRookMoves", "O": "getValidEmpoweredQueenMoves",
+        "G": "getValidReaperGhostMoves", "A": "getValidReaperReaperMoves",
+        "U": "getValidTwoKingsWarriorKingMoves", "W": "getValidTwoKingsWarriorKingMoves",
+        "T": "getValidAnimalsTigerMoves", "H": "getValidAnimalsWildHorseMoves",
+        "E": "getValidAnimalsElephantMoves", "J": "getValidAnimalsJungleQueenMoves",
+        "C": "getValidGenericKingMoves"}
+
     dueling_rank_dict = {
         "P": 1, "B": 2, "N": 2, "R": 3, "Q": 4,
         "L": 1, "M": 4,
@@ -193,6 +325,20 @@ class ChessBoard:
     QUEEN_CASTLE_MOVE = 5
     SECOND_WARRIOR_KING_MOVE = 6
 
+    # Board diff events, see addListener
+    MOVE_EVENT = 0
+    UNDO_EVENT = 1
+    REDO_EVENT = 2
+    GOTO_EVENT = 3
+    SET_EVENT = 4
+    SKIP_EVENT = 5
+
+    # Kinds of moves for getMoves
+    ALL_MOVES = 0
+    CAPTURE_MOVES = 1
+    QUIET_MOVES = 2
+    CHECK_MOVES = 3
+
     # Text move output type
     AN = 0  # g4 - e3
     SAN = 1  # Bxe3
@@ -239,16 +385,51 @@ class ChessBoard:
     _stack_second_turns = 0
 
     # all moves, stored to make it easier to build textmoves
-    # [piece, from, to, takes, duel, bluff, promotion, check/checkmate/midline invasion, special move]
-    # ["KQRNBPLMOGAUXTHEJC", (fx, fy), (tx, ty), True/False, [0-6, 0-6], "+-", "QRNB", "+#%", 0-7]
-    _cur_move = [None, None, None, False, None, None, None, None, 0]
+    # [piece, from, to, takes, duel, bluff, promotion, check/checkmate/midline invasion, special move, disambiguation, notation]
+    # ["KQRNBPLMOGAUXTHEJC", (fx, fy), (tx, ty), True/False, [0-6, 0-6], "+-", "QRNB", "+#%", 0-7, "a-h1-8", (AN, SAN, LAN)]
+    _cur_move = [None, None, None, False, None, None, None, None, 0, "", None]
     _moves = []
 
     _promotion_value = 0
 
-    def __init__(self, wArmy, bArmy):
+    # int8 copy of the board, see getBoardArray
+    _mirror = None
+
+    # callables told about every change of the position, see addListener
+    _listeners = ()
+
+    # threat maps for the board they were computed on, see threatMap
+    _threat_key = None
+    _threat_maps = {}
+
+    # the last getFEN result and the state it was built from
+    _fen_key = None
+    _fen = None
+
+    # most subtree counts a perft table keeps, see perft
+    perft_table_size = 1 << 20
+
+    # The methods counted by ChessBoard(wArmy, bArmy, stats=True), or with
+    # the environment variable CHESSBOARD_STATS set, see getStats.
+    # The ones taking a square first are counted by the piece on it.
+    stats_methods = ('isThreatened', 'checkKingGuard', 'updateRoyalLocations', 'SurroundedBy',
+                     'getValidMoves', 'loadCurState', 'state2str')
+    stats_square_methods = ('isThreatened', 'checkKingGuard', 'SurroundedBy', 'getValidMoves')
+
+    # calls and seconds by method and (army, piece), see getStats
+    _stats = None
+
+    def __init__(self, wArmy, bArmy, mirror=False, stats=None):
         self._white_army = wArmy
         self._black_army = bArmy
+        if mirror:
+            self._mirror = np.zeros((8, 8), dtype=np.int8)
+        if stats is None:
+            stats = bool(os.environ.get('CHESSBOARD_STATS'))
+        if stats and type(self) is ChessBoard:
+            # the counting happens in a subclass so boards without it pay nothing
+            self.__class__ = CountingChessBoard
+            self._stats = {}
         self.resetBoard(self._white_army, self._black_army)
 
     def state2str(self):
@@ -307,6 +488,17 @@ class ChessBoard:
         self._black_stones = int(a[3])
 
         self._fifty = f
+        self.syncMirror()
+
+    def boardToArray(self):
+        # the board as int8 codes, see getBoardArray
+        codes = np.frombuffer(''.join(''.join(row) for row in self._board).encode('ascii'), dtype=np.uint8)
+        return self.array_code_table[codes].reshape(8, 8)
+
+    def syncMirror(self):
+        # copies the board into the int8 mirror, if there is one
+        if self._mirror is not None:
+            self._mirror[:] = self.boardToArray()
 
     def pushState(self):
         if self._state_stack_pointer != len(self._state_stack):
@@ -319,8 +511,8 @@ class ChessBoard:
                        self._white_queen_castle,
                        self._black_king_castle,
                        self._black_queen_castle,
-                       deepcopy(self._board),
-                       deepcopy(self._ep)]
+                       [row[:] for row in self._board],
+                       list(self._ep)]
         self._three_rep_stack.append(three_state)
 
         state_str = self.state2str()
@@ -329,7 +521,32 @@ class ChessBoard:
         self._state_stack_pointer = len(self._state_stack)
 
     def pushMove(self):
-        self._moves.append(deepcopy(self._cur_move))
+        # a new list is made for every move, only its fields need copying
+        self._moves.append(list(self._cur_move))
+
+    def notifyListeners(self, event, before):
+        # tells the listeners what changed from the state string before
+        # to the current state. They hear of every event, even one that
+        # changes nothing, like a whirlwind that takes no piece
+        if not self._listeners:
+            return
+        after = self.state2str()
+
+        squares = []
+        for i in range(64):
+            if before[i] != after[i]:
+                squares.append(((i % 8, i // 8), before[i], after[i]))
+        # TURN at 64, STONES at 74 and 75, see state2str
+        turn = None
+        if before[64] != after[64]:
+            turn = (int(before[64]), int(after[64]))
+        stones = None
+        if before[74:76] != after[74:76]:
+            stones = ((int(before[74]), int(before[75])), (int(after[74]), int(after[75])))
+
+        diff = BoardDiff(event, squares, turn, stones)
+        for listener in self._listeners:
+            listener(self, diff)
 
     def threeRepetitions(self):
         ts = self._three_rep_stack[:self._state_stack_pointer]
@@ -343,15 +560,20 @@ class ChessBoard:
         return False
 
     def updateRoyalLocations(self):
+        royals = self.royal_to_army_royal_dict
         for y in range(0, 8):
+            row = self._board[y]
             for x in range(0, 8):
-                if any(var in self._board[y][x] for var in self.royal_to_army_royal_dict['K']):
+                p = row[x]
+                if p == '.':
+                    continue
+                if p in royals['K']:
                     self._white_king_location = (x, y)
-                elif any(var in self._board[y][x] for var in self.royal_to_army_royal_dict['k']):
+                elif p in royals['k']:
                     self._black_king_location = (x, y)
-                if any(var in self._board[y][x] for var in self.royal_to_army_royal_dict['Q']):
+                if p in royals['Q']:
                     self._white_queen_location = (x, y)
-                elif any(var in self._board[y][x] for var in self.royal_to_army_royal_dict['q']):
+                elif p in royals['q']:
                     self._black_queen_location = (x, y)
 
     def SurroundedBy(self, fromPos, direction):
@@ -560,6 +782,317 @@ class ChessBoard:
                     break
         return False
 
+    def getAttackers(self, location, color):
+        """
+        Returns the locations of every piece of color that attacks location,
+        found in one walk over the rays and knight jumps from location.
+        Empowered pieces count the moves they borrow, Elephants and Tigers
+        their range. If an opposing piece stands on location, the attackers
+        that can't capture it (see isPieceInvulnerable) are left out.
+        Like isThreatened, Ghosts and Reapers aren't counted as attackers.
+        """
+        location = tuple(location)
+        lx, ly = location
+        attackers = []
+
+        def own(x, y, piece):
+            if color == self.WHITE:
+                return self._board[y][x] == piece
+            return self._board[y][x] == piece.lower()
+
+        def borrows(x, y, piece):
+            for places in self.SurroundedBy((x, y), 1):
+                if own(places[0], places[1], piece):
+                    return True
+            return False
+
+        # pawns attack forward, so they stand behind location
+        if color == self.WHITE:
+            py = ly + 1
+        else:
+            py = ly - 1
+        if 0 <= py <= 7:
+            for px in (lx - 1, lx + 1):
+                if 0 <= px <= 7 and (own(px, py, 'P') or own(px, py, 'L')):
+                    attackers.append((px, py))
+
+        for x, y in self.knight_table[location]:
+            if self.getColor(x, y) != color:
+                continue
+            p = self._board[y][x].upper()
+            if p in ('N', 'Y', 'J', 'H'):
+                attackers.append((x, y))
+            elif p in ('X', 'Z') and borrows(x, y, 'Y'):
+                attackers.append((x, y))
+
+        rays = self.ray_table[location]
+        for d in self.all_dirs:
+            steps = 0
+            for x, y in rays[d]:
+                steps += 1
+                if self._board[y][x] == '.':
+                    continue
+                if self.getColor(x, y) == color:
+                    p = self._board[y][x].upper()
+                    if p in ('K', 'O', 'U', 'W') and steps == 1:
+                        attackers.append((x, y))
+                    elif p in ('Q', 'M'):
+                        attackers.append((x, y))
+                    elif d in self.orthogonal_dirs:
+                        if p in ('R', 'J', 'Z') or (p == 'E' and steps < 4):
+                            attackers.append((x, y))
+                        elif p in ('X', 'Y') and borrows(x, y, 'Z'):
+                            attackers.append((x, y))
+                    else:
+                        if p in ('B', 'X') or (p == 'T' and steps < 3):
+                            attackers.append((x, y))
+                        elif p in ('Y', 'Z') and borrows(x, y, 'X'):
+                            attackers.append((x, y))
+                break
+
+        if self.getColor(lx, ly) not in (color, self.NOCOLOR):
+            attackers = [a for a in attackers if not self.isPieceInvulnerable(a, location)]
+            # the Nemesis only captures kings
+            if self._board[ly][lx].upper() not in self.royal_to_army_royal_dict['K']:
+                attackers = [a for a in attackers if self._board[a[1]][a[0]].upper() != 'M']
+        return attackers
+
+    def threatMap(self, color):
+        """
+        Returns a list of 64 numbers, indexed y * 8 + x, counting the pieces of
+        color that attack each square (see getAttackers, without the
+        invulnerability filters). The map is built in one sweep over the pieces
+        of color and kept until the board changes.
+        """
+        key = ''.join(''.join(row) for row in self._board)
+        if key != self._threat_key:
+            self._threat_key = key
+            self._threat_maps = {}
+        if color not in self._threat_maps:
+            self._threat_maps[color] = self.sweepThreats(color)
+        return self._threat_maps[color]
+
+    def sweepThreats(self, color):
+        # builds the threat map of color, see threatMap
+        threats = [0] * 64
+        for y in range(8):
+            for x in range(8):
+                if self.getColor(x, y) != color:
+                    continue
+                p = self._board[y][x].upper()
+                squares = set()
+
+                if p in ('P', 'L'):
+                    if color == self.WHITE:
+                        ty = y - 1
+                    else:
+                        ty = y + 1
+                    if 0 <= ty <= 7:
+                        for tx in (x - 1, x + 1):
+                            if 0 <= tx <= 7:
+                                squares.add((tx, ty))
+
+                dirs = set()
+                maxSteps = 8
+                knight = p in ('N', 'Y', 'J', 'H')
+                if p in ('K', 'O', 'U', 'W'):
+                    dirs.update(self.all_dirs)
+                    maxSteps = 1
+                elif p in ('Q', 'M'):
+                    dirs.update(self.all_dirs)
+                elif p in ('R', 'J'):
+                    dirs.update(self.orthogonal_dirs)
+                elif p == 'B':
+                    dirs.update(self.diagonal_dirs)
+                elif p == 'E':
+                    dirs.update(self.orthogonal_dirs)
+                    maxSteps = 3
+                elif p == 'T':
+                    dirs.update(self.diagonal_dirs)
+                    maxSteps = 2
+                elif p in ('X', 'Y', 'Z'):
+                    # Empowered pieces share their moves with their neighbours
+                    shared = [p]
+                    for places in self.SurroundedBy((x, y), 1):
+                        if self.getColor(places[0], places[1]) == color:
+                            shared.append(self._board[places[1]][places[0]].upper())
+                    if 'X' in shared:
+                        dirs.update(self.diagonal_dirs)
+                    if 'Y' in shared:
+                        knight = True
+                    if 'Z' in shared:
+                        dirs.update(self.orthogonal_dirs)
+
+                if knight:
+                    squares.update(self.knight_table[(x, y)])
+                rays = self.ray_table[(x, y)]
+                for d in dirs:
+                    steps = 0
+                    for tx, ty in rays[d]:
+                        squares.add((tx, ty))
+                        steps += 1
+                        if self._board[ty][tx] != '.' or steps == maxSteps:
+                            break
+
+                for tx, ty in squares:
+                    threats[ty * 8 + tx] += 1
+        return threats
+
+    def attackersTo(self, toPos, piece, player):
+        # returns the locations of every piece of that army letter and player
+        # that could move to toPos, without checking the king guard.
+        # The tables are walked backwards from toPos so only squares the piece
+        # could come from get their moves generated.
+        toPos = tuple(toPos)
+        tx, ty = toPos
+        p = piece.upper()
+        if player == self.WHITE:
+            piece = p
+        else:
+            piece = piece.lower()
+
+        candidates = []
+        if p in ('G', 'A'):
+            for y in range(8):
+                for x in range(8):
+                    if self._board[y][x] == piece:
+                        candidates.append((x, y))
+        elif p == 'P':
+            if player == self.WHITE:
+                back = 1
+            else:
+                back = -1
+            for x, y in ((tx, ty + back), (tx - 1, ty + back), (tx + 1, ty + back), (tx, ty + back * 2)):
+                if 0 <= x <= 7 and 0 <= y <= 7:
+                    candidates.append((x, y))
+        elif p in self.attack_pattern_dict:
+            dirs, maxSteps, knight = self.attack_pattern_dict[p]
+            rays = self.ray_table[toPos]
+            for d in dirs:
+                steps = 0
+                for x, y in rays[d]:
+                    steps += 1
+                    if self._board[y][x] != '.':
+                        candidates.append((x, y))
+                        break
+                    if steps == maxSteps:
+                        break
+            if knight:
+                candidates.extend(self.knight_table[toPos])
+            if p == 'K' and tx in (2, 6) and ty == (7 if player == self.WHITE else 0):
+                candidates.append((4, ty))
+
+        turn = self._turn
+        self._turn = player
+        attackers = []
+        for x, y in candidates:
+            if self._board[y][x] == piece and (x, y) not in attackers:
+                if toPos in self.getPieceMoves((x, y), guard=False)[0]:
+                    attackers.append((x, y))
+        self._turn = turn
+        return attackers
+
+    def traceMove(self, fromPos, toPos, dirs, maxSteps=8):
+        # returns True if toPos lies along one of dirs from fromPos within
+        # maxSteps and every square in between is free
+        fx, fy = fromPos
+        dx = toPos[0] - fx
+        dy = toPos[1] - fy
+        steps = max(abs(dx), abs(dy))
+        if steps == 0 or steps > maxSteps or (dx and dy and abs(dx) != abs(dy)):
+            return False
+        d = ((dx > 0) - (dx < 0), (dy > 0) - (dy < 0))
+        if d not in dirs:
+            return False
+        for x, y in self.ray_table[fromPos][d][:steps - 1]:
+            if self._board[y][x] != '.':
+                return False
+        return True
+
+    def getMoveSpecials(self, fromPos, toPos):
+        # returns the special moves of the piece on fromPos if it can move to
+        # toPos, without checking the king guard, or None if it can't.
+        # Only the squares between the two are looked at, pieces missing from
+        # move_pattern_dict generate their moves instead.
+        fromPos = tuple(fromPos)
+        toPos = tuple(toPos)
+        fx, fy = fromPos
+        tx, ty = toPos
+        p = self._board[fy][fx].upper()
+
+        if p == 'P':
+            if self._turn == self.WHITE:
+                movedir = -1
+                startrow = 6
+                ocol = self.BLACK
+                eprow = 3
+            else:
+                movedir = 1
+                startrow = 1
+                ocol = self.WHITE
+                eprow = 4
+
+            specialMoves = {}
+            if ty != fy + movedir and not (tx == fx and ty == fy + movedir * 2):
+                return None
+            if tx == fx:
+                if not self.isFree(fx, fy + movedir):
+                    return None
+                if ty != fy + movedir:
+                    if fy != startrow or not self.isFree(tx, ty):
+                        return None
+                    specialMoves[toPos] = self.EP_MOVE
+            elif abs(tx - fx) == 1:
+                if fy == eprow and self._ep[1] != 0 and self._ep[0] == tx:
+                    specialMoves[toPos] = self.EP_CAPTURE_MOVE
+                elif self.getColor(tx, ty) != ocol:
+                    return None
+            else:
+                return None
+        elif p in self.move_pattern_dict:
+            dirs, maxSteps, knight = self.move_pattern_dict[p]
+            if p in ('X', 'Y', 'Z'):
+                for x, y in self.SurroundedBy(fromPos, 1):
+                    if self.getColor(x, y) != self._turn:
+                        continue
+                    q = self._board[y][x].upper()
+                    if q == 'X':
+                        dirs = dirs + self.diagonal_dirs
+                    elif q == 'Y':
+                        knight = True
+                    elif q == 'Z':
+                        dirs = dirs + self.orthogonal_dirs
+                    maxSteps = 8
+
+            if not (knight and toPos in self.knight_table[fromPos]) and not self.traceMove(fromPos, toPos, dirs, maxSteps):
+                return None
+
+            target = self._board[ty][tx]
+            if p == 'E':
+                pass
+            elif p == 'H':
+                if target.upper() == 'C' and self.getColor(tx, ty) == self._turn:
+                    return None
+            elif p == 'M':
+                if target != '.':
+                    if self.getColor(tx, ty) == self._turn:
+                        return None
+                    if not any(var in target for var in (self.royal_to_army_royal_dict['K'])) and \
+                            not any(var in target for var in (self.royal_to_army_royal_dict['k'])):
+                        return None
+            elif self.getColor(tx, ty) == self._turn:
+                return None
+            specialMoves = {}
+        else:
+            moves, specialMoves = self.getPieceMoves(fromPos, guard=False)
+            if toPos in moves:
+                return specialMoves
+            return None
+
+        if self.isPieceInvulnerable(fromPos, toPos):
+            return None
+        return specialMoves
+
     def hasAnyValidMoves(self, player=None):
         if player is None:
             player = self._turn
@@ -735,7 +1268,7 @@ class ChessBoard:
 # getValid[Army][Piece]Moves! #
 ###############################
 
-    def getValidClassicPawnMoves(self, fromPos):
+    def getValidClassicPawnMoves(self, fromPos, guard=True):
         moves = []
         specialMoves = {}
         fx, fy = fromPos
@@ -772,10 +1305,11 @@ class ChessBoard:
                 specialMoves[(fx - 1, fy + movedir)] = self.EP_CAPTURE_MOVE
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves, specialMoves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves, specialMoves)
         return (list(OrderedDict.fromkeys(moves)), specialMoves)
 
-    def getValidNemesisPawnMoves(self, fromPos):
+    def getValidNemesisPawnMoves(self, fromPos, guard=True):
         moves = []
         specialMoves = {}
         dirs = []
@@ -848,60 +1382,63 @@ class ChessBoard:
                 specialMoves[(fx - 1, fy + movedir)] = self.EP_CAPTURE_MOVE
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves, specialMoves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves, specialMoves)
         return (list(OrderedDict.fromkeys(moves)), specialMoves)
 
-    def getValidClassicBishopMoves(self, fromPos):
+    def getValidClassicBishopMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
 
         moves = self.traceValidMoves(fromPos, dirs)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidEmpoweredBishopMoves(self, fromPos):
+    def getValidEmpoweredBishopMoves(self, fromPos, guard=True):
         moves = []
         fx, fy = fromPos
-        moves = self.getValidClassicBishopMoves(fromPos)
+        moves = self.getValidClassicBishopMoves(fromPos, guard)
         temp = self.SurroundedBy((fx, fy), 1)
         for places in temp:
             if self._turn == self.WHITE:
                 if 'Y' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicKnightMoves(fromPos)
+                    m = self.getValidClassicKnightMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
                 if 'Z' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicRookMoves(fromPos)
+                    m = self.getValidClassicRookMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
             else:
                 if 'y' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicKnightMoves(fromPos)
+                    m = self.getValidClassicKnightMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
                 if 'z' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicRookMoves(fromPos)
+                    m = self.getValidClassicRookMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidAnimalsTigerMoves(self, fromPos):
+    def getValidAnimalsTigerMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
 
         moves = self.traceValidMoves(fromPos, dirs, 2)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidClassicKnightMoves(self, fromPos):
+    def getValidClassicKnightMoves(self, fromPos, guard=True):
         moves = []
         fx, fy = fromPos
         m = [(fx + 1, fy + 2), (fx + 2, fy + 1), (fx + 2, fy - 1),
@@ -912,40 +1449,41 @@ class ChessBoard:
                 if self.getColor(p[0], p[1]) != self._turn:
                     moves.append(p)
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidEmpoweredKnightMoves(self, fromPos):
+    def getValidEmpoweredKnightMoves(self, fromPos, guard=True):
         moves = []
         fx, fy = fromPos
-        moves = self.getValidClassicKnightMoves(fromPos)
+        moves = self.getValidClassicKnightMoves(fromPos, guard)
         temp = self.SurroundedBy((fx, fy), 1)
         for places in temp:
             if self._turn == self.WHITE:
                 if 'X' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicBishopMoves(fromPos)
+                    m = self.getValidClassicBishopMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
                 if 'Z' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicRookMoves(fromPos)
+                    m = self.getValidClassicRookMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
             else:
                 if 'x' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicBishopMoves(fromPos)
+                    m = self.getValidClassicBishopMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
                 if 'z' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicRookMoves(fromPos)
+                    m = self.getValidClassicRookMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidAnimalsWildHorseMoves(self, fromPos):
+    def getValidAnimalsWildHorseMoves(self, fromPos, guard=True):
         moves = []
         fx, fy = fromPos
         m = [(fx + 1, fy + 2), (fx + 2, fy + 1), (fx + 2, fy - 1),
@@ -960,50 +1498,52 @@ class ChessBoard:
                 else:
                     moves.append(p)
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidClassicRookMoves(self, fromPos):
+    def getValidClassicRookMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(1, 0), (-1, 0), (0, 1), (0, -1)]
 
         moves = self.traceValidMoves(fromPos, dirs)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidEmpoweredRookMoves(self, fromPos):
+    def getValidEmpoweredRookMoves(self, fromPos, guard=True):
         moves = []
         fx, fy = fromPos
-        moves = self.getValidClassicRookMoves(fromPos)
+        moves = self.getValidClassicRookMoves(fromPos, guard)
         temp = self.SurroundedBy((fx, fy), 1)
         for places in temp:
             if self._turn == self.WHITE:
                 if 'X' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicBishopMoves(fromPos)
+                    m = self.getValidClassicBishopMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
                 if 'Y' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicKnightMoves(fromPos)
+                    m = self.getValidClassicKnightMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
             else:
                 if 'x' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicBishopMoves(fromPos)
+                    m = self.getValidClassicBishopMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
                 if 'y' in self._board[places[1]][places[0]]:
-                    m = self.getValidClassicKnightMoves(fromPos)
+                    m = self.getValidClassicKnightMoves(fromPos, guard)
                     if len(m) > 0:
                         for n in m:
                             moves.append(n)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidReaperGhostMoves(self, fromPos):
+    def getValidReaperGhostMoves(self, fromPos, guard=True):
         moves = []
 
         for y in range(0, 8):
@@ -1012,20 +1552,22 @@ class ChessBoard:
                     moves.append((x, y))
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidAnimalsElephantMoves(self, fromPos):
+    def getValidAnimalsElephantMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(1, 0), (-1, 0), (0, 1), (0, -1)]
 
         moves = self.traceValidElephantMoves(fromPos, dirs)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidClassicQueenMoves(self, fromPos):
+    def getValidClassicQueenMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(-1, -1), (0, -1), (1, -1),
                 (-1, 0), (1, 0),
@@ -1034,10 +1576,11 @@ class ChessBoard:
         moves = self.traceValidMoves(fromPos, dirs)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidNemesisNemesisMoves(self, fromPos):
+    def getValidNemesisNemesisMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(-1, -1), (0, -1), (1, -1),
                 (-1, 0), (1, 0),
@@ -1046,10 +1589,11 @@ class ChessBoard:
         moves = self.traceValidNemesisNemesisMoves(fromPos, dirs)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidEmpoweredQueenMoves(self, fromPos):
+    def getValidEmpoweredQueenMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(-1, -1), (0, -1), (1, -1),
                 (-1, 0), (1, 0),
@@ -1058,10 +1602,11 @@ class ChessBoard:
         moves = self.traceValidMoves(fromPos, dirs, 1)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidReaperReaperMoves(self, fromPos):
+    def getValidReaperReaperMoves(self, fromPos, guard=True):
         moves = []
         fromPiece = self._board[fromPos[1]][fromPos[0]].isupper()
 
@@ -1075,10 +1620,11 @@ class ChessBoard:
                         moves.append((x, y))
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidAnimalsJungleQueenMoves(self, fromPos):
+    def getValidAnimalsJungleQueenMoves(self, fromPos, guard=True):
         moves = []
         dirs = [(1, 0), (-1, 0), (0, 1), (0, -1)]
         fx, fy = fromPos
@@ -1094,10 +1640,11 @@ class ChessBoard:
                     moves.append(p)
 
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves))
 
-    def getValidClassicKingMoves(self, fromPos):
+    def getValidClassicKingMoves(self, fromPos, guard=True):
         moves = []
         specialMoves = {}
 
@@ -1138,10 +1685,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = k
         self.updateRoyalLocations()
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return (moves, specialMoves)
 
-    def getValidTwoKingsWarriorKingMoves(self, fromPos):
+    def getValidTwoKingsWarriorKingMoves(self, fromPos, guard=True):
         moves = []
         specialMoves = {}
         dirs = [(-1, -1), (0, -1), (1, -1),
@@ -1153,10 +1701,11 @@ class ChessBoard:
                 moves.append(m)
         self.updateRoyalLocations()
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves)), specialMoves
 
-    def getValidGenericKingMoves(self, fromPos):
+    def getValidGenericKingMoves(self, fromPos, guard=True):
         moves = []
         specialMoves = {}
         dirs = [(-1, -1), (0, -1), (1, -1),
@@ -1168,18 +1717,19 @@ class ChessBoard:
                 moves.append(m)
         self.updateRoyalLocations()
         moves = self.isInvulnerable(fromPos, moves)
-        moves = self.checkKingGuard(fromPos, moves)
+        if guard:
+            moves = self.checkKingGuard(fromPos, moves)
         return list(OrderedDict.fromkeys(moves)), specialMoves
 
     ########################
     ## Movement Functions ##
     ########################
 
-    def moveClassicPawn(self, fromPos, toPos):
-        moves, specialMoves = self.getValidClassicPawnMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveClassicPawn(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         if toPos in specialMoves:
             t = specialMoves[toPos]
@@ -1228,11 +1778,11 @@ class ChessBoard:
         self._fifty = 0
         return True
 
-    def moveNemesisPawn(self, fromPos, toPos):
-        moves, specialMoves = self.getValidNemesisPawnMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveNemesisPawn(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         if toPos in specialMoves:
             t = specialMoves[toPos]
@@ -1281,11 +1831,11 @@ class ChessBoard:
         self._fifty = 0
         return True
 
-    def moveClassicBishop(self, fromPos, toPos):
-        moves = self.getValidClassicBishopMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveClassicBishop(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1299,11 +1849,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveEmpoweredBishop(self, fromPos, toPos):
-        moves = self.getValidEmpoweredBishopMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveEmpoweredBishop(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1317,11 +1867,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveAnimalsTiger(self, fromPos, toPos):
-        moves = self.getValidAnimalsTigerMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveAnimalsTiger(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1338,11 +1888,11 @@ class ChessBoard:
             self._board[toPos[1]][toPos[0]] = "."
         return True
 
-    def moveClassicKnight(self, fromPos, toPos):
-        moves = self.getValidClassicKnightMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveClassicKnight(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1356,11 +1906,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveEmpoweredKnight(self, fromPos, toPos):
-        moves = self.getValidEmpoweredKnightMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveEmpoweredKnight(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1374,11 +1924,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveAnimalsWildHorse(self, fromPos, toPos):
-        moves = self.getValidAnimalsWildHorseMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveAnimalsWildHorse(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1392,11 +1942,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveClassicRook(self, fromPos, toPos):
-        moves = self.getValidClassicRookMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveClassicRook(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         fx, fy = fromPos
         if self._turn == self.WHITE:
@@ -1422,11 +1972,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveEmpoweredRook(self, fromPos, toPos):
-        moves = self.getValidEmpoweredRookMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveEmpoweredRook(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1440,11 +1990,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveReaperGhost(self, fromPos, toPos):
-        moves = self.getValidReaperGhostMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveReaperGhost(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
         self._fifty += 1
@@ -1453,11 +2003,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveAnimalsElephant(self, fromPos, toPos):
-        moves = self.getValidAnimalsElephantMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveAnimalsElephant(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         fx, fy = fromPos
         fromPiece = self._board[fromPos[1]][fromPos[0]]
@@ -1518,11 +2068,11 @@ class ChessBoard:
                     self._board[toPos[1]][fromPos[0]] = "."
         return True
 
-    def moveClassicQueen(self, fromPos, toPos):
-        moves = self.getValidClassicQueenMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveClassicQueen(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1536,11 +2086,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveNemesisNemesis(self, fromPos, toPos):
-        moves = self.getValidNemesisNemesisMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveNemesisNemesis(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1550,11 +2100,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveEmpoweredQueen(self, fromPos, toPos):
-        moves = self.getValidEmpoweredQueenMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveEmpoweredQueen(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1568,11 +2118,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveReaperReaper(self, fromPos, toPos):
-        moves = self.getValidReaperReaperMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveReaperReaper(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
         if self._board[toPos[1]][toPos[0]] == ".":
@@ -1585,11 +2135,11 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveAnimalsJungleQueen(self, fromPos, toPos):
-        moves = self.getValidAnimalsJungleQueenMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveAnimalsJungleQueen(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1603,8 +2153,12 @@ class ChessBoard:
         self._board[fromPos[1]][fromPos[0]] = "."
         return True
 
-    def moveClassicKing(self, fromPos, toPos):
-        moves, specialMoves = self.getValidClassicKingMoves(fromPos)
+    def moveClassicKing(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
+
         if self._turn == self.WHITE:
             c_row = 7
             k = "K"
@@ -1619,9 +2173,6 @@ class ChessBoard:
         else:
             t = 0
 
-        if not toPos in moves:
-            return False
-
         self.clearEP()
 
         if self._turn == self.WHITE:
@@ -1658,11 +2209,11 @@ class ChessBoard:
         self.updateRoyalLocations()
         return True
 
-    def moveTwoKingsWarriorKing(self, fromPos, toPos):
-        moves, specialMoves = self.getValidTwoKingsWarriorKingMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveTwoKingsWarriorKing(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1678,11 +2229,11 @@ class ChessBoard:
         self.updateRoyalLocations()
         return True
 
-    def moveGenericKing(self, fromPos, toPos):
-        moves, specialMoves = self.getValidGenericKingMoves(fromPos)
-
-        if not toPos in moves:
-            return False
+    def moveGenericKing(self, fromPos, toPos, specialMoves=None):
+        if specialMoves is None:
+            specialMoves = self.getLegalMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                return False
 
         self.clearEP()
 
@@ -1892,6 +2443,16 @@ class ChessBoard:
                 piece = "C"
         return piece
 
+    def textMovePieces(self, piece):
+        # the pieces of the player to move that are written with the same
+        # letter as piece in a text move: the piece of the army, and the
+        # classic piece its pawns promote to
+        classic = self.army_piece_to_classic_piece_dict[piece.upper()]
+        pieces = [self.reversePieceNames(classic)]
+        if classic != pieces[0]:
+            pieces.append(classic)
+        return pieces
+
     def locationToTuple(self, fromPos):
         fromPos = fromPos.strip()
         files = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4, "f": 5, "g": 6, "h": 7}
@@ -1900,10 +2461,31 @@ class ChessBoard:
         dest_y = ranks[fromPos[1]]
         return (dest_x, dest_y)
 
+    def getDisambiguation(self, fromPos, toPos):
+        # SAN file/rank hint for the move, built from the position before it is made
+        files = "abcdefgh"
+        ranks = "87654321"
+        fx, fy = fromPos
+        hint_f = ""
+        hint_r = ""
+        candidates = []
+        for p in self.textMovePieces(self._board[fy][fx]):
+            candidates.extend(self.attackersTo(toPos, p, self._turn))
+        for x, y in candidates:
+            if x == fx and y == fy:
+                continue
+            if not self.checkKingGuard((x, y), [toPos]):
+                continue
+            if fx == x:
+                hint_r = ranks[fy]
+            else:
+                hint_f = files[fx]
+        return hint_f + hint_r
+
     def formatTextMove(self, move, notation):
         # all moves, stored to make it easier to build textmoves
-        # [piece, from, to, takes, duel, bluff, promotion, check/checkmate/midline invasion, special move]
-        # ["KQRNBPLMOGAUXTHEJDC", (fx, fy), (tx, ty), True/False, [0-6, 0-6], "+-", "QRNB", "+#%", 0-7]
+        # [piece, from, to, takes, duel, bluff, promotion, check/checkmate/midline invasion, special move, disambiguation, notation]
+        # ["KQRNBPLMOGAUXTHEJDC", (fx, fy), (tx, ty), True/False, [0-6, 0-6], "+-", "QRNB", "+#%", 0-7, "a-h1-8", (AN, SAN, LAN)]
         piece = move[0]
         fpos = tuple(move[1])
         tpos = tuple(move[2])
@@ -1913,6 +2495,7 @@ class ChessBoard:
         promo = move[6]
         check = move[7]
         special = move[8]
+        hint = move[9]
 
         files = "abcdefgh"
         ranks = "87654321"
@@ -1935,7 +2518,7 @@ class ChessBoard:
             if not bluff:
                 bluff = ""
             if promo:
-                pt = "={}".format(promo)
+                pt = "={}".format(self.formatPieceNames(promo).upper())
             if not check:
                 check = ""
             piece = self.formatPieceNames(piece)
@@ -1955,33 +2538,19 @@ class ChessBoard:
             if take:
                 tc = "x"
             if promo:
-                pt = " = {}".format(promo.upper())
-            p = piece
-            if self._turn == self.BLACK:
-                p = p.lower()
-            if any(var in piece for var in ("P", "p", "L", "l", "C", "c")):
+                pt = " = {}".format(self.formatPieceNames(promo).upper())
+            if any(var in piece for var in ("P", "p", "L", "l")):
                 piece = ""
             if not check:
                 check = ""
-            fx, fy = fpos
-            hint_f = ""
-            hint_r = ""
-            for y in range(8):
-                for x in range(8):
-                    if self._board[y][x] == p:
-                        if x == fx and y == fy:
-                            continue
-                        vm = self.getValidMoves((x, y))
-                        if tpos in vm:
-                            if fx == x:
-                                hint_r = ranks[fy]
-                            else:
-                                hint_f = files[fx]
-            if piece is not "":
+            if piece != "":
                 piece = self.formatPieceNames(piece)
+                # a whirlwind is written with the small letter of the Warrior King, "kxe4"
+                if fpos == tpos:
+                    piece = piece.lower()
             if piece == "" and take:
-                    hint_f = files[fx]
-            res = "{}{}{}{}{}{}{}{}".format(piece, hint_f, hint_r, tc, files[tpos[0]], ranks[tpos[1]], pt, check)
+                hint = files[fpos[0]] + hint.lstrip(files)
+            res = "{}{}{}{}{}{}{}".format(piece, hint, tc, files[tpos[0]], ranks[tpos[1]], pt, check)
             if duel:
                 res = res + " {}".format("[" + str(duel[0]) + "-" + str(duel[1]) + bluff + "]")
         return res
@@ -2007,14 +2576,15 @@ class ChessBoard:
         else:
             whitePawns = 'ClassicWhitePawns'
 
-        self._board = [self.army_set_up_dict[blackPieces],
-                       self.army_set_up_dict[blackPawns],
+        # copies, the moves change the rows in place
+        self._board = [list(self.army_set_up_dict[blackPieces]),
+                       list(self.army_set_up_dict[blackPawns]),
                        ['.'] * 8,
                        ['.'] * 8,
                        ['.'] * 8,
                        ['.'] * 8,
-                       self.army_set_up_dict[whitePawns],
-                       self.army_set_up_dict[whitePieces]]
+                       list(self.army_set_up_dict[whitePawns]),
+                       list(self.army_set_up_dict[whitePieces])]
         self._turn = self.WHITE
         self._white_king_castle = True
         self._white_queen_castle = True
@@ -2029,82 +2599,145 @@ class ChessBoard:
         self._game_result = 0
         self.pushState()
         self.updateRoyalLocations()
+        self.syncMirror()
+
+    @classmethod
+    def fenTable(cls, wArmy, bArmy):
+        # the str.translate table from FEN board letters to the board
+        # characters of the two armies, empty squares become dots
+        table = cls._fen_tables.get((wArmy, bArmy))
+        if table is None:
+            table = {ord('/'): None}
+            for n in range(1, 9):
+                table[ord(str(n))] = '.' * n
+            for p, pieces in cls.classic_piece_to_army_piece_dict.items():
+                table[ord(p)] = pieces[wArmy - 1]
+                table[ord(p.lower())] = pieces[bArmy - 1].lower()
+            cls._fen_tables[(wArmy, bArmy)] = table
+        return table
+
+    @classmethod
+    def parseArmyStones(cls, armies, stones):
+        # the (white, black) armies and stones of a FEN prefix like 'Tc 31'
+        armies = tuple(cls.army_abr_dict[a.upper()] for a in armies if a in "cnertaCNERTA")
+        stones = tuple(int(s) for s in stones if s in "0123456")
+        if len(armies) != 2 or len(stones) != 2:
+            raise ValueError("bad army and stone prefix: {} {}".format(armies, stones))
+        return armies, stones
+
+    @classmethod
+    def parsePosition(cls, board, turn, castles, ep, fifty, move, armies, stones):
+        # builds a Position from the text fields of a FEN
+        table = cls.fenTable(*armies)
+        ranks = board.split('/')
+        if len(ranks) != 8:
+            raise ValueError("bad FEN board, {} ranks: {}".format(len(ranks), board))
+        for rank in ranks:
+            for c in rank:
+                if ord(c) not in table:
+                    raise ValueError("bad FEN board, unknown piece {!r}: {}".format(c, board))
+            if len(rank.translate(table)) != 8:
+                raise ValueError("bad FEN board, rank {} isn't 8 squares: {}".format(rank, board))
+        b = board.translate(table)
+        if len(ep) == 2:
+            ep = ("abcdefgh".index(ep[0].lower()), "87654321".index(ep[1]))
+        else:
+            ep = (0, 0)
+        return Position(b, "wb".index(turn), tuple(int(p in castles) for p in "KQkq"),
+                        ep, int(fifty), int(move), armies, stones)
 
-    def setFEN(self, fen):
+    @classmethod
+    def parseFEN(cls, fen):
         """
-        Sets the board and states accoring from a Chess 2 Forsyth-Edwards Notation string.
+        Returns the Position of a Chess 2 Forsyth-Edwards Notation string
+        without touching a board, see setPosition. Without the army and stone
+        prefix both armies are Classic with 3 stones.
         Ex. 'Tc 31 rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b kq - 1 2'
+        Raises ValueError if the string can't be read.
         """
-        self._three_rep_stack = []
-        self._state_stack = []
-        self._moves = []
-        self._reason = 0
-        self._game_result = 0
-        self._white_army = self.CLASSIC
-        self._black_army = self.CLASSIC
-        self._white_stones = 3
-        self._black_stones = 3
-
         fparts = fen.split()
-        newstate = ""
-        if len(fparts) == 8:
-            counter = 2
-        else:
-            counter = 0
-
-        # GET ARMIES + STONES
-        armystones = ""
         if len(fparts) == 8:
-            for a in fparts[0]:
-                if a in "cnertaCNERTA":
-                    armystones += str(self.army_abr_dict[a.upper()])
-            for s in fparts[1]:
-                if s in "0123456":
-                    armystones += s
+            armies, stones = cls.parseArmyStones(fparts[0], fparts[1])
+            fparts = fparts[2:]
+        elif len(fparts) == 6:
+            armies, stones = (cls.CLASSIC, cls.CLASSIC), (3, 3)
         else:
-            armystones += "1133"
+            raise ValueError("bad FEN: {}".format(fen))
+        return cls.parsePosition(*fparts, armies=armies, stones=stones)
 
-        # BOARD
-        change = lambda p, a: self.classic_piece_to_army_piece_dict[p][a - 1]
-        for c in fparts[counter]:
-            if c in "kqrnbpKQRNBP":
-                if c.isupper():
-                    newstate += change(c, int(armystones[0]))
+    @classmethod
+    def readEPD(cls, lines):
+        """
+        Reads Chess 2 EPD records from an iterable of lines, like an open file,
+        and yields (position, operations) for each one as it's read.
+        Records may start with the army and stone prefix of the FEN ('Tc 31 ...'),
+        and FEN lines with the fifty move and move counters are read as well.
+        operations maps the opcodes of the record to their operands, with the
+        quotes removed. hmvc and fmvn set the counters of the position.
+        Blank lines and lines starting with # are skipped.
+        Raises ValueError with the line number for a record that can't be read.
+        """
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            try:
+                fields = line.split(None, 1)
+                if '/' in fields[0]:
+                    armies, stones = (cls.CLASSIC, cls.CLASSIC), (3, 3)
+                    fields = line.split(None, 4)
                 else:
-                    newstate += change(c.upper(), int(armystones[1])).lower()
-            elif c in "12345678":
-                newstate += '.' * int(c)
-        counter += 1
-
-        # TURN
-        newstate += str("wb".index(fparts[counter]))
-        counter += 1
-
-        # CASTLING
-        kq = "KQkq"
-        for p in kq:
-            if p in fparts[counter]:
-                newstate += "1"
-            else:
-                newstate += "0"
-        counter += 1
+                    fields = line.split(None, 6)
+                    armies, stones = cls.parseArmyStones(fields[0], fields[1])
+                    fields = fields[2:]
+                if len(fields) < 4:
+                    raise ValueError("missing fields")
+
+                rest = fields[4] if len(fields) > 4 else ""
+                fifty, move = 0, 1
+                counters = re.match(r'(-?\d+)\s+(-?\d+)(\s|$)', rest)
+                if counters:
+                    fifty, move = counters.group(1), counters.group(2)
+                    rest = rest[counters.end():]
+
+                operations = {}
+                for opcode, operand in re.findall(r'([A-Za-z]\w*)\s*((?:"[^"]*"|[^;"])*);', rest):
+                    operand = operand.strip()
+                    if len(operand) >= 2 and operand[0] == operand[-1] == '"':
+                        operand = operand[1:-1]
+                    operations[opcode] = operand
+                fifty = operations.get('hmvc', fifty)
+                move = operations.get('fmvn', move)
+
+                position = cls.parsePosition(*fields[:4], armies=armies, stones=stones,
+                                             fifty=fifty, move=move)
+            except (ValueError, IndexError, KeyError) as e:
+                raise ValueError("EPD line {}: {}".format(number, e))
+            yield position, operations
 
-        # EN PASSANT
-        if len(fparts[counter]) == 2:
-            newstate += str("abcdefgh".index(fparts[counter][0].lower()))
-            newstate += str("87654321".index(fparts[counter][1]))
-        else:
-            newstate += "00"
-        counter += 1
-
-        # GAME RESULT
-        newstate += "0"
+    def setFEN(self, fen):
+        """
+        Sets the board and states accoring from a Chess 2 Forsyth-Edwards Notation string.
+        Ex. 'Tc 31 rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b kq - 1 2'
+        """
+        self.setPosition(self.parseFEN(fen))
 
-        # SET ARMIES + STONES
-        newstate += armystones
+    def setPosition(self, position):
+        """
+        Sets the board and states from a Position (see parseFEN), starting a new game history.
+        """
+        before = self.state2str()
+        self._three_rep_stack = []
+        self._state_stack = []
+        self._moves = []
+        self._reason = 0
 
-        # HALF COUNT
-        newstate += ":{}".format(fparts[counter])
+        # board, turn, castling, ep, game result, armies, stones : fifty
+        newstate = "{}{}{}{}{}{}{}{}{}{}{}{}{}:{}".format(
+            position.board, position.turn, position.castling[0], position.castling[1],
+            position.castling[2], position.castling[3], position.ep[0], position.ep[1], 0,
+            position.armies[0], position.armies[1], position.stones[0], position.stones[1],
+            position.fifty)
 
         self._state_stack.append(newstate)
         self._state_stack_pointer = 1
@@ -2120,36 +2753,30 @@ class ChessBoard:
         self._three_rep_stack.append(three_state)
 
         self.updateRoyalLocations()
+        self.notifyListeners(self.SET_EVENT, before)
 
     def getFEN(self):
         """
         Returns the current state as Forsyth - Edwards Notation string.
+        The string is kept until the state changes.
         """
         s = self._state_stack[self._state_stack_pointer - 1]
-
+        key = (s, self._state_stack_pointer - self._stack_second_turns)
+        if key != self._fen_key:
+            self._fen = self.buildFEN(s)
+            self._fen_key = key
+        return self._fen
+
+    def buildFEN(self, s):
+        # the FEN of the state string s, see getFEN
         b = s[:64]
         v = s[64:72]
         a = s[72:76]
         fifty = s[77:]
-        b = [self.formatPieceNames(var) for var in b]
-
-        rows = []
-        for i in range(8):
-            row = b[i * 8:(i + 1) * 8]  # A slice for each row.
-            cnt = 0
-            res = ""
-            for c in row:
-                if c == ".":
-                    cnt += 1
-                else:
-                    if cnt:
-                        res += str(cnt)
-                        cnt = 0
-                    res += c
-            if cnt:
-                res += str(cnt)
-            rows.append(res)
-        board = "/".join(rows)
+
+        b = b.translate(self.fen_letter_table)
+        rows = "/".join(b[i * 8:(i + 1) * 8] for i in range(8))
+        board = re.sub(r'\.+', lambda m: str(len(m.group())), rows)
 
         turn = (["w", "b"])[int(v[0])]
 
@@ -2210,22 +2837,28 @@ class ChessBoard:
         if move < 1:
             return False
 
+        before = self.state2str()
         self._state_stack_pointer = move
         self.loadCurState()
+        self.notifyListeners(self.GOTO_EVENT, before)
 
     def gotoFirst(self):
         """
         Goto before the first known move.
         """
+        before = self.state2str()
         self._state_stack_pointer = 1
         self.loadCurState()
+        self.notifyListeners(self.GOTO_EVENT, before)
 
     def gotoLast(self):
         """
         Goto after the last knwon move.
         """
+        before = self.state2str()
         self._state_stack_pointer = len(self._state_stack)
         self.loadCurState()
+        self.notifyListeners(self.GOTO_EVENT, before)
 
     def undo(self):
         """
@@ -2234,8 +2867,12 @@ class ChessBoard:
         """
         if self._state_stack_pointer <= 1:
             return False
+        before = None
+        if self._listeners:
+            before = self.state2str()
         self._state_stack_pointer -= 1
         self.loadCurState()
+        self.notifyListeners(self.UNDO_EVENT, before)
         return True
 
     def redo(self):
@@ -2245,10 +2882,47 @@ class ChessBoard:
         """
         if self._state_stack_pointer == len(self._state_stack):
             return False
+        before = self.state2str()
         self._state_stack_pointer += 1
         self.loadCurState()
+        self.notifyListeners(self.REDO_EVENT, before)
         return True
 
+    def skipSecondTurn(self):
+        """
+        The Warrior King skips its second move and the turn passes.
+        Returns False if there's no second move to skip.
+        """
+        if not self._secondTurn:
+            return False
+        before = self.state2str()
+        self._secondTurn = False
+        if self._turn == self.WHITE:
+            self._turn = self.BLACK
+        else:
+            self._turn = self.WHITE
+        self.notifyListeners(self.SKIP_EVENT, before)
+        return True
+
+    def addListener(self, listener):
+        """
+        Calls listener(board, diff) after every move and every change of the position:
+        undo, redo, the goto methods, setFEN and skipSecondTurn, so a client only has to
+        redraw or send what changed.
+        diff is a BoardDiff of the event (MOVE_EVENT, UNDO_EVENT, REDO_EVENT, GOTO_EVENT,
+        SET_EVENT or SKIP_EVENT), the squares that changed as a list of ((x, y), old piece,
+        new piece), the turn as (old, new) and the stones as ((white, black), (white, black)).
+        The turn and stones are None if they didn't change. A move that changes nothing,
+        like a whirlwind that takes no piece, is still sent, with no squares.
+        """
+        self._listeners = self._listeners + (listener,)
+
+    def removeListener(self, listener):
+        """
+        Stops calling a listener added with addListener.
+        """
+        self._listeners = tuple(l for l in self._listeners if l is not listener)
+
     def setPromotion(self, promotion):
         """
         Tell the chessboard how to promote a pawn.
@@ -2267,27 +2941,39 @@ class ChessBoard:
     def isCheck(self):
         """
         Returns True if the current players king is checked.
+        For Two Kings it returns a tuple, one for each Warrior King.
         """
+        threats = self.threatMap(not self._turn)
         if self._turn == self.WHITE:
             if "Two Kings" in self.army_name_dict[self._white_army]:
                 kingPos = self._white_king_location
                 queenPos = self._white_queen_location
-                return (self.isThreatened(kingPos, self._turn), self.isThreatened(queenPos, self._turn))
+                return (threats[kingPos[1] * 8 + kingPos[0]] > 0, threats[queenPos[1] * 8 + queenPos[0]] > 0)
             else:
                 kingPos = self._white_king_location
         else:
             if "Two Kings" in self.army_name_dict[self._black_army]:
                 kingPos = self._black_king_location
                 queenPos = self._black_queen_location
-                return (self.isThreatened(kingPos, self._turn), self.isThreatened(queenPos, self._turn))
+                return (threats[kingPos[1] * 8 + kingPos[0]] > 0, threats[queenPos[1] * 8 + queenPos[0]] > 0)
             else:
                 kingPos = self._black_king_location
-        return self.isThreatened(kingPos, self._turn)
+        return threats[kingPos[1] * 8 + kingPos[0]] > 0
 
     def isMidlineInvasion(self):
         """
         Returns True if the current player's king (or kings) is over the middle line.
         """
+        if self._mirror is not None:
+            if self._turn == self.BLACK:
+                royals = [self.array_code_table[ord(p)] for p in ('K', 'C', 'W', 'U')]
+                rows = np.nonzero(np.isin(self._mirror, royals))[0]
+                return bool(rows.size) and bool((rows < 4).all())
+            else:
+                royals = [self.array_code_table[ord(p)] for p in ('k', 'c', 'w', 'u')]
+                rows = np.nonzero(np.isin(self._mirror, royals))[0]
+                return bool(rows.size) and bool((rows > 3).all())
+
         if self._turn == self.BLACK:
             kingPos = self._white_king_location
             queenPos = self._white_queen_location
@@ -2338,6 +3024,35 @@ class ChessBoard:
         """
         return deepcopy(self._board)
 
+    def getBoardArray(self):
+        """
+        Returns the board as an 8x8 numpy int8 array indexed [y][x]. Empty squares are 0,
+        white pieces are 1 and up in the order of array_pieces, black pieces the same negated.
+        With ChessBoard(wArmy, bArmy, mirror=True) the array is kept in sync by the moves and
+        undo/redo and returned as is, so don't change it. Otherwise it's built from the board.
+        """
+        if self._mirror is not None:
+            return self._mirror
+        return self.boardToArray()
+
+    def getMaterial(self, color):
+        """
+        Returns a dict of piece letter and count of the pieces of color on the board.
+        """
+        codes = self.getBoardArray()
+        if color == self.BLACK:
+            codes = -codes
+        counts = np.bincount(codes[codes > 0], minlength=len(self.array_pieces) + 1)
+        return dict((p, int(counts[i + 1])) for i, p in enumerate(self.array_pieces) if counts[i + 1])
+
+    def findPieces(self, pieces):
+        """
+        Returns the locations of every piece in pieces (board letters, uppercase for white)
+        Ex. findPieces("Kk") for both kings.
+        """
+        codes = [self.array_code_table[ord(p)] for p in pieces]
+        return [(int(x), int(y)) for y, x in np.argwhere(np.isin(self.getBoardArray(), codes))]
+
     def getTurn(self):
         """
         Returns the current player. 0 = WHITE, 1 = BLACK.
@@ -2357,12 +3072,14 @@ class ChessBoard:
         """
         return self._reason
 
-    def getValidMoves(self, location):
+    def getValidMoves(self, location, guard=True):
         """
         Returns a list of valid moves. (ex [ [3, 4], [3, 5], [3, 6] ... ] )
         If there isn't a valid piece on that location or the piece on the selected
         location hasn't got any valid moves an empty list is returned.
         The location argument must be a tuple containing an x, y value Ex. (3, 3)
+        Pass guard=False to skip the king guard and get the moves the piece
+        could make if its own king(s) were ignored.
         """
         if self._game_result:
             return []
@@ -2375,97 +3092,209 @@ class ChessBoard:
         if self.getColor(x, y) != self._turn:
             return []
 
-        p = self._board[y][x].upper()
-        ####Classic (Default) Army
-        if p == 'P':
-            m, s = self.getValidClassicPawnMoves(location)
-            return m
-        elif p == 'B':
-            return self.getValidClassicBishopMoves(location)
-        elif p == 'N':
-            return self.getValidClassicKnightMoves(location)
-        elif p == 'R':
-            return self.getValidClassicRookMoves(location)
-        elif p == 'Q':
-            return self.getValidClassicQueenMoves(location)
-        elif p == 'K':
-            m, s = self.getValidClassicKingMoves(location)
-            return m
-        ### Nemesis Army
-        elif p == 'L':
-            m, s = self.getValidNemesisPawnMoves(location)
-            return m
-        elif p == 'M':
-            return self.getValidNemesisNemesisMoves(location)
-        ### Empowered Army
-        elif p == 'X':
-            return self.getValidEmpoweredBishopMoves(location)
-        elif p == 'Y':
-            return self.getValidEmpoweredKnightMoves(location)
-        elif p == 'Z':
-            return self.getValidEmpoweredRookMoves(location)
-        elif p == 'O':
-            return self.getValidEmpoweredQueenMoves(location)
-        ### Reaper Army
-        elif p == 'G':
-            return self.getValidReaperGhostMoves(location)
-        elif p == 'A':
-            return self.getValidReaperReaperMoves(location)
-        ### Two Kings Army
-        elif p == 'U':
-            m, s = self.getValidTwoKingsWarriorKingMoves(location)
-            return m
-        elif p == 'W':
-            m, s = self.getValidTwoKingsWarriorKingMoves(location)
-            return m
-        ### Animals Army
-        elif p == 'T':
-            return self.getValidAnimalsTigerMoves(location)
-        elif p == 'H':
-            return self.getValidAnimalsWildHorseMoves(location)
-        elif p == 'E':
-            return self.getValidAnimalsElephantMoves(location)
-        elif p == 'J':
-            return self.getValidAnimalsJungleQueenMoves(location)
-        ### Army Agnostic
-        elif p == 'C':
-            m, s = self.getValidGenericKingMoves(location)
-            return m
-        else:
+        return self.getPieceMoves(location, guard)[0]
+
+    def isLegalMove(self, fromPos, toPos, secondTurn=False):
+        """
+        Returns True if the piece on fromPos can move to toPos, without generating
+        all of its moves. Pass secondTurn=True for the second move of a Warrior King.
+        The position arguments must be tuples containing x, y value Ex. (4, 6).
+        """
+        return self.getLegalMoveSpecials(fromPos, toPos, secondTurn) is not None
+
+    def areLegalMoves(self, moves, secondTurn=False):
+        """
+        Returns a list of True/False, one for every (fromPos, toPos) in moves,
+        if that move can be made in the current position.
+        The king guard is checked once for all the moves of the same piece.
+        """
+        results = [False] * len(moves)
+        grouped = OrderedDict()
+        for i, (fromPos, toPos) in enumerate(moves):
+            fromPos = tuple(fromPos)
+            toPos = tuple(toPos)
+            if not self.checkMoveSquares(fromPos, toPos, secondTurn):
+                continue
+            specialMoves = self.getMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                continue
+            if fromPos not in grouped:
+                grouped[fromPos] = ([], {}, [])
+            grouped[fromPos][0].append(toPos)
+            grouped[fromPos][1].update(specialMoves)
+            grouped[fromPos][2].append(i)
+
+        for fromPos, (targets, specialMoves, indexes) in grouped.items():
+            legal = self.checkKingGuard(fromPos, targets, specialMoves)
+            for toPos, i in zip(targets, indexes):
+                results[i] = toPos in legal
+        return results
+
+    def checkMoveSquares(self, fromPos, toPos, secondTurn=False):
+        # the checks on the squares alone: both on the board, different,
+        # and a piece of the player to move (a Warrior King on a second turn)
+        if self._game_result:
+            return False
+        fx, fy = fromPos
+        tx, ty = toPos
+        if fx < 0 or fx > 7 or fy < 0 or fy > 7 or tx < 0 or tx > 7 or ty < 0 or ty > 7:
+            return False
+        if fromPos == toPos or self.getColor(fx, fy) != self._turn:
+            return False
+        if secondTurn and not any(var in self._board[fy][fx] for var in ('W', 'w', 'U', 'u')):
+            return False
+        return True
+
+    def getLegalMoveSpecials(self, fromPos, toPos, secondTurn=False):
+        # returns the special moves of the piece on fromPos if it can legally
+        # move to toPos, or None if it can't. The king guard is only checked
+        # for this one move.
+        fromPos = tuple(fromPos)
+        toPos = tuple(toPos)
+        if not self.checkMoveSquares(fromPos, toPos, secondTurn):
+            return None
+        specialMoves = self.getMoveSpecials(fromPos, toPos)
+        if specialMoves is None:
+            return None
+        if not self.checkKingGuard(fromPos, [toPos], specialMoves):
+            return None
+        return specialMoves
+
+    def getMoves(self, kind=0, legal=True):
+        """
+        Returns the moves of the player to move as a list of (fromPos, toPos, special, duel).
+        special is the special move value (see getLastMoveType) and duel is True for
+        captures the defender may start a duel on.
+        kind is ALL_MOVES, CAPTURE_MOVES (including en passant), QUIET_MOVES or
+        CHECK_MOVES (moves that check the opponent).
+        With legal=False the moves are pseudo legal: the king guard isn't checked,
+        so it can be deferred until a move is actually searched.
+        Two Kings whirlwinds aren't in the list, even for ALL_MOVES, as they move no
+        piece: try addMove(pos, pos, whirlwind=True) on each Warrior King (see perft),
+        and skipSecondTurn for a second move.
+        """
+        if self._game_result:
             return []
 
-    def addMove(self, fromPos, toPos, clearLocation=False, secondTurn=False, whirlwind=False, duel=False):
+        self.updateRoyalLocations()
+        result = []
+        for y in range(0, 8):
+            for x in range(0, 8):
+                if self.getColor(x, y) != self._turn:
+                    continue
+                if self._secondTurn and not any(var in self._board[y][x] for var in ('W', 'w', 'U', 'u')):
+                    continue
+                fromPos = (x, y)
+                moves, specialMoves = self.getPieceMoves(fromPos, guard=False)
+
+                if kind == self.CAPTURE_MOVES or kind == self.QUIET_MOVES:
+                    capture = kind == self.CAPTURE_MOVES
+                    moves = [m for m in moves
+                             if (self._board[m[1]][m[0]] != '.' or specialMoves.get(m) == self.EP_CAPTURE_MOVE) == capture]
+                if legal and moves:
+                    moves = self.checkKingGuard(fromPos, moves, specialMoves)
+                if kind == self.CHECK_MOVES:
+                    moves = [m for m in moves if self.givesCheck(fromPos, m, specialMoves)]
+
+                for m in moves:
+                    duel = False
+                    if self._board[m[1]][m[0]] != '.' and self.getColor(m[0], m[1]) != self._turn:
+                        cost = self.checkDuel(fromPos, m)
+                        duel = not (cost is True or cost is False)
+                    result.append((fromPos, m, specialMoves.get(m, self.NORMAL_MOVE), duel))
+        return result
+
+    def givesCheck(self, fromPos, toPos, specialMoves={}):
+        # plays the move on the board and returns True if it checks the
+        # opponent, then puts the position back
+        board = [row[:] for row in self._board]
+        state = (list(self._ep), self._white_king_castle, self._white_queen_castle,
+                 self._black_king_castle, self._black_queen_castle, self._fifty,
+                 self._cur_move, self._promotion_value)
+        self._cur_move = [None, None, None, False, None, None, None, None, self.NORMAL_MOVE, "", None]
+        if not self._promotion_value:
+            self._promotion_value = 1
+
+        p = self._board[fromPos[1]][fromPos[0]].upper()
+        getattr(self, 'move{}{}'.format(self.piece_to_army_dict[p].replace(" ",""), self.piece_to_name_dict[p].replace(" ","")))(fromPos, toPos, specialMoves)
+        self.updateRoyalLocations()
+
+        if self._turn == self.WHITE:
+            player = self.BLACK
+            kingPos = self._black_king_location
+            queenPos = self._black_queen_location
+            army = self._black_army
+        else:
+            player = self.WHITE
+            kingPos = self._white_king_location
+            queenPos = self._white_queen_location
+            army = self._white_army
+        check = self.isThreatened(kingPos, player)
+        if "Two Kings" in self.army_name_dict[army]:
+            check = check or self.isThreatened(queenPos, player)
+
+        for y in range(0, 8):
+            self._board[y][:] = board[y]
+        (self._ep, self._white_king_castle, self._white_queen_castle,
+         self._black_king_castle, self._black_queen_castle, self._fifty,
+         self._cur_move, self._promotion_value) = state
+        self.updateRoyalLocations()
+        return check
+
+    def getPieceMoves(self, location, guard=True):
+        # returns (moves, specialMoves) for the piece on location, for the player to move
+        x, y = location
+        p = self._board[y][x].upper()
+        if p not in self.piece_to_moves_dict:
+            return ([], {})
+        res = getattr(self, self.piece_to_moves_dict[p])(location, guard)
+        if isinstance(res, tuple):
+            return res
+        return (res, {})
+
+    def addMove(self, fromPos, toPos, clearLocation=False, secondTurn=False, whirlwind=False, duel=False, specialMoves=None, trusted=False):
         """
         Tries to move the piece located on fromPos to toPos. Returns True if that was a valid move.
         The position arguments must be tuples containing x, y value Ex. (4, 6).
-        This method also detects game over.
+        This method also detects game over, unless trusted is True (see replay).
+        A trusted move doesn't get its check mark and text notation either until
+        they're asked for, see moveTexts.
+        specialMoves is only for moves that have already been validated (see commitMove),
+        it holds the special moves of the piece and skips validating the move again.
 
         If this method returns False you can use the getReason method to determin why.
         """
         self._reason = 0
+        before = None
+        if self._listeners:
+            before = self.state2str()
         # all moves, stored to make it easier to build textmoves
-        # [piece, from, to, takes, duel, bluff, promotion, check/checkmate/midline invasion, special move]
-        # ["KQRNBPLMOGAUXTHEJC", (fx, fy), (tx, ty), True/False, [0-6, 0-6], "+-", "QRNB", "+#%", 0-7]
+        # [piece, from, to, takes, duel, bluff, promotion, check/checkmate/midline invasion, special move, disambiguation, notation]
+        # ["KQRNBPLMOGAUXTHEJC", (fx, fy), (tx, ty), True/False, [0-6, 0-6], "+-", "QRNB", "+#%", 0-7, "a-h1-8", (AN, SAN, LAN)]
         if secondTurn:
-            self._cur_move = [None, None, None, False, None, None, None, None, self.SECOND_WARRIOR_KING_MOVE]
+            self._cur_move = [None, None, None, False, None, None, None, None, self.SECOND_WARRIOR_KING_MOVE, "", None]
         else:
-            self._cur_move = [None, None, None, False, None, None, None, None, self.NORMAL_MOVE]
+            self._cur_move = [None, None, None, False, None, None, None, None, self.NORMAL_MOVE, "", None]
 
         if self._game_result:
             self._reason = self.GAME_IS_OVER
             return False
 
-        self.updateRoyalLocations()
+        # a move validated beforehand was found with the royals where they are
+        if specialMoves is None:
+            self.updateRoyalLocations()
 
         fx, fy = fromPos
         tx, ty = toPos
 
+        # tuples, as pushMove keeps the positions given, which may be lists
+        # the caller changes afterwards (like ChessClient's)
         if whirlwind:
-            self._cur_move[1] = toPos
-            self._cur_move[2] = toPos
+            self._cur_move[1] = tuple(toPos)
+            self._cur_move[2] = tuple(toPos)
         else:
-            self._cur_move[1] = fromPos
-            self._cur_move[2] = toPos
+            self._cur_move[1] = tuple(fromPos)
+            self._cur_move[2] = tuple(toPos)
 
         # if it's a whirlwind, return that before any other elements are checked.
         if whirlwind:
@@ -2498,13 +3327,15 @@ class ChessBoard:
         stone_check = self._board[ty][tx]
         if not whirlwind:
             self._cur_move[0] = p
+            if not trusted:
+                self._cur_move[9] = self.getDisambiguation(fromPos, toPos)
             if secondTurn:
-                if not self.moveTwoKingsWarriorKing((fx, fy), (tx, ty)):
+                if not self.moveTwoKingsWarriorKing((fx, fy), (tx, ty), specialMoves):
                     if not self._reason:
                         self._reason = self.INVALID_MOVE
                     return False
             else:
-                if not getattr(self, 'move{}{}'.format(self.piece_to_army_dict[p].replace(" ",""), self.piece_to_name_dict[p].replace(" ","")))((fx, fy), (tx, ty)):
+                if not getattr(self, 'move{}{}'.format(self.piece_to_army_dict[p].replace(" ",""), self.piece_to_name_dict[p].replace(" ","")))((fx, fy), (tx, ty), specialMoves):
                     if not self._reason:
                         self._reason = self.INVALID_MOVE
                     return False
@@ -2541,6 +3372,8 @@ class ChessBoard:
             if self._turn == self.WHITE:
                 self.addStones(self.WHITE, 1)
 
+        self.syncMirror()
+
         if self._turn == self.BLACK:
             curArmy = self._black_army
         else:
@@ -2560,27 +3393,79 @@ class ChessBoard:
             else:
                 self._turn = self.WHITE
 
+        if not trusted:
+            # the royals may have moved, or been moved about by the validation
+            self.updateRoyalLocations()
+            self._cur_move[7] = self.checkMark()
+            self.checkGameOver()
+            self._cur_move[10] = tuple(self.formatTextMove(self._cur_move, n) for n in (self.AN, self.SAN, self.LAN))
+
+        self.pushState()
+        self.pushMove()
+        if secondTurn:
+            self._secondTurn = False
+        self.notifyListeners(self.MOVE_EVENT, before)
+        return True
+
+    def checkMark(self):
+        # "+" if the player to move is checked, "++" if both Warrior Kings are,
+        # else None
         if self._turn == self.WHITE:
-            if "Two Kings" in self.army_name_dict[self._white_army]:
-                k, q = self.isCheck()
-                if k != q:
-                    self._cur_move[7] = "+"
-                elif k and q:
-                    self._cur_move[7] = "++"
-            else:
-                if self.isCheck():
-                    self._cur_move[7] = "+"
+            army = self._white_army
         else:
-            if "Two Kings" in self.army_name_dict[self._black_army]:
-                k, q = self.isCheck()
-                if k != q:
-                    self._cur_move[7] = "+"
-                elif k and q:
-                    self._cur_move[7] = "++"
-            else:
-                if self.isCheck():
-                    self._cur_move[7] = "+"
+            army = self._black_army
+        if "Two Kings" in self.army_name_dict[army]:
+            k, q = self.isCheck()
+            if k != q:
+                return "+"
+            elif k and q:
+                return "++"
+        elif self.isCheck():
+            return "+"
+        return None
+
+    def describeMoves(self, indices):
+        # fills in the disambiguation, check mark and text notation of the
+        # moves at indices that were made trusted (see addMove), by going
+        # back to the states before and after each of them
+        saved = self.beginPerft()
+        try:
+            for index in indices:
+                move = self._moves[index]
+                self._state_stack_pointer = index + 1
+                self.loadCurState()
+                self.updateRoyalLocations()
+                if move[1] != move[2]:
+                    # the mover, the turn can be off after a skipped second move
+                    self._turn = self.getColor(*move[1])
+                    move[9] = self.getDisambiguation(move[1], move[2])
+                self._state_stack_pointer = index + 2
+                self.loadCurState()
+                self.updateRoyalLocations()
+                if move[7] is None:
+                    if self._game_result in (self.WHITE_MATE, self.BLACK_MATE):
+                        move[7] = "#"
+                    elif self._game_result in (self.WHITE_MIDLINE_INVASION, self.BLACK_MIDLINE_INVASION):
+                        move[7] = "%"
+                    else:
+                        move[7] = self.checkMark()
+                move[10] = tuple(self.formatTextMove(move, n) for n in (self.AN, self.SAN, self.LAN))
+        finally:
+            self.endPerft(saved)
 
+    def moveTexts(self, index):
+        """
+        Returns the (AN, SAN, LAN) texts of the move at index (from 0) of the game.
+        A move made trusted (see replay) only gets them the first time they're asked for.
+        """
+        move = self._moves[index]
+        if move[10] is None:
+            self.describeMoves([index])
+        return move[10]
+
+    def checkGameOver(self):
+        # ends the game after a move if the player to move is mated or
+        # stalemated, by the fifty moves rule, three repetitions or a midline invasion
         if not self.hasAnyValidMoves():
             if self.isCheck():
                 self._cur_move[7] = "#"
@@ -2602,12 +3487,6 @@ class ChessBoard:
                 else:
                     self.endGame(self.BLACK_MIDLINE_INVASION)
 
-        self.pushState()
-        self.pushMove()
-        if secondTurn:
-            self._secondTurn = False
-        return True
-
     def getLastMoveType(self):
         """
         Returns a value that indicates if the last move was a "special move".
@@ -2624,11 +3503,8 @@ class ChessBoard:
         if self._state_stack_pointer <= 1:  # No move has been done at thos pointer
             return -1
 
-        self.undo()
-        move = self._moves[self._state_stack_pointer - 1]
-        res = move[6]
-        self.redo()
-        return res
+        move = self._moves[self._state_stack_pointer - 2]
+        return move[6]
 
     def getLastMove(self):
         """
@@ -2640,81 +3516,174 @@ class ChessBoard:
         if self._state_stack_pointer <= 1:  # No move has been done at thos pointer
             return None
 
-        self.undo()
-        move = self._moves[self._state_stack_pointer - 1]
-        res = (move[1], move[2])
-        self.redo()
-        return res
+        move = self._moves[self._state_stack_pointer - 2]
+        return (move[1], move[2])
 
     def checkTextMove(self, txt):
         """
-        Adds a move using several different standards of the Algebraic chess notation.
+        Checks a move using several different standards of the Algebraic chess notation.
         AN Examples: 'e2e4' 'f1d1' 'd7-d8' 'g1-f3'
         SAN Examples: 'e4' 'Rfxd1' 'd8=Q' 'Nxf3+'
         LAN Examples: 'Pe2e4' 'Rf1xd1' 'Pd7d8=Q' 'Ng1xf3+'
+        Returns False if the move can't be made, True if it can, or the cost
+        of the duel if the defender may start one.
+        """
+        prepared = self.prepareTextMove(txt)
+        if not prepared:
+            return False
+
+        if prepared.promotionPiece:
+            self.setPromotion(prepared.promotionPiece)
+
+        if not prepared.duel:
+            return True
+        return prepared.cost
+
+    def prepareTextMove(self, txt):
+        """
+        Resolves a move in Algebraic chess notation without making it.
+        Returns a PreparedMove holding the origin, destination, piece, if a duel
+        can be started and its cost, and if a promotion must be chosen.
+        Pass it to commitMove to make the move.
+        Returns None if the move can't be made. Use getReason to find out why.
         """
         res = self.parseTextMove(txt)
         if not res:
             self._reason = self.INVALID_MOVE
-            return False
+            return None
         else:
             piece, fx, fy, tx, ty, promo = res
 
-        if promo:
-            self.setPromotion(promo)
+        if piece is not None:
+            piece = self.reversePieceNames(piece)
 
-        piece = self.reversePieceNames(piece)
-        if self._secondTurn:
-            if piece == None:
-                self._reason = self.INVALID_MOVE
-                return False
-            elif not any(var in piece for var in ('W', 'w', 'U', 'u')):
-                self._reason = self.INVALID_MOVE
-                return False
+        toPos = (tx, ty)
+        found = self.findTextMoveOrigin(piece, fx, fy, toPos)
+        if not found:
+            return None
+        fromPos, specialMoves = found
 
-        if piece is not None:
-            if self._turn == self.BLACK:
-                piece = piece.lower()
+        p = self._board[fromPos[1]][fromPos[0]]
+        if self._secondTurn and not any(var in p for var in ('W', 'w', 'U', 'u')):
+            self._reason = self.INVALID_MOVE
+            return None
 
-        move_to = None
-        move_from = None
-        found_move = False
-        if fx > -1 and fy > -1:
-            vm = self.getValidMoves((fx, fy))
-            for m in vm:
-                if m[0] == tx and m[1] == ty:
-                    if found_move:
-                        self._reason = self.AMBIGUOUS_MOVE
-                        return False
-                    found_move = True
-                    move_from = (fx, fy)
-                    move_to = (tx, ty)
-        else:
-            for y in range(8):
-                for x in range(8):
-                    if self._board[y][x] == piece:
-                        vm = self.getValidMoves((x, y))
-                        for m in vm:
-                            if m[0] == tx and m[1] == ty:
-                                if found_move:
-                                    self._reason = self.AMBIGUOUS_MOVE
-                                    return False
-                                found_move = True
-                                move_from = (x, y)
-                                move_to = (tx, ty)
-
-        if found_move:
-            if self._board[ty][tx] == ".":
-                return True
-            elif any(var in self._board[move_from[1]][move_from[0]] for var in ("H", "E")) and self._board[ty][tx].isupper():
-                return True
-            elif any(var in self._board[move_from[1]][move_from[0]] for var in ("h", "e")) and self._board[ty][tx].islower():
-                return True
+        duel = False
+        cost = 0
+        target = self._board[ty][tx]
+        if target != "." and not (any(var in p for var in ("H", "E", "h", "e")) and self.getColor(tx, ty) == self._turn):
+            cost = self.checkDuel(fromPos, toPos)
+            if cost is True or cost is False:
+                cost = 0
             else:
-                return self.checkDuel(move_from, move_to)
+                duel = True
 
-        self._reason = self.INVALID_MOVE
-        return False
+        if self._turn == self.WHITE:
+            last_row = 0
+        else:
+            last_row = 7
+        promotion = any(var in p for var in ('P', 'p', 'L', 'l')) and ty == last_row
+
+        return PreparedMove(fromPos, toPos, p, specialMoves, duel, cost,
+                            promotion, promo, self._secondTurn, self._turn,
+                            self._state_stack[self._state_stack_pointer - 1])
+
+    def commitMove(self, prepared, duel=None, promotion=None):
+        """
+        Makes a move resolved by prepareTextMove without resolving it again.
+        Returns True if the move was made, see getReason if not.
+        duel is (attacking bid, defending bid, bluff) if the defender started a duel,
+        with bluff "+" to gain a stone, "-" to make the defender lose one or None.
+        promotion is the piece to promote to (QRNB) if the move promotes a pawn.
+        The move is refused if the position changed after it was prepared.
+        """
+        if (prepared.state != self._state_stack[self._state_stack_pointer - 1] or
+                prepared.turn != self._turn or prepared.secondTurn != self._secondTurn):
+            self._reason = self.INVALID_MOVE
+            return False
+
+        if promotion is None:
+            promotion = prepared.promotionPiece
+        if promotion:
+            self.setPromotion(promotion)
+
+        clearLocation = False
+        if duel:
+            if not prepared.duel:
+                self._reason = self.INVALID_DUEL
+                return False
+            attacking_bid, defending_bid, bluff = duel
+            # the attacking piece is lost too if the defender outbids it
+            clearLocation = defending_bid > attacking_bid
+            duel = (prepared.cost, attacking_bid, defending_bid, bluff)
+
+        return self.addMove(prepared.fromPos, prepared.toPos, clearLocation=clearLocation,
+                            secondTurn=prepared.secondTurn, duel=duel, specialMoves=prepared.specialMoves)
+
+    def findTextMoveOrigin(self, piece, fx, fy, toPos):
+        # returns (location, specialMoves) for the one location piece can legally
+        # move to toPos from, using the file and rank hints (-1 if not given).
+        # A piece of None means whatever stands on (fx, fy). Sets the reason and
+        # returns None if there is no such location or more than one.
+        if self._game_result:
+            self._reason = self.GAME_IS_OVER
+            return None
+
+        found = self.pickTextMoveOrigin(self.textMoveCandidates(piece, fx, fy, toPos), fx, fy, toPos)
+        if not found and piece is not None and piece.upper() in ('P', 'L'):
+            # SAN used to write the moves of a C king without a letter, like a
+            # pawn's, so the king is tried when no pawn, or more than one pawn
+            # (which would have been disambiguated), can make the move
+            king = self.reversePieceNames('K')
+            if king == 'C':
+                byKing = self.pickTextMoveOrigin(self.attackersTo(toPos, king, self._turn), fx, fy, toPos)
+                if byKing:
+                    found = byKing
+
+        if found is False:
+            self._reason = self.AMBIGUOUS_MOVE
+            return None
+        if not found:
+            self._reason = self.INVALID_MOVE
+        return found
+
+    def textMoveCandidates(self, piece, fx, fy, toPos):
+        # the locations piece could move to toPos from, before the hints and
+        # legality are checked. A piece of None means whatever stands on (fx, fy)
+        candidates = []
+        if piece is None:
+            if self.getColor(fx, fy) == self._turn:
+                candidates.append((fx, fy))
+        else:
+            for p in self.textMovePieces(piece):
+                candidates.extend(self.attackersTo(toPos, p, self._turn))
+        return candidates
+
+    def textMoveOrigins(self, candidates, fx, fy, toPos):
+        # yields (location, specialMoves) for every candidate location that
+        # matches the hints and can legally move to toPos
+        for origin in candidates:
+            if fx > -1 and fx != origin[0]:
+                continue
+            if fy > -1 and fy != origin[1]:
+                continue
+            moves, specialMoves = self.getPieceMoves(origin, guard=False)
+            if toPos not in moves:
+                continue
+            if not self.checkKingGuard(origin, [toPos], specialMoves):
+                continue
+            yield (origin, specialMoves)
+
+    def pickTextMoveOrigin(self, candidates, fx, fy, toPos):
+        # returns (location, specialMoves) for the one candidate location that
+        # matches the hints and can legally move to toPos, None if there is
+        # none and False if there is more than one
+        found = None
+        for origin in self.textMoveOrigins(candidates, fx, fy, toPos):
+            if found:
+                return False
+            found = origin
+        return found
 
     def addTextMove(self, txt, clearLocation=False, secondTurn=False, whirlwind=False, duel=None):
         res = self.parseTextMove(txt)
@@ -2742,35 +3711,342 @@ class ChessBoard:
                 self._reason = self.INVALID_MOVE
                 return False
 
-        if self._turn == self.BLACK:
-            piece = piece.lower()
-
-        move_to = None
-        move_from = None
-        found_move = False
-        for y in range(8):
-            for x in range(8):
-                if self._board[y][x] == piece:
-                    if fx > -1 and fx != x:
-                        continue
-                    if fy > -1 and fy != y:
-                        continue
-                    vm = self.getValidMoves((x, y))
-                    for m in vm:
-                        if m[0] == tx and m[1] == ty:
-                            if found_move:
-                                self._reason = self.AMBIGUOUS_MOVE
-                                return False
-                            found_move = True
-                            move_from = (x, y)
-                            move_to = (tx, ty)
         if whirlwind:
             return self.addMove((fx, fy), (tx, ty), secondTurn=secondTurn, whirlwind=whirlwind)
-        elif found_move:
-            return self.addMove(move_from, move_to, clearLocation=clearLocation, secondTurn=secondTurn, duel=duel)
 
-        self._reason = self.INVALID_MOVE
-        return False
+        found = self.findTextMoveOrigin(piece, fx, fy, (tx, ty))
+        if not found:
+            return False
+        move_from, specialMoves = found
+        return self.addMove(move_from, (tx, ty), clearLocation=clearLocation, secondTurn=secondTurn, duel=duel, specialMoves=specialMoves)
+
+    def replay(self, moves, trusted=True, validate=False):
+        """
+        Plays a list of text moves, as written by getAllTextMoves, from the current position.
+        A duel follows its move as "[white bid-black bid]" with "+" or "-" for a called bluff,
+        a second Warrior King move starts with "..." (Ex. "... Kd7").
+        Older SAN without the K of a C king (Ex. "e2") is read as a king move when
+        no pawn, or more than one, can make it (see findTextMoveOrigin).
+        Older SAN also left out the hint of a move that more than one piece could
+        make (Ex. "Bb3" for Bcb3): each of them is tried, and the one the most of
+        the following moves replay from is kept, see pickReplayedOrigin.
+        With trusted=True the moves are taken to be valid: they're neither checked for
+        legality nor for game over, and their check marks and text notation are only
+        worked out when asked for (see moveTexts). Pass validate=True to check the last move and the
+        game over state of the final position anyway.
+        Returns True if every move was played, see getReason if not.
+        """
+        moves = [m.strip() for m in moves if m.strip() not in ("", "...")]
+        for i, txt in enumerate(moves):
+            check = not trusted or (validate and i == len(moves) - 1)
+            if not self.replayMove(txt, check, moves[i + 1:]):
+                return False
+        return True
+
+    def replayMove(self, txt, check, rest=(), origin=None):
+        # plays one move of replay, checked for legality if check is True.
+        # rest are the moves after it, to pick the piece of a move older SAN
+        # wrote without the hint it needed. origin is where the piece stands,
+        # if it's known already
+        move = txt
+        secondTurn = txt.startswith("...")
+        if secondTurn:
+            txt = txt[3:].strip()
+        elif self._secondTurn:
+            # the Warrior King skipped its second move
+            self.skipSecondTurn()
+
+        duel = None
+        if "[" in txt:
+            txt, bids = txt.split("[", 1)
+            bids = bids.strip(" ]")
+            if self._turn == self.WHITE:
+                attacking_bid, defending_bid = int(bids[0]), int(bids[2])
+            else:
+                defending_bid, attacking_bid = int(bids[0]), int(bids[2])
+            duel = (attacking_bid, defending_bid, bids[3:] or None)
+
+        res = self.parseTextMove(txt)
+        if not res:
+            self._reason = self.INVALID_MOVE
+            return False
+        piece, fx, fy, tx, ty, promo = res
+        toPos = (tx, ty)
+
+        if promo:
+            self.setPromotion(promo)
+
+        # Nemesis pawns move towards the royals
+        self.updateRoyalLocations()
+
+        if piece is None and (fx, fy) == toPos:
+            return self.addMove(toPos, toPos, secondTurn=secondTurn, whirlwind=True)
+
+        if origin is not None:
+            fromPos = origin
+        elif piece is None:
+            fromPos = (fx, fy)
+        else:
+            piece = self.reversePieceNames(piece)
+            candidates = []
+            if not check:
+                candidates = [a for a in self.attackersTo(toPos, piece, self._turn)
+                              if (fx < 0 or a[0] == fx) and (fy < 0 or a[1] == fy)]
+            if len(candidates) == 1:
+                fromPos = candidates[0]
+            else:
+                found = self.findTextMoveOrigin(piece, fx, fy, toPos)
+                if found:
+                    fromPos = found[0]
+                elif self._reason == self.AMBIGUOUS_MOVE:
+                    fromPos = self.pickReplayedOrigin(move, piece, fx, fy, toPos, rest)
+                    if fromPos is None:
+                        return False
+                else:
+                    return False
+
+        specialMoves = None
+        if not check:
+            specialMoves = self.getMoveSpecials(fromPos, toPos)
+            if specialMoves is None:
+                self._reason = self.INVALID_MOVE
+                return False
+
+        clearLocation = False
+        if duel:
+            cost = self.checkDuel(fromPos, toPos)
+            if cost is True or cost is False:
+                cost = 0
+            attacking_bid, defending_bid, bluff = duel
+            clearLocation = defending_bid > attacking_bid
+            duel = (cost, attacking_bid, defending_bid, bluff)
+
+        return self.addMove(fromPos, toPos, clearLocation=clearLocation, secondTurn=secondTurn,
+                            duel=duel, specialMoves=specialMoves, trusted=not check)
+
+    def pickReplayedOrigin(self, move, piece, fx, fy, toPos, rest):
+        # returns the location piece moves to toPos from in move, a move of
+        # replay more than one piece can make, or None. SAN used to look for
+        # ambiguity after the move, so it left out the hint when the other piece
+        # could no longer get there. Which piece moved can't be told from the
+        # move, so each one is tried with the moves after it, checked for
+        # legality, and the one the most of them replay from is kept, the first
+        # one if several replay them all
+        best = None
+        most = -1
+        for origin, specialMoves in list(self.textMoveOrigins(
+                self.textMoveCandidates(piece, fx, fy, toPos), fx, fy, toPos)):
+            saved = self.beginPerft()
+            try:
+                if not self.replayMove(move, True, origin=origin):
+                    continue
+                start = self._state_stack_pointer
+                if self.replay(rest, trusted=False, validate=True):
+                    played = len(rest) + 1
+                else:
+                    played = self._state_stack_pointer - start
+            finally:
+                self.endPerft(saved)
+            if played > most:
+                best = origin
+                most = played
+        if best is None:
+            self._reason = self.AMBIGUOUS_MOVE
+        return best
+
+    def perft(self, depth, duels=False, table=None):
+        """
+        Counts the positions depth turns ahead with the full rules of the board:
+        every army, each promotion piece, Elephant rampages, and games ended by
+        mate or midline invasion stop early. A Two Kings turn is its first move
+        followed by a second Warrior King move, a whirlwind or a skip.
+        With duels=True a capture that can be dueled also branches on every
+        duel the defender can start (see getDuelBids).
+        Pass a dict as table to keep the count of every subtree by position and
+        depth, so transpositions are only counted once. It's emptied when it
+        holds perft_table_size counts, and can be passed again for the same
+        duels. A position is stored without the moves that
+        led to it, so threefold repetitions inside the search aren't seen.
+        The board is put back as it was afterwards.
+        """
+        saved = self.beginPerft()
+        try:
+            return self.perftNodes(depth, duels, table)
+        finally:
+            self.endPerft(saved)
+
+    def divide(self, depth, duels=False, table=None, turns=None):
+        """
+        Returns perft split over the turns of the player to move, as a list of
+        (turn, positions) with the turn in long algebraic notation.
+        The turns are always in the same order. turns is a collection of
+        indices into that order to count only those, to split the work.
+        """
+        saved = self.beginPerft()
+        try:
+            results = []
+            index = 0
+            for text in self.perftActions(duels, depth > 1, True):
+                if self._secondTurn and not self._game_result:
+                    for second in self.perftActions(duels, depth > 1, True):
+                        if turns is None or index in turns:
+                            results.append(("{} {}".format(text, second), self.perftNodes(depth - 1, duels, table)))
+                        index += 1
+                else:
+                    if turns is None or index in turns:
+                        results.append((text, self.perftNodes(depth - 1, duels, table)))
+                    index += 1
+            return results
+        finally:
+            self.endPerft(saved)
+
+    def beginPerft(self):
+        # saves what playing through the moves changes, see endPerft
+        saved = (self._listeners, self._turn, self._secondTurn, self._stack_second_turns, self._promotion_value,
+                 self._cur_move, self._reason, self._state_stack_pointer, list(self._state_stack),
+                 list(self._three_rep_stack), list(self._moves))
+        self._listeners = ()
+        return saved
+
+    def endPerft(self, saved):
+        # puts back the board saved by beginPerft
+        (self._listeners, turn, self._secondTurn, self._stack_second_turns, self._promotion_value,
+         self._cur_move, self._reason, self._state_stack_pointer, self._state_stack,
+         self._three_rep_stack, self._moves) = saved
+        self.loadCurState()
+        # a skipped second move isn't in the states
+        self._turn = turn
+        self.updateRoyalLocations()
+
+    def perftNodes(self, depth, duels, table=None):
+        # counts the positions depth turns ahead, see perft
+        if depth == 0:
+            return 1
+        if self._game_result:
+            return 0
+
+        if table is not None:
+            # the state string of the position is on the stack already, the
+            # turn goes with it as a skipped second move isn't in the states.
+            # The last turn is looked up too, most transpositions are found there
+            key = (self._state_stack[self._state_stack_pointer - 1], self._turn, self._secondTurn, depth, duels)
+            if key in table:
+                return table[key]
+
+        if depth == 1 and not self._secondTurn and self.turnArmy() != self.TWOKINGS:
+            # the last turn only needs counting
+            nodes = sum(len(self.perftOptions(fromPos, toPos, duel, duels))
+                        for fromPos, toPos, special, duel in self.getMoves())
+        else:
+            nodes = 0
+            for text in self.perftActions(duels, depth > 1):
+                if self._secondTurn and not self._game_result:
+                    nodes += self.perftNodes(depth, duels, table)
+                else:
+                    nodes += self.perftNodes(depth - 1, duels, table)
+
+        if table is not None:
+            if len(table) >= self.perft_table_size:
+                # emptied rather than trimmed, as finding the first key of a
+                # dict gets slower with every key deleted from its front
+                table.clear()
+            table[key] = nodes
+        return nodes
+
+    def perftOptions(self, fromPos, toPos, duel, duels):
+        # the (promotion, duel) ways to play a move, see perftActions
+        promotions = [None]
+        if self._board[fromPos[1]][fromPos[0]].upper() in ('P', 'L') and toPos[1] in (0, 7):
+            promotions = ['Q', 'R', 'N', 'B']
+        bids = [None]
+        if duel and duels:
+            bids += self.getDuelBids()
+        return [(promotion, bid) for promotion in promotions for bid in bids]
+
+    def perftActions(self, duels, expand=True, texts=False):
+        # plays every move, whirlwind and skip of the player to move in turn,
+        # putting the board back after each one, and yields its text if texts
+        # is True, else None. The moves come validated from getMoves and are
+        # made trusted: game over is only looked for if expand is True or a
+        # second move follows, the last turn of a perft is only counted
+        if self._game_result:
+            return
+        # undo takes the turn from the states, which don't know of a skipped
+        # second move, so it's put back by hand
+        turn = self._turn
+        secondTurn = self._secondTurn
+        for fromPos, toPos, special, duel in self.getMoves():
+            for promotion, bid in self.perftOptions(fromPos, toPos, duel, duels):
+                if promotion:
+                    self.setPromotion(promotion)
+                clearLocation = False
+                if bid:
+                    cost = self.checkDuel(fromPos, toPos)
+                    attacking_bid, defending_bid, bluff = bid
+                    clearLocation = defending_bid > attacking_bid
+                    bid = (cost, attacking_bid, defending_bid, bluff)
+                if self.addMove(fromPos, toPos, clearLocation=clearLocation, secondTurn=secondTurn, duel=bid,
+                                specialMoves={toPos: special}, trusted=True):
+                    if expand or self._secondTurn:
+                        self.checkGameOver()
+                    text = None
+                    if texts:
+                        text = self.moveTexts(len(self._moves) - 1)[self.LAN]
+                        if bid:
+                            text += "[{}-{}{}]".format(bid[1], bid[2], bid[3] or "")
+                    yield text
+                    self.undo()
+                    self._turn = turn
+                    self._secondTurn = secondTurn
+
+        if self.turnArmy() != self.TWOKINGS:
+            return
+        for y in range(0, 8):
+            for x in range(0, 8):
+                if self.getColor(x, y) == self._turn and self._board[y][x].upper() in ('W', 'U'):
+                    if self.addMove((x, y), (x, y), secondTurn=secondTurn, whirlwind=True, trusted=True):
+                        if expand or self._secondTurn:
+                            self.checkGameOver()
+                        yield "{}{}{}".format(self._board[y][x].upper(), "abcdefgh"[x], "87654321"[y])
+                        self.undo()
+                        self._turn = turn
+                        self._secondTurn = secondTurn
+        if secondTurn:
+            # the Warrior King skips its second move
+            self._secondTurn = False
+            if turn == self.WHITE:
+                self._turn = self.BLACK
+            else:
+                self._turn = self.WHITE
+            yield "--"
+            self._turn = turn
+            self._secondTurn = secondTurn
+
+    def turnArmy(self):
+        # the army of the player to move
+        if self._turn == self.BLACK:
+            return self._black_army
+        return self._white_army
+
+    def getDuelBids(self):
+        """
+        Returns every (attacking bid, defending bid, bluff) a duel against the
+        player to move can be fought with: each side bids up to 2 stones and no
+        more than it has, and when both bid nothing the bluff is "+" or "-".
+        """
+        if self._turn == self.WHITE:
+            attacking, defending = self._white_stones, self._black_stones
+        else:
+            attacking, defending = self._black_stones, self._white_stones
+        bids = []
+        for attacking_bid in range(min(2, attacking) + 1):
+            for defending_bid in range(min(2, defending) + 1):
+                if attacking_bid == 0 and defending_bid == 0:
+                    bids.append((0, 0, "+"))
+                    bids.append((0, 0, "-"))
+                else:
+                    bids.append((attacking_bid, defending_bid, None))
+        return bids
 
     def getAllTextMoves(self, notation=1):
         """
@@ -2782,29 +4058,27 @@ class ChessBoard:
 
         res = []
 
-        point = self._state_stack_pointer
-
-        self.gotoFirst()
-        while True:
-            if self._state_stack_pointer > len(self._state_stack) - 1:
-                break
-            move = self._moves[self._state_stack_pointer - 1]
+        # the notation of every move is stored when it's made, or when it's
+        # first asked for if the move was trusted
+        played = self._moves[:len(self._state_stack) - 1]
+        missing = [i for i, move in enumerate(played) if move[10] is None]
+        if missing:
+            self.describeMoves(missing)
+        for move in played:
+            text = move[10][notation]
             if move[0].isupper():
                 if move[8] == self.SECOND_WARRIOR_KING_MOVE:
                     res.append(self.notation_dict[notation])
-                    res.append("$" + str(self.formatTextMove(move, notation)))
+                    res.append("$" + text)
                 else:
-                    res.append(self.formatTextMove(move, notation))
+                    res.append(text)
             else:
                 if move[8] == self.SECOND_WARRIOR_KING_MOVE:
-                    res.append("$" + str(self.formatTextMove(move, notation)))
+                    res.append("$" + text)
                     res.append(self.notation_dict[notation])
                 else:
-                    res.append(self.formatTextMove(move, notation))
-            self.redo()
+                    res.append(text)
 
-        self._state_stack_pointer = point
-        self.loadCurState()
         moves = []
         length = 0
         for x, y in self.grouped(res, 2):
@@ -2830,11 +4104,7 @@ class ChessBoard:
         if self._state_stack_pointer <= 1:  # No move has been done at this pointer
             return None
 
-        self.undo()
-        move = self._moves[self._state_stack_pointer - 1]
-        res = self.formatTextMove(move, notation)
-        self.redo()
-        return res
+        return self.moveTexts(self._state_stack_pointer - 2)[notation]
 
     def printBoard(self):
         """
@@ -2855,3 +4125,89 @@ class ChessBoard:
         board.append("White stones: {}".format(self._white_stones))
         board.append("Black stones: {}".format(self._black_stones))
         return board
+
+    def getMemoryUsage(self):
+        """
+        Returns the bytes held by the history of the game, measured with
+        sys.getsizeof over everything the stacks hold:
+        {"state_stack": bytes, "three_rep_stack": bytes, "moves": bytes, "total": bytes}.
+        An object held by more than one of them, like an interned string, is
+        only counted in the first.
+        """
+        seen = set()
+        usage = {}
+        usage["state_stack"] = deepSizeOf(self._state_stack, seen)
+        usage["three_rep_stack"] = deepSizeOf(self._three_rep_stack, seen)
+        usage["moves"] = deepSizeOf(self._moves, seen)
+        usage["total"] = usage["state_stack"] + usage["three_rep_stack"] + usage["moves"]
+        return usage
+
+    def getStats(self):
+        """
+        Returns the calls and time spent in the methods of stats_methods since the
+        board was made or resetStats was called, when counting is on (see __init__):
+        {method: {army name: {piece: {"calls": calls, "seconds": seconds}}}}.
+        The piece is the one on the square the call was about, "." for an empty
+        square, or "-" for methods not about a square, which are counted for
+        the army to move. Times include the calls made inside.
+        Returns an empty dict when counting is off.
+        """
+        result = {}
+        if not self._stats:
+            return result
+        for name, counts in self._stats.items():
+            armies = result.setdefault(name, {})
+            for (army, piece), (calls, seconds) in counts.items():
+                armies.setdefault(self.army_name_dict.get(army, "-"), {})[piece] = {"calls": calls, "seconds": seconds}
+        return result
+
+    def resetStats(self):
+        """
+        Starts counting from zero again, see getStats.
+        """
+        if self._stats is not None:
+            self._stats = {}
+
+
+def countedMethod(name, method):
+    # wraps a ChessBoard method to count its calls and time by army and
+    # piece, see ChessBoard.getStats
+    square = name in ChessBoard.stats_square_methods
+    clock = time.perf_counter
+
+    def counted(self, *args, **kwargs):
+        if square and args:
+            x, y = args[0]
+            piece = self._board[y][x]
+            if piece == '.':
+                army = self._black_army if self._turn == self.BLACK else self._white_army
+            elif piece.isupper():
+                army = self._white_army
+            else:
+                army = self._black_army
+            key = (army, piece.upper())
+        else:
+            key = (self._black_army if self._turn == self.BLACK else self._white_army, '-')
+        start = clock()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            counts = self._stats.setdefault(name, {})
+            entry = counts.get(key)
+            if entry is None:
+                counts[key] = entry = [0, 0.0]
+            entry[0] += 1
+            entry[1] += clock() - start
+
+    counted.__name__ = name
+    counted.__doc__ = method.__doc__
+    return counted
+
+
+class CountingChessBoard(ChessBoard):
+    # a ChessBoard counting the calls of its hot paths, made by ChessBoard(stats=True)
+    pass
+
+
+for name in ChessBoard.stats_methods:
+    setattr(CountingChessBoard, name, countedMethod(name, getattr(ChessBoard, name)))
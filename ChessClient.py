@@ -1,6 +1,8 @@
 ﻿#/usr/bin/env python
 
 from ChessBoard import ChessBoard
+import ChessProfile
+import argparse
 
 import os
 import pygame
@@ -14,32 +16,32 @@ class ChessClient:
     def mainLoop(self):
         pygame.init()
 
-        print "White Player, choose an army:"
-        print "1. Classic   2. Nemesis   3. Reaper"
-        print "4. Empowered 5. Two Kings 6. Animals"
+        print("White Player, choose an army:")
+        print("1. Classic   2. Nemesis   3. Reaper")
+        print("4. Empowered 5. Two Kings 6. Animals")
         while True:
-            userInput = raw_input('Type the number, not the name:')
+            userInput = input('Type the number, not the name:')
             if userInput in string.digits:
                 if int(userInput) < 7:
                     if int(userInput) > 0:
                         break
-                print 'Please enter only one of the above.'
+                print('Please enter only one of the above.')
             else:
-                print 'Please enter only one character'
+                print('Please enter only one character')
         wArmy = userInput
 
-        print "Black Player, choose an army:"
-        print "1. Classic   2. Nemesis   3. Reaper"
-        print "4. Empowered 5. Two Kings 6. Animals"
+        print("Black Player, choose an army:")
+        print("1. Classic   2. Nemesis   3. Reaper")
+        print("4. Empowered 5. Two Kings 6. Animals")
         while True:
-            userInput = raw_input('Type the number, not the name:')
+            userInput = input('Type the number, not the name:')
             if userInput in string.digits:
                 if int(userInput) < 7:
                     if int(userInput) > 0:
                         break
-                print 'Please enter only one of the above.'
+                print('Please enter only one of the above.')
             else:
-                print 'Please enter only one of the above.'
+                print('Please enter only one of the above.')
         bArmy = userInput
 
         pieces = {}
@@ -59,23 +61,20 @@ class ChessClient:
 
         # file names format:
         # (army color)(piece letter)(background color).png
-        # white background
+        # in the folder of the army, without spaces
+        colors = ("w", "b")
         for img in chess.piece_to_army_dict:
-            for color in chess.color_dict:
-                for back in chess.color_dict:
-                    if color == 0:
-                        pieces[back][img] = pygame.image.load(
-                            "./img/" +
-                            chess.piece_to_army_dict[img] + "/" +
-                            chess.color_dict[color] + img.lower() +
-                            chess.color_dict[back] + ".png")
+            folder = chess.piece_to_army_dict[img].replace(" ", "")
+            for color in (chess.WHITE, chess.BLACK):
+                for back in (chess.WHITE, chess.BLACK):
+                    if color == chess.WHITE:
+                        piece = img
                     else:
-                        img = img.lower()
-                        pieces[back][img] = pygame.image.load(
-                            "./img/" +
-                            chess.piece_to_army_dict[img.upper()] + "/" +
-                            chess.color_dict[color] + img +
-                            chess.color_dict[back] + ".png")
+                        piece = img.lower()
+                    pieces[back][piece] = pygame.image.load(
+                        "./img/" + folder + "/" +
+                        colors[color] + img.lower() +
+                        colors[back] + ".png")
 
         clock = pygame.time.Clock()
 
@@ -101,19 +100,22 @@ class ChessClient:
                     elif event.key == K_RIGHT:
                         chess.redo()
                     elif event.unicode in ("f", "F"):
-                        print chess.getFEN()
+                        print(chess.getFEN())
                     elif event.unicode in ("a", "A"):
                         an = chess.getAllTextMoves(chess.AN)
                         if an:
-                            print "AN: " + ", ".join(an)
+                            for length, x, y in an:
+                                print("{}. {} {}".format(length, x, y))
                     elif event.unicode in ("s", "S"):
                         san = chess.getAllTextMoves(chess.SAN)
                         if san:
-                            print "SAN: " + ", ".join(san)
+                            for length, x, y in san:
+                                print("{}. {} {}".format(length, x, y))
                     elif event.unicode in ("l", "L"):
                         lan = chess.getAllTextMoves(chess.LAN)
                         if lan:
-                            print "LAN: " + ", ".join(lan)
+                            for length, x, y in lan:
+                                print("{}. {} {}".format(length, x, y))
                     board = chess.getBoard()
                     turn = chess.getTurn()
                     markPos[0] = -1
@@ -123,8 +125,8 @@ class ChessClient:
                     if event.type == MOUSEMOTION:
                         mx = event.pos[0]
                         my = event.pos[1]
-                        mousePos[0] = mx / 60
-                        mousePos[1] = my / 60
+                        mousePos[0] = mx // 60
+                        mousePos[1] = my // 60
                     elif event.type == MOUSEBUTTONDOWN:
                         if mousePos[0] != -1:
                             if markPos[0] == mousePos[0] and markPos[1] == mousePos[1]:
@@ -146,7 +148,7 @@ class ChessClient:
                                             chess.setPromotion(chess.QUEEN)
                                             res = chess.addMove(markPos, mousePos)
                                         if res:
-                                            print chess.getLastTextMove(chess.SAN)
+                                            print(chess.getLastTextMove(chess.SAN))
                                             board = chess.getBoard()
                                             turn = chess.getTurn()
                                             chess.updateRoyalLocations()
@@ -160,7 +162,7 @@ class ChessClient:
                                             chess.setPromotion(chess.QUEEN)
                                             res = chess.addMove(markPos, mousePos)
                                         if res:
-                                            print chess.getLastTextMove(chess.SAN)
+                                            print(chess.getLastTextMove(chess.SAN))
                                             board = chess.getBoard()
                                             turn = chess.getTurn()
                                             chess.updateRoyalLocations()
@@ -169,7 +171,7 @@ class ChessClient:
                                             pieceSelected = None
 
                 if chess.isGameOver():
-                    pygame.display.set_caption("Game Over! %s" % chess.game_result_dict[chess.getGameResult()])
+                    pygame.display.set_caption("Game Over! %s" % chess.game_result_list[chess.getGameResult()])
                     validMove = []
                     markPos[0] = -1
                     markPos[1] = -1
@@ -199,8 +201,11 @@ class ChessClient:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Play Chess 2 with pygame.")
+    ChessProfile.addProfileArguments(parser, "ChessClient")
+    args = parser.parse_args()
     g = ChessClient()
-    g.mainLoop()
+    ChessProfile.runSession(g.mainLoop, args)
 
 #this calls the 'main' function when this script is executed
 if __name__ == '__main__':
@@ -0,0 +1,272 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessIndex is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Indexes the games of a PGN file, so any game can be read or the games of
+# an army pairing found without reading the file again. The index is kept
+# next to the file, in FILE.idx: 19 bytes per game with its byte offset and
+# length, armies, result and date. A file that only grew since (see
+# ChessPGN.PGNWriter) is indexed from its last game on.
+#
+#   python ChessIndex.py archive.pgn                    # build or refresh the index
+#   python ChessIndex.py archive.pgn --game 1234        # print game 1234
+#   python ChessIndex.py archive.pgn -w T -b A --result 0-1
+
+import argparse
+import io
+import mmap
+import os
+import re
+import struct
+import sys
+import numpy as np
+from ChessBoard import ChessBoard
+from ChessPerft import parseArmy
+from ChessPGN import parseArmyName, readGames
+
+# the record of a game in the index
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    # the armies, 0 for a White or Black tag that isn't one
+    ("white", "u1"),
+    ("black", "u1"),
+    ("result", "u1"),
+    # YYYYMMDD, with 0 for the parts of the date that aren't known
+    ("date", "<u4")])
+
+# magic, version, size and modification time in ns of the PGN file, games
+INDEX_HEADER = struct.Struct("<4sHQQQ")
+INDEX_MAGIC = b"C2PI"
+INDEX_VERSION = 2
+
+# the results in the order of their codes in the index
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+
+# a tag line, at the start of a line
+tag_re = re.compile(rb'\[[ \t]*(\w+)[ \t]+"([^\r\n]*)"[ \t]*\][ \t]*(?:\r?\n|\r?\Z)')
+
+
+def indexPath(path):
+    # the index file of a PGN file
+    return path + ".idx"
+
+
+def parseDate(date):
+    # YYYYMMDD of a Date tag, with 0 for the unknown parts ("2014.??.??")
+    parts = (date.split(".") + ["", "", ""])[:3]
+    value = 0
+    for part, scale in zip(parts, (10000, 100, 1)):
+        if part.isdigit():
+            value += int(part) * scale
+    return value
+
+
+def scanGames(mm, start=0):
+    # the index records of the games of a mapped PGN file from byte start on.
+    # A game starts with its tags and ends where the tags of the next one
+    # start. Only the lines starting with "[" are looked at
+    def nextLine(pos):
+        found = mm.find(b"\n[", pos)
+        return found + 1 if found >= 0 else -1
+
+    games = []
+    tags_end = -1
+    line = start
+    if mm[start:start + 1] != b"[" or (start and mm[start - 1:start] != b"\n"):
+        line = nextLine(start)
+    while line >= 0:
+        match = tag_re.match(mm, line)
+        if match:
+            if line != tags_end:
+                games.append([line, match.end()])
+            tags_end = games[-1][1] = match.end()
+        line = nextLine(line)
+    records = []
+    parsed = {}
+    for n, (first, end) in enumerate(games):
+        last = games[n + 1][0] if n + 1 < len(games) else len(mm)
+        records.append(gameRecord(mm, first, end, last, parsed))
+    return records
+
+
+def gameRecord(mm, start, tags_end, end, parsed):
+    # the index record of the game from start to end whose tags end at tags_end.
+    # parsed holds the armies and dates of the tags already seen, archives
+    # repeat the same few
+    values = {}
+    for name, value in tag_re.findall(mm[start:tags_end]):
+        values[name.decode("ascii")] = value.decode("utf-8", "replace")
+    # the result ending the moves is the one to go by, some writers leave the
+    # Result tag at "*"
+    tail = mm[max(tags_end, end - 16):end].split()
+    result = values.get("Result", "*")
+    if tail and tail[-1].decode("ascii", "replace") in RESULTS:
+        result = tail[-1].decode("ascii")
+    if result not in RESULTS:
+        result = "*"
+    tags = (values.get("White", ""), values.get("Black", ""), values.get("Date", ""))
+    if tags not in parsed:
+        parsed[tags] = (parseArmyName(tags[0]) or 0, parseArmyName(tags[1]) or 0, parseDate(tags[2]))
+    white, black, date = parsed[tags]
+    return (start, end - start, white, black, RESULTS.index(result), date)
+
+
+def buildIndex(path, previous=None):
+    """
+    Scans a PGN file once through mmap and writes its index next to it.
+    previous are the records of an index of the file before it grew: the
+    games before the last of them are kept and the file is only scanned from
+    there. Returns the records, an array of INDEX_DTYPE.
+    """
+    stat = os.stat(path)
+    kept = np.zeros(0, dtype=INDEX_DTYPE)
+    records = []
+    if stat.st_size:
+        start = 0
+        if previous is not None and len(previous):
+            # the last game may have been unfinished
+            kept = np.array(previous[:-1])
+            start = int(previous[-1]["offset"])
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                records = scanGames(mm, start)
+            finally:
+                mm.close()
+    index = np.concatenate([kept, np.array(records, dtype=INDEX_DTYPE)])
+
+    with open(indexPath(path), "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size, stat.st_mtime_ns, len(index)))
+        f.write(index.tobytes())
+    return index
+
+
+def loadIndex(path):
+    # (size, modification time, records) of the index of a PGN file, the
+    # records mapped from the index file, or None if there's no usable one
+    try:
+        with open(indexPath(path), "rb") as f:
+            header = f.read(INDEX_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < INDEX_HEADER.size:
+        return None
+    magic, version, size, mtime, count = INDEX_HEADER.unpack(header)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        return None
+    if not count:
+        return size, mtime, np.zeros(0, dtype=INDEX_DTYPE)
+    records = np.memmap(indexPath(path), dtype=INDEX_DTYPE, mode="r", offset=INDEX_HEADER.size, shape=(count,))
+    return size, mtime, records
+
+
+class PGNIndex:
+    """
+    The games of a PGN file by number, from 0, through the index next to it.
+    The index is built if there's none and brought up to date if the file
+    changed: only the new part is scanned if the file grew.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        loaded = loadIndex(path)
+        if loaded is None:
+            self.records = buildIndex(path)
+        else:
+            size, mtime, records = loaded
+            if size == stat.st_size and mtime == stat.st_mtime_ns:
+                self.records = records
+            elif size < stat.st_size:
+                self.records = buildIndex(path, records)
+            else:
+                self.records = buildIndex(path)
+
+    def __len__(self):
+        return len(self.records)
+
+    def getText(self, n):
+        """
+        Returns the PGN text of game n, read from its offset in the file.
+        """
+        record = self.records[n]
+        with open(self.path, "rb") as f:
+            f.seek(int(record["offset"]))
+            return f.read(int(record["length"])).decode("utf-8", "replace")
+
+    def getGame(self, n):
+        """
+        Returns game n as a PGNGame, see ChessPGN.readGames.
+        """
+        return next(readGames(io.StringIO(self.getText(n))))
+
+    def find(self, white=None, black=None, result=None, since=None, until=None):
+        """
+        Returns the numbers of the games with the given armies, result ("1-0",
+        ...) and dates from since to until (YYYYMMDD, inclusive), all of them
+        if none are given. Only the index is read.
+        """
+        match = np.ones(len(self.records), dtype=bool)
+        if white is not None:
+            match &= self.records["white"] == white
+        if black is not None:
+            match &= self.records["black"] == black
+        if result is not None:
+            match &= self.records["result"] == RESULTS.index(result)
+        if since is not None:
+            match &= self.records["date"] >= since
+        if until is not None:
+            match &= self.records["date"] <= until
+        return np.nonzero(match)[0].tolist()
+
+    def pairings(self):
+        """
+        Returns {(white army, black army): games} for the whole file.
+        """
+        counts = {}
+        pairs = self.records["white"].astype(np.int32) * 8 + self.records["black"]
+        for pair, count in zip(*np.unique(pairs, return_counts=True)):
+            counts[(int(pair) // 8, int(pair) % 8)] = int(count)
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index of the games of a PGN file, for random access.")
+    parser.add_argument("pgn", help="PGN file, indexed in PGN.idx")
+    parser.add_argument("--game", type=int, help="print this game, from 1")
+    parser.add_argument("-w", "--white", type=parseArmy, help="list the games of this white army, 1-6 or CNERTA")
+    parser.add_argument("-b", "--black", type=parseArmy, help="list the games of this black army, 1-6 or CNERTA")
+    parser.add_argument("--result", choices=RESULTS, help="list the games with this result")
+    args = parser.parse_args(argv)
+
+    index = PGNIndex(args.pgn)
+    if args.game is not None:
+        if not 1 <= args.game <= len(index):
+            print("{} has {} games".format(args.pgn, len(index)))
+            return 1
+        print(index.getText(args.game - 1).rstrip())
+        return 0
+
+    if args.white or args.black or args.result:
+        for n in index.find(args.white, args.black, args.result):
+            record = index.records[n]
+            print("{:>8} {:<10} {:<10} {:<8} {:>8} {:>12}".format(
+                n + 1, ChessBoard.army_name_dict.get(int(record["white"]), "?"),
+                ChessBoard.army_name_dict.get(int(record["black"]), "?"),
+                RESULTS[int(record["result"])], int(record["date"]) or "?", int(record["offset"])))
+        return 0
+
+    print("{} games in {}".format(len(index), args.pgn))
+    for (white, black), count in sorted(index.pairings().items()):
+        print("{:<10} {:<10} {:>8}".format(ChessBoard.army_name_dict.get(white, "?"),
+                                           ChessBoard.army_name_dict.get(black, "?"), count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessMemory is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Replays a game from a PGN file and reports the memory its ChessBoard holds,
+# and optionally the size of the sunfish transposition table after a search
+# from the same armies. A game that stops before its end is reported, with
+# the figures of the moves that were replayed, and the exit status is 1.
+#
+#   python ChessMemory.py E-TK.pgn         # all 37 moves
+#   python ChessMemory.py games.pgn --game 3 --sunfish 20000
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tracemalloc
+from itertools import islice
+from ChessBoard import ChessBoard
+from ChessPGN import gameArmies, readGames, replayGame
+
+
+def sunfishUsage(wArmy, bArmy, nodes):
+    # (entries, bytes, most entries) of the sunfish transposition table after
+    # a search of about nodes nodes from the start position of the armies
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sunfish"))
+    import sunfish
+    sunfish.tp.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sunfish.search(sunfish.initialPosition(wArmy, bArmy), nodes)
+    entries, size = sunfish.tableMemoryUsage()
+    return entries, size, sunfish.TABLE_SIZE
+
+
+def perPly(size, plies):
+    # size / plies, or 0 before the first move
+    if not plies:
+        return 0.0
+    return size / plies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory held by a replayed Chess 2 game and by the sunfish table.")
+    parser.add_argument("pgn", help="PGN file to replay")
+    parser.add_argument("--game", type=int, default=1, help="which game of the file, from 1")
+    parser.add_argument("--sunfish", type=int, metavar="NODES",
+                        help="also search this many nodes with sunfish and size its transposition table")
+    args = parser.parse_args(argv)
+
+    game = next(islice(readGames(args.pgn), args.game - 1, None), None)
+    if game is None:
+        print("{} has fewer than {} games".format(args.pgn, args.game))
+        return 1
+    wArmy, bArmy = gameArmies(game)
+    if wArmy is None or bArmy is None:
+        print("Game {} of {} has an unknown army: White {!r}, Black {!r}".format(
+            args.game, args.pgn, game.tags.get("White", ""), game.tags.get("Black", "")))
+        return 1
+
+    tracemalloc.start()
+    board, played = replayGame(game)
+    allocated, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    plies = len(board._moves)
+    usage = board.getMemoryUsage()
+    print("{} vs {}, {} of {} moves replayed".format(
+        ChessBoard.army_name_dict[wArmy], ChessBoard.army_name_dict[bArmy], plies, len(game.moves)))
+    if not played:
+        print("Stopped at {!r}: {}".format(game.moves[plies].text if plies < len(game.moves) else "",
+                                          ChessBoard.move_reason_list[board.getReason()]))
+        print("The figures are for the {} moves replayed, not the whole game.".format(plies))
+    print("")
+    print("{:<18} {:>12} {:>12}".format("", "bytes", "bytes/ply"))
+    for name in ("state_stack", "three_rep_stack", "moves", "total"):
+        print("{:<18} {:>12} {:>12.0f}".format(name, usage[name], perPly(usage[name], plies)))
+    print("{:<18} {:>12} {:>12.0f}".format("tracemalloc", allocated, perPly(allocated, plies)))
+    print("{:<18} {:>12}".format("tracemalloc peak", peak))
+
+    if args.sunfish:
+        entries, size, table_size = sunfishUsage(wArmy, bArmy, args.sunfish)
+        print("")
+        print("sunfish table: {} entries, {} bytes, {:.0f} bytes/entry".format(entries, size, perPly(size, entries)))
+        print("at TABLE_SIZE ({:.0f} entries): about {:.0f} MB".format(
+            table_size, perPly(size, entries) * table_size / 2 ** 20))
+    return 0 if played else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,464 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessPGN is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Reads Chess 2 PGN files one game at a time, so files of any size can be
+# read in the memory of their longest game, and writes them a move at a time
+# as the games are played.
+#
+# On top of the usual PGN, Chess 2 games have
+#   duels after their capture:          dxe4 [2-2], Bxd5 [0-1+]
+#       the bids of white and black, and "+" or "-" if the bluff was called
+#   Warrior King second moves:          1. e4 d5 1. ... Kd7    (black moves twice)
+#                                       1. d4 ... 1. Qd2 d5    (white moves twice)
+#       "..." stands for the move the other player didn't make
+#   whirlwinds of a Warrior King:       kxg4, qxe5
+#   midline invasions:                  Qf4%
+#
+#   for game in readGames("E-TK.pgn"):
+#       print(game.tags["White"], len(game.moves), game.result)
+#   for game, board, ok in replayGames("E-TK.pgn"):
+#       ...
+#
+#   writer = PGNWriter("games.pgn")
+#   writer.follow(board)        # every move made on board is written as it's made
+#   ...
+#   writer.endGame()            # the result of board, then on to the next game
+
+import os
+import re
+import time
+from collections import OrderedDict, namedtuple
+from ChessBoard import ChessBoard
+
+# A move of a PGN game: its move number, the color that made it, the move as
+# written without its mark and duel, True for the second move of a Two Kings
+# turn, True for a whirlwind, the duel as (white bid, black bid, "+", "-" or
+# None for the bluff) or None, and its mark: "+", "#", "%" or ""
+PGNMove = namedtuple('PGNMove', 'number color text secondTurn whirlwind duel mark')
+
+# A game of a PGN file: its tags in file order, its PGNMoves and the result
+# at the end of the moves ("*" if there's none)
+PGNGame = namedtuple('PGNGame', 'tags moves result')
+
+tag_re = re.compile(r'^\[\s*(\w+)\s+"(.*)"\s*\]\s*$')
+
+token_re = re.compile(r"""
+    (?P<comment>\{[^}]*\}|;[^\n]*)
+  | (?P<duel>\[[^\]]*\])
+  | (?P<result>1-0|0-1|1/2-1/2|\*)(?=\s|$)
+  | (?P<number>\d+)(?P<dots>\.+)
+  | (?P<skip>\.{3,})
+  | (?P<nag>\$\d+|[!?]+)
+  | (?P<variation>[()])
+  | (?P<move>[^\s\[\]{}();]+)
+""", re.X)
+
+duel_re = re.compile(r"^\[\s*(\d)\s*-\s*(\d)\s*([+-]?)\s*\]$")
+
+whirlwind_re = re.compile(r"^[kq]x?([a-h][1-8])$")
+
+
+def parseMovetext(text):
+    """
+    Returns (moves, result) of the moves of a game: a list of PGNMoves and the
+    result at the end, "*" if there's none. Comments, NAGs and variations are
+    left out.
+    """
+    # a promotion is written "e8 = Q" by ChessBoard.getAllTextMoves
+    text = re.sub(r"\s*=\s*", "=", text)
+    moves = []
+    result = "*"
+    number = 1
+    color = ChessBoard.WHITE
+    depth = 0
+    # the number of moves when "..." followed a white move, see legacySecondMove
+    skipped = None
+    for m in token_re.finditer(text):
+        kind = m.lastgroup
+        if kind == "dots":
+            kind = "number"
+        if kind == "variation":
+            depth += 1 if m.group() == "(" else -1
+            continue
+        if depth > 0 or kind in ("comment", "nag"):
+            continue
+
+        if kind == "number":
+            legacySecondMove(moves, skipped, int(m.group("number")))
+            number = int(m.group("number"))
+            color = ChessBoard.WHITE
+            if len(m.group("dots")) >= 3:
+                color = ChessBoard.BLACK
+        elif kind == "skip":
+            if moves and moves[-1].color == ChessBoard.WHITE and color == ChessBoard.BLACK:
+                skipped = len(moves)
+            color = ChessBoard.BLACK if color == ChessBoard.WHITE else ChessBoard.WHITE
+        elif kind == "duel":
+            duel = duel_re.match(m.group())
+            if duel and moves:
+                moves[-1] = moves[-1]._replace(duel=(int(duel.group(1)), int(duel.group(2)), duel.group(3) or None))
+        elif kind == "result":
+            legacySecondMove(moves, skipped, None)
+            result = m.group()
+        else:
+            text = m.group().rstrip("!?")
+            mark = ""
+            while text and text[-1] in "+#%":
+                if not mark:
+                    mark = text[-1]
+                text = text[:-1].rstrip("!?")
+            if not text:
+                # a mark written apart from its move
+                if moves and mark:
+                    moves[-1] = moves[-1]._replace(mark=mark)
+                continue
+            secondTurn = bool(moves) and moves[-1].color == color
+            whirlwind = whirlwind_re.match(text) is not None
+            moves.append(PGNMove(number, color, text, secondTurn, whirlwind, None, mark))
+            if color == ChessBoard.WHITE:
+                color = ChessBoard.BLACK
+            else:
+                color = ChessBoard.WHITE
+                number += 1
+    return moves, result
+
+
+def legacySecondMove(moves, skipped, number):
+    # older PGN wrote the second move of black as a white move of the next
+    # number followed by "...", "11. Bxb4 Kg4 12. kxg4 ... 13. Rg3+" for
+    # "11. Bxb4 Kg4 11. ... kxg4 12. Rg3+". A player can't skip a turn, so when
+    # "..." after a white move isn't followed by a second white move of the same
+    # number (number is None at the result), the move is made black's second one
+    if skipped is None or skipped != len(moves) or skipped < 2:
+        return
+    if number is not None and number == moves[-1].number:
+        return
+    before = moves[-2]
+    if before.color != ChessBoard.BLACK or before.secondTurn:
+        return
+    moves[-1] = moves[-1]._replace(number=before.number, color=ChessBoard.BLACK, secondTurn=True)
+
+
+def parseArmyName(name):
+    """
+    Returns the army of a White or Black tag, by name ("Two Kings",
+    "TwoKings") or letter (CNERTA), Classic if the tag is empty, or None
+    if it isn't an army.
+    """
+    name = name.replace(" ", "").lower()
+    if not name:
+        return ChessBoard.CLASSIC
+    for army, army_name in ChessBoard.army_name_dict.items():
+        if army_name.replace(" ", "").lower() == name:
+            return army
+    return ChessBoard.army_abr_dict.get(name.upper())
+
+
+def gameArmies(game):
+    """
+    Returns (white army, black army) of a PGNGame, from its White and Black tags,
+    with None for a tag that isn't an army (see parseArmyName).
+    """
+    return parseArmyName(game.tags.get("White", "")), parseArmyName(game.tags.get("Black", ""))
+
+
+def readGames(source):
+    """
+    Yields the PGNGames of a PGN file, given its path or an open text file,
+    one at a time: only the game being read is kept in memory.
+    A game ends with its result, or where the tags of the next game or the
+    file start.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            for game in readGames(f):
+                yield game
+        return
+
+    tags = OrderedDict()
+    movetext = []
+    blank = False
+    for line in source:
+        line = line.strip()
+        if not line:
+            blank = True
+            continue
+        # a "%" in the first column escapes the line
+        if line.startswith("%"):
+            continue
+        tag = tag_re.match(line)
+        if tag:
+            # the tags of the next game, after moves or a game without any
+            if movetext or (tags and blank):
+                yield makeGame(tags, movetext)
+                tags = OrderedDict()
+                movetext = []
+            tags[tag.group(1)] = tag.group(2).replace('\\"', '"').replace("\\\\", "\\")
+            blank = False
+            continue
+        movetext.append(line)
+        if line.split()[-1] in ChessBoard.pgn_result_list:
+            yield makeGame(tags, movetext)
+            tags = OrderedDict()
+            movetext = []
+        blank = False
+    if tags or movetext:
+        yield makeGame(tags, movetext)
+
+
+def makeGame(tags, movetext):
+    # the PGNGame of the tags and movetext lines of a game
+    moves, result = parseMovetext("\n".join(movetext))
+    return PGNGame(tags, moves, result)
+
+
+def replayText(move):
+    # the text of a PGNMove as ChessBoard.replay takes it
+    text = move.text + move.mark
+    if move.whirlwind:
+        # from and to the square of the Warrior King
+        text = whirlwind_re.match(move.text).group(1) * 2
+    if move.secondTurn:
+        text = "... " + text
+    if move.duel:
+        text = "{} [{}-{}{}]".format(text, move.duel[0], move.duel[1], move.duel[2] or "")
+    return text
+
+
+def gameBoard(game):
+    """
+    Returns a new ChessBoard of the armies of a PGNGame, set up from its FEN
+    tag if it has one. Raises ValueError if the White or Black tag isn't an army.
+    """
+    white, black = gameArmies(game)
+    if white is None or black is None:
+        raise ValueError("unknown army: White {!r}, Black {!r}".format(game.tags.get("White", ""),
+                                                                     game.tags.get("Black", "")))
+    board = ChessBoard(white, black)
+    if "FEN" in game.tags:
+        board.setFEN(game.tags["FEN"])
+    return board
+
+
+def replayGame(game, trusted=False):
+    """
+    Plays the moves of a PGNGame on a new ChessBoard of its armies, from its
+    FEN tag if it has one, and returns (board, ok). ok is True if every move
+    was played, if not the board is left after the last move that was and
+    board.getReason says why the next one wasn't. With trusted=True the moves
+    are taken to be legal (see ChessBoard.replay), but the last one and the
+    result of the game are still checked.
+    Raises ValueError if the White or Black tag isn't an army.
+    """
+    board = gameBoard(game)
+    ok = board.replay([replayText(move) for move in game.moves], trusted=trusted, validate=True)
+    return board, ok
+
+
+def boardTags(board, **tags):
+    """
+    Returns the tags of a game played on board: the seven tags of a PGN game
+    with the armies as White and Black, updated with the keyword arguments.
+    """
+    result = OrderedDict()
+    result["Event"] = "?"
+    result["Site"] = "?"
+    result["Date"] = time.strftime("%Y.%m.%d")
+    result["Round"] = "-"
+    result["White"] = board.army_name_dict[board._white_army]
+    result["Black"] = board.army_name_dict[board._black_army]
+    result["Result"] = board.pgn_result_list[board.getGameResult()]
+    result.update(tags)
+    return result
+
+
+class PGNWriter:
+    """
+    Writes Chess 2 games to a PGN file or stream as they are played: the tags
+    when a game begins, each move as soon as it's made, in the notation of
+    ChessBoard.getAllTextMoves, and the result when the game ends. Nothing is
+    written twice, so a move costs the same at the end of a long game as at
+    its start. Any number of games can be written one after the other.
+    out is a path, which is appended to, or an open text stream. The stream is
+    flushed after every move unless flush is False. Lines are wrapped at width.
+    The Result tag is written with room for any result and filled in when the
+    game ends. Streams that can't be written back to (opened to append, or not
+    seekable) get each game whole when it ends instead.
+    """
+
+    def __init__(self, out, notation=ChessBoard.SAN, width=80, flush=True):
+        self.owned = isinstance(out, str)
+        if self.owned:
+            # not "a": the Result tag is written back to
+            out = open(out, "r+" if os.path.exists(out) else "w+")
+            out.seek(0, os.SEEK_END)
+        self.out = out
+        self.notation = notation
+        self.width = width
+        self.flush = flush
+        self.board = None
+        # the move number and the color of the last move, None between games
+        self.number = None
+        self.last = None
+        self.column = 0
+        # the position of the Result tag in the file and the room for its value,
+        # or the text of the game so far if it can't be written back to
+        self.result_at = None
+        self.result_width = 0
+        self.held = None
+        try:
+            self.seekable = out.seekable() and "a" not in getattr(out, "mode", "")
+        except (AttributeError, ValueError):
+            self.seekable = False
+
+    def beginGame(self, tags, number=1):
+        """
+        Writes the tags of a new game, a dict or a list of (name, value). The
+        first move gets the given move number. An unfinished game is ended
+        with "*" first.
+        """
+        if self.number is not None:
+            self.endGame("*")
+        if isinstance(tags, dict):
+            tags = tags.items()
+        self.result_at = None
+        self.held = None
+        if not self.seekable:
+            self.held = []
+        for name, value in tags:
+            if name == "Result":
+                self.result_width = max(len(result) for result in ChessBoard.pgn_result_list + [str(value)])
+                if self.held is None:
+                    self.result_at = self.out.tell()
+                else:
+                    self.result_at = len(self.held)
+                self.output(self.resultTag(value))
+                continue
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            self.output('[{} "{}"]\n'.format(name, value))
+        self.output("\n")
+        self.number = number
+        self.last = None
+        self.column = 0
+
+    def writeMove(self, text, color, secondTurn=False):
+        """
+        Writes a move made by color, written as text (with its duel, if any).
+        secondTurn is True for the second move of a Two Kings turn.
+        """
+        if color == ChessBoard.WHITE:
+            if secondTurn:
+                text = "... {}. {}".format(self.number, text)
+            else:
+                if self.last is not None:
+                    self.number += 1
+                text = "{}. {}".format(self.number, text)
+        elif secondTurn:
+            text = "{}. ... {}".format(self.number, text)
+        elif self.last is None:
+            text = "{}... {}".format(self.number, text)
+        self.last = color
+        self.write(text)
+
+    def addBoardMove(self, board):
+        """
+        Writes the move just made on board.
+        """
+        move = board._moves[board._state_stack_pointer - 2]
+        # the turn has passed unless a Warrior King moves next
+        color = board._turn
+        if not board._secondTurn:
+            color = ChessBoard.BLACK if color == ChessBoard.WHITE else ChessBoard.WHITE
+        self.writeMove(board.moveTexts(board._state_stack_pointer - 2)[self.notation], color, move[8] == board.SECOND_WARRIOR_KING_MOVE)
+
+    def follow(self, board, tags=None):
+        """
+        Begins a game with the given tags (see boardTags for the default) and
+        writes every move made on board from now on, until endGame.
+        Undone moves aren't taken back from the file.
+        """
+        self.beginGame(tags or boardTags(board))
+        self.board = board
+        board.addListener(self.onBoardEvent)
+
+    def onBoardEvent(self, board, diff):
+        # the listener of a followed board, see ChessBoard.addListener
+        if diff.event == board.MOVE_EVENT:
+            self.addBoardMove(board)
+
+    def endGame(self, result=None):
+        """
+        Ends the game with its result, by default the result of the followed
+        board or "*". The moves end with the result and a blank line.
+        """
+        if self.board is not None:
+            self.board.removeListener(self.onBoardEvent)
+            if result is None:
+                result = self.board.pgn_result_list[self.board.getGameResult()]
+            self.board = None
+        if result is None:
+            result = "*"
+        self.write(result)
+        self.output("\n\n")
+        if self.result_at is not None and len(result) <= self.result_width:
+            if self.held is None:
+                self.out.seek(self.result_at)
+                self.out.write(self.resultTag(result))
+                self.out.seek(0, os.SEEK_END)
+            else:
+                self.held[self.result_at] = self.resultTag(result)
+        if self.held is not None:
+            self.out.write("".join(self.held))
+            self.held = None
+        self.out.flush()
+        self.result_at = None
+        self.number = None
+        self.last = None
+
+    def resultTag(self, result):
+        # the Result tag line, padded so any result fits in its place
+        tag = '[Result "{}"]'.format(result)
+        return tag + " " * (self.result_width - len(result)) + "\n"
+
+    def output(self, text):
+        # writes text to the stream, or keeps it until the game ends
+        if self.held is None:
+            self.out.write(text)
+        else:
+            self.held.append(text)
+
+    def write(self, text):
+        # writes a move or result, on a new line if it doesn't fit on this one
+        if self.column and self.column + 1 + len(text) > self.width:
+            self.output("\n")
+            self.column = 0
+        elif self.column:
+            self.output(" ")
+            self.column += 1
+        self.output(text)
+        self.column += len(text)
+        if self.flush and self.held is None:
+            self.out.flush()
+
+    def close(self):
+        """
+        Ends an unfinished game and closes the file if the writer opened it.
+        """
+        if self.number is not None:
+            self.endGame()
+        if self.owned:
+            self.out.close()
+
+
+def replayGames(source, trusted=False):
+    """
+    Yields (game, board, ok) for every game of a PGN file, see readGames and replayGame.
+    """
+    for game in readGames(source):
+        board, ok = replayGame(game, trusted)
+        yield game, board, ok
@@ -0,0 +1,134 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessPerft is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Counts the positions a number of turns ahead with ChessBoard.perft and
+# reports how fast they were found.
+#
+#   python ChessPerft.py 3
+#   python ChessPerft.py -w T -b A --divide 2
+#   python ChessPerft.py --fen "Tc 31 rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b kq - 1 2" 2
+#   python ChessPerft.py --all --jobs 8 --hash 6
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from itertools import repeat
+from ChessBoard import ChessBoard
+
+
+def parseArmy(army):
+    # an army number from 1-6 or its letter (CNERTA)
+    if army.isdigit() and 1 <= int(army) <= 6:
+        return int(army)
+    if army.upper() in ChessBoard.army_abr_dict:
+        return ChessBoard.army_abr_dict[army.upper()]
+    raise argparse.ArgumentTypeError("unknown army: {}".format(army))
+
+
+def countTurns(board, depth, duels, hashed, turns):
+    # counts the root turns with the given indices in a worker process, see parallelDivide
+    table = None
+    if hashed:
+        table = {}
+    return turns, board.divide(depth, duels, table, set(turns))
+
+
+def parallelDivide(board, depth, duels=False, hashed=False, jobs=None):
+    """
+    Returns the same list as board.divide, with the turns of the player to
+    move dealt out to jobs processes (default one per CPU). With hashed=True
+    every process keeps a perft table (see ChessBoard.perft).
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    count = len(board.divide(1, duels))
+    if jobs < 2 or depth < 2 or count < 2:
+        table = None
+        if hashed:
+            table = {}
+        return board.divide(depth, duels, table)
+
+    snapshot = copy(board)
+    snapshot._listeners = ()
+    jobs = min(jobs, count)
+    # every job gets turns from all over the list, the first ones tend to be pawn moves
+    chunks = [list(range(i, count, jobs)) for i in range(jobs)]
+    results = [None] * count
+    with ProcessPoolExecutor(jobs) as pool:
+        for turns, counted in pool.map(countTurns, repeat(snapshot), repeat(depth), repeat(duels),
+                                       repeat(hashed), chunks):
+            for i, result in zip(turns, counted):
+                results[i] = result
+    return results
+
+
+def runPerft(board, depth, duels=False, divide=False, hashed=False, jobs=1):
+    """
+    Runs perft (or divide) on board and returns (positions, seconds, divide),
+    divide being the list of ChessBoard.divide or None.
+    With jobs above 1 the turns are counted in that many processes, see parallelDivide.
+    """
+    start = time.time()
+    if divide or jobs != 1:
+        results = parallelDivide(board, depth, duels, hashed, jobs)
+        nodes = sum(n for text, n in results)
+    else:
+        table = None
+        if hashed:
+            table = {}
+        nodes = board.perft(depth, duels, table)
+    if not divide:
+        results = None
+    return nodes, time.time() - start, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chess 2 perft with the ChessBoard rules.")
+    parser.add_argument("depth", type=int, help="turns to look ahead")
+    parser.add_argument("-w", "--white", type=parseArmy, default=ChessBoard.CLASSIC, help="white army, 1-6 or CNERTA")
+    parser.add_argument("-b", "--black", type=parseArmy, default=ChessBoard.CLASSIC, help="black army, 1-6 or CNERTA")
+    parser.add_argument("--fen", help="start from this Chess 2 FEN instead")
+    parser.add_argument("--duels", action="store_true", help="branch on every duel of a capture")
+    parser.add_argument("--divide", action="store_true", help="count the positions below each turn")
+    parser.add_argument("--hash", action="store_true", help="count transpositions once, see ChessBoard.perft")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="processes to count in, 0 for one per CPU")
+    parser.add_argument("--all", action="store_true", help="run every pairing of the six armies")
+    args = parser.parse_args(argv)
+    jobs = args.jobs or None
+
+    if args.all:
+        print("{:<10} {:<10} {:>14} {:>10} {:>12}".format("White", "Black", "Positions", "Time", "Positions/s"))
+        for white in range(1, 7):
+            for black in range(1, 7):
+                board = ChessBoard(white, black)
+                nodes, seconds, results = runPerft(board, args.depth, args.duels, False, args.hash, jobs)
+                print("{:<10} {:<10} {:>14} {:>9.3f}s {:>12.0f}".format(
+                    ChessBoard.army_name_dict[white], ChessBoard.army_name_dict[black],
+                    nodes, seconds, nodes / seconds if seconds else 0))
+        return 0
+
+    board = ChessBoard(args.white, args.black)
+    if args.fen:
+        board.setFEN(args.fen)
+
+    nodes, seconds, results = runPerft(board, args.depth, args.duels, args.divide, args.hash, jobs)
+    if results is not None:
+        for text, n in results:
+            print("{}: {}".format(text, n))
+        print("")
+    print("Positions: {}".format(nodes))
+    print("Time: {:.3f}s".format(seconds))
+    print("Positions/s: {:.0f}".format(nodes / seconds if seconds else 0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
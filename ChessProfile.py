@@ -0,0 +1,102 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessProfile is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Profiles a whole session of ChessText, ChessClient or sunfish, see their
+# --profile option and SUNFISH_PROFILE. On exit it writes
+#   PREFIX.pstats     cProfile statistics, for pstats or snakeviz
+#   PREFIX.collapsed  sampled stacks, one "outer;inner count" line per stack,
+#                     for flamegraph.pl, speedscope or inferno
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stack of one thread every interval seconds from a daemon
+    thread and counts the collapsed stacks. Stacks stop at the frame running
+    stop_code, so the profiling itself doesn't show up.
+    """
+
+    def __init__(self, thread_id, interval=0.001, stop_code=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_code = stop_code
+        self.stacks = Counter()
+        self.running = True
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                code = frame.f_code
+                stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.join()
+
+    def writeCollapsed(self, path):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write("{} {}\n".format(stack, count))
+
+
+def profileCall(func, prefix, deterministic=True, interval=0.001):
+    """
+    Calls func under the profilers and returns what it returns. The files are
+    written however func ends, sys.exit and Ctrl-C included.
+    With deterministic=False only the stacks are sampled, which slows the
+    session down much less but writes no pstats file.
+    """
+    sampler = StackSampler(threading.current_thread().ident, interval, sys._getframe().f_code)
+    profiler = None
+    if deterministic:
+        profiler = cProfile.Profile()
+    sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+        sampler.stop()
+        written = []
+        if profiler:
+            profiler.dump_stats(prefix + ".pstats")
+            written.append(prefix + ".pstats")
+        sampler.writeCollapsed(prefix + ".collapsed")
+        written.append(prefix + ".collapsed")
+        sys.stderr.write("Profile written to {}\n".format(", ".join(written)))
+
+
+def addProfileArguments(parser, prefix):
+    # adds the --profile and --sample options of a session to parser, see runSession
+    parser.add_argument("--profile", nargs="?", const=prefix, metavar="PREFIX",
+                        help="profile the session, writing PREFIX.pstats and PREFIX.collapsed (default {})".format(prefix))
+    parser.add_argument("--sample", action="store_true",
+                        help="with --profile, only sample the stacks: lighter, but no pstats file")
+
+
+def runSession(func, args):
+    # calls func, profiled if the --profile option was given
+    if args.profile:
+        return profileCall(func, args.profile, not args.sample)
+    return func()
@@ -0,0 +1,286 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessStress is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Plays random legal games with ChessBoard for every pairing of the six
+# armies and reports how fast they went and anything that went wrong.
+# The games only depend on the seed, so runs can be compared between commits.
+#
+#   python ChessStress.py
+#   python ChessStress.py --games 20 --plies 300 --seed 7
+#   python ChessStress.py -w T -b A --games 1
+#   python ChessStress.py --pgn          # also write every game as PGN and replay it,
+#                                        # and replay the sample games of SAMPLES
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import traceback
+from ChessBoard import ChessBoard
+from ChessPerft import parseArmy
+from ChessPGN import PGNWriter, boardTags, readGames, replayGame
+
+# PGN files of older SAN that must replay in full with the right result, see checkSamples
+SAMPLES = (os.path.join(os.path.dirname(os.path.abspath(__file__)), "E-TK.pgn"),)
+
+
+class TimedChessBoard(ChessBoard):
+    # a ChessBoard that times its game over checks
+
+    check_time = 0.0
+    check_count = 0
+
+    def checkGameOver(self):
+        start = time.perf_counter()
+        try:
+            ChessBoard.checkGameOver(self)
+        finally:
+            self.check_time += time.perf_counter() - start
+            self.check_count += 1
+
+
+class PairingStats:
+    # the timings of one army pairing, see stressPairing
+
+    def __init__(self, white, black):
+        self.white = white
+        self.black = black
+        self.games = 0
+        self.plies = 0
+        self.seconds = 0.0
+        self.move_time = 0.0
+        self.move_count = 0
+        self.valid_time = 0.0
+        self.valid_count = 0
+        self.check_time = 0.0
+        self.check_count = 0
+        # (game seed, ply, FEN, traceback) of every game that raised
+        self.errors = []
+        # (game seed, ply, FEN, move) of every valid move addMove refused
+        self.refused = []
+        # (game seed, why) of every game whose PGN didn't replay, see checkPGN
+        self.pgn_failed = []
+
+
+def gameSeed(seed, white, black, game):
+    # the seed of one game, from the seed of the run
+    return ((seed * 6 + white - 1) * 6 + black - 1) * 100000 + game
+
+
+def safeFEN(board):
+    # the FEN of the board, or its state string if there isn't one
+    try:
+        return board.getFEN()
+    except Exception:
+        return board.state2str()
+
+
+def playRandomGame(board, rnd, plies, stats, seed):
+    # plays up to plies random legal moves, with the occasional duel, whirlwind
+    # and skipped second move, and adds the timings to stats
+    for ply in range(plies):
+        if board.isGameOver():
+            return ply
+        # like ChessText, the Nemesis pawns need to know where the royals are
+        board.updateRoyalLocations()
+
+        squares = [(x, y) for y in range(8) for x in range(8) if board.getColor(x, y) == board.getTurn()]
+        if board._secondTurn:
+            squares = [s for s in squares if board._board[s[1]][s[0]].upper() in ('W', 'U')]
+
+        candidates = []
+        for fromPos in squares:
+            start = time.perf_counter()
+            moves = board.getValidMoves(fromPos)
+            stats.valid_time += time.perf_counter() - start
+            stats.valid_count += 1
+            candidates.extend((fromPos, toPos) for toPos in moves)
+
+        twoKings = board.turnArmy() == board.TWOKINGS
+        if twoKings and rnd.random() < 0.05:
+            whirlwinds = [s for s in squares if board._board[s[1]][s[0]].upper() in ('W', 'U')]
+            if whirlwinds:
+                toPos = rnd.choice(whirlwinds)
+                start = time.perf_counter()
+                played = board.addMove(toPos, toPos, secondTurn=board._secondTurn, whirlwind=True)
+                stats.move_time += time.perf_counter() - start
+                stats.move_count += 1
+                if played:
+                    continue
+
+        if board._secondTurn and (not candidates or rnd.random() < 0.3):
+            # the Warrior King skips its second move
+            board.skipSecondTurn()
+            continue
+        if not candidates:
+            return ply
+
+        fromPos, toPos = rnd.choice(candidates)
+        board.setPromotion(rnd.choice("QRNB"))
+        clearLocation = False
+        duel = None
+        if board.getColor(toPos[0], toPos[1]) not in (board.NOCOLOR, board.getTurn()):
+            cost = board.checkDuel(fromPos, toPos)
+            if not (cost is True or cost is False) and rnd.random() < 0.5:
+                attacking_bid, defending_bid, bluff = rnd.choice(board.getDuelBids())
+                clearLocation = defending_bid > attacking_bid
+                duel = (cost, attacking_bid, defending_bid, bluff)
+
+        fen = safeFEN(board)
+        start = time.perf_counter()
+        played = board.addMove(fromPos, toPos, clearLocation=clearLocation, secondTurn=board._secondTurn, duel=duel)
+        stats.move_time += time.perf_counter() - start
+        stats.move_count += 1
+        if not played:
+            stats.refused.append((seed, ply, fen, (fromPos, toPos)))
+            return ply
+    return plies
+
+
+def checkPGN(board, text):
+    # why the PGN text written while board was played doesn't replay to the
+    # same game, or None if it does. A skipped second move at the very end
+    # isn't written, so the turn isn't compared
+    games = list(readGames(io.StringIO(text)))
+    if len(games) != 1:
+        return "{} games read back".format(len(games))
+    replayed, ok = replayGame(games[0])
+    if not ok:
+        return "replay stopped at ply {}: {}".format(len(replayed._moves), replayed.move_reason_list[replayed.getReason()])
+    if replayed.getAllTextMoves(ChessBoard.LAN) != board.getAllTextMoves(ChessBoard.LAN):
+        return "replayed {} of {} moves differently".format(len(replayed._moves), len(board._moves))
+    if replayed.state2str()[:64] != board.state2str()[:64]:
+        return "replayed to a different position"
+    result = board.pgn_result_list[board.getGameResult()]
+    if games[0].result != result or games[0].tags.get("Result") != result:
+        return "result {} (tag {}), not {}".format(games[0].result, games[0].tags.get("Result"), result)
+    return None
+
+
+def checkSamples(paths=SAMPLES):
+    # (file, game number, why) of every game of the PGN files that doesn't
+    # replay in full or ends with another result than its own
+    problems = []
+    for path in paths:
+        for number, game in enumerate(readGames(path), 1):
+            try:
+                board, ok = replayGame(game)
+            except ValueError as e:
+                problems.append((path, number, str(e)))
+                continue
+            if not ok:
+                problems.append((path, number, "replay stopped at ply {}: {}".format(
+                    len(board._moves), board.move_reason_list[board.getReason()])))
+            elif game.result != "*" and board.pgn_result_list[board.getGameResult()] != game.result:
+                problems.append((path, number, "result {}, not {}".format(
+                    board.pgn_result_list[board.getGameResult()], game.result)))
+    return problems
+
+
+def stressPairing(white, black, games=5, plies=200, seed=0, pgn=False):
+    """
+    Plays games random games of at most plies moves between two armies and
+    returns their PairingStats. Exceptions are caught and kept with the seed of
+    the game, the ply and the FEN before it.
+    With pgn=True every game is also written by a PGNWriter following the
+    board (in SAN and LAN in turn), read back and replayed, see checkPGN.
+    """
+    stats = PairingStats(white, black)
+    start = time.perf_counter()
+    for game in range(games):
+        game_seed = gameSeed(seed, white, black, game)
+        rnd = random.Random(game_seed)
+        board = TimedChessBoard(white, black)
+        out = None
+        if pgn:
+            out = io.StringIO()
+            writer = PGNWriter(out, (ChessBoard.SAN, ChessBoard.LAN)[game % 2], flush=False)
+            writer.follow(board, boardTags(board, Event="ChessStress", Round=game_seed))
+        try:
+            playRandomGame(board, rnd, plies, stats, game_seed)
+            if out:
+                writer.endGame()
+                problem = checkPGN(board, out.getvalue())
+                if problem:
+                    stats.pgn_failed.append((game_seed, problem))
+        except Exception:
+            stats.errors.append((game_seed, len(board._moves), safeFEN(board), traceback.format_exc()))
+        stats.games += 1
+        stats.plies += len(board._moves)
+        stats.check_time += board.check_time
+        stats.check_count += board.check_count
+    stats.seconds = time.perf_counter() - start
+    # addMove is timed with its game over check, which is reported by itself
+    stats.move_time -= stats.check_time
+    return stats
+
+
+def mean(total, count):
+    # total / count in milliseconds
+    if not count:
+        return 0.0
+    return total * 1000.0 / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Random game stress test for every pairing of the Chess 2 armies.")
+    parser.add_argument("--games", type=int, default=5, help="games per pairing")
+    parser.add_argument("--plies", type=int, default=200, help="most moves per game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the run")
+    parser.add_argument("-w", "--white", type=parseArmy, help="only this white army, 1-6 or CNERTA")
+    parser.add_argument("-b", "--black", type=parseArmy, help="only this black army, 1-6 or CNERTA")
+    parser.add_argument("--pgn", action="store_true", help="also write every game as PGN, read it back and replay it")
+    args = parser.parse_args(argv)
+
+    whites = [args.white] if args.white else range(1, 7)
+    blacks = [args.black] if args.black else range(1, 7)
+
+    print("{:<10} {:<10} {:>7} {:>8} {:>9} {:>10} {:>9} {:>9} {:>9} {:>7}".format(
+        "White", "Black", "Games", "Plies", "Games/s", "Plies/s", "addMove", "getValid", "gameOver", "Errors"))
+    problems = []
+    for white in whites:
+        for black in blacks:
+            stats = stressPairing(white, black, args.games, args.plies, args.seed, args.pgn)
+            print("{:<10} {:<10} {:>7} {:>8} {:>9.2f} {:>10.1f} {:>7.3f}ms {:>7.3f}ms {:>7.3f}ms {:>7}".format(
+                ChessBoard.army_name_dict[white], ChessBoard.army_name_dict[black],
+                stats.games, stats.plies, stats.games / stats.seconds, stats.plies / stats.seconds,
+                mean(stats.move_time, stats.move_count), mean(stats.valid_time, stats.valid_count),
+                mean(stats.check_time, stats.check_count),
+                len(stats.errors) + len(stats.refused) + len(stats.pgn_failed)))
+            problems.append(stats)
+
+    failed = False
+    for stats in problems:
+        name = "{} vs {}".format(ChessBoard.army_name_dict[stats.white], ChessBoard.army_name_dict[stats.black])
+        for game_seed, ply, fen, trace in stats.errors:
+            failed = True
+            print("")
+            print("{}: exception in game {} at ply {}".format(name, game_seed, ply))
+            print("FEN: {}".format(fen))
+            print(trace.rstrip())
+        for game_seed, ply, fen, move in stats.refused:
+            failed = True
+            print("")
+            print("{}: addMove refused valid move {} in game {} at ply {}".format(name, move, game_seed, ply))
+            print("FEN: {}".format(fen))
+        for game_seed, problem in stats.pgn_failed:
+            failed = True
+            print("")
+            print("{}: the PGN of game {} doesn't replay: {}".format(name, game_seed, problem))
+    if args.pgn:
+        for path, number, problem in checkSamples():
+            failed = True
+            print("")
+            print("{} game {} doesn't replay: {}".format(os.path.basename(path), number, problem))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,88 @@
 #/usr/bin/env python
 
 from ChessBoard import ChessBoard
+from ChessPGN import PGNWriter, boardTags
+import ChessProfile
+import argparse
 import sys
 import getpass
-import time
 import string
 
 
 class ChessClient:
 
+    def askPromotion(self, chess, turn):
+        print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
+        print('Please enter the letter of the piece: QRNB.')
+        while True:
+            promo = input("> ")
+            promo = str(promo.upper())
+            if len(promo) == 1:
+                if any(var in promo for var in ("Q", "R", "N", "B")):
+                    return promo
+            print('Please enter the letter of the piece: QRNB.')
+
+    def askBid(self, stones):
+        while True:
+            bid = getpass.getpass("> ")
+            if bid == "exit":
+                sys.exit(0)
+            elif bid and bid in string.digits and int(bid) <= min(2, stones):
+                return int(bid)
+            print("Please only bid a number of stones between 0 and {}.".format(min(2, stones)))
+
+    def askDuel(self, chess, turn, cost):
+        # returns (attacking bid, defending bid, bluff) or None if the defender declines
+        print("{}, would you like to initiate a duel? It will cost {}.".format(str(chess.value_to_color_dict[not turn]), cost))
+        while True:
+            answer = input("> ")
+            if answer == "exit":
+                sys.exit(0)
+            # Non-Duel initiation
+            elif any(var in answer for var in ('n', 'N', 'No', 'no')):
+                return None
+            # Duel initiation
+            elif any(var in answer for var in ('y', 'Y', 'Yes', 'yes')):
+                break
+            print('Please enter \'yes\' or \'no\'.')
+
+        tmp_white = chess._white_stones
+        tmp_black = chess._black_stones
+        if turn == chess.WHITE:
+            tmp_white = tmp_white + cost
+            tmp_att = tmp_white
+            tmp_def = tmp_black
+        else:
+            tmp_black = tmp_black + cost
+            tmp_att = tmp_black
+            tmp_def = tmp_white
+        print("White stones: {}".format(tmp_white))
+        print("Black stones: {}".format(tmp_black))
+        print("{}, how much would you like to bid?".format(str(chess.value_to_color_dict[not turn])))
+        defending_bid = self.askBid(tmp_def)
+        print("{}, how much would you like to bid?".format(str(chess.value_to_color_dict[turn])))
+        attacking_bid = self.askBid(tmp_att)
+        print("{} bid: {}".format(chess.value_to_color_dict[turn], attacking_bid))
+        print("{} bid: {}".format(chess.value_to_color_dict[not turn], defending_bid))
+
+        if attacking_bid == 0 and defending_bid == 0:
+            print("{} called the bluff! Do you want to gain a stone or force {} to lose a stone?".format(
+                chess.value_to_color_dict[turn], chess.value_to_color_dict[not turn]))
+            while True:
+                bluff_choice = input("> ")
+                if bluff_choice == "exit":
+                    sys.exit(0)
+                elif any(var in bluff_choice for var in ("g", "gain", "G", "Gain")):
+                    return (attacking_bid, defending_bid, "+")
+                elif any(var in bluff_choice for var in ("l", "lose", "L", "Lose")):
+                    return (attacking_bid, defending_bid, "-")
+                print('Please choose between gaining a stone and forcing a lose of a stone.')
+        elif attacking_bid >= defending_bid:
+            print("Attacker wins!")
+        else:
+            print("Defender wins!")
+        return (attacking_bid, defending_bid, None)
+
     def mainLoop(self):
         print("White Player, choose an army:")
         print("1. Classic   2. Nemesis   3. Empowered")
@@ -43,13 +117,9 @@ class ChessClient:
         turn = 0
         chess = ChessBoard(int(wArmy), int(bArmy))
 
-        prototype = []
-        prototype.append('[Event "Sample Games"]')
-        prototype.append('[Site "' + 'Fantasy Strike Website' '\"]')
-        prototype.append('[Date "' + ".".join((time.strftime("%Y"), time.strftime("%m"), time.strftime("%d"))) + '"]')
-        prototype.append('[Round "' + '-' + '"]')
-        prototype.append('[White "' + chess.army_name_dict[int(wArmy)] + '"]')
-        prototype.append('[Black "' + chess.army_name_dict[int(bArmy)] + '"]')
+        # every move is added to san.pgn as it's made
+        pgn = PGNWriter('san.pgn')
+        pgn.follow(chess, boardTags(chess, Event="Sample Games", Site="Fantasy Strike Website"))
 
         while True:
             turn = chess.getTurn()
@@ -70,24 +140,11 @@ class ChessClient:
                 move = input("> ")
                 # Fully quit the program, regardless.
                 if move == "exit":
+                    pgn.close()
                     sys.exit(0)
-                # Save the current game as a pgn file.
+                # The game is saved to san.pgn move by move.
                 elif move == "save":
-                    f = open('san.pgn', 'w')
-                    acc = ""
-                    save = chess.getAllTextMoves(chess.SAN)
-                    for moves in save:
-                        length, w, b = moves
-                        if b is None:
-                            b = ""
-                        acc = acc + "{}. {} {} ".format(length, w, b)
-                    pgn_details = prototype
-                    pgn_details.append('[Result "' + chess.pgn_result_list[chess.getGameResult()] + '"]')
-                    pgn_details.append('')
-                    pgn_details.append(acc.rstrip())
-                    for x in pgn_details:
-                        f.write(str(x) + '\n')
-                    f.close()
+                    print("The game is saved in san.pgn.")
                 elif any(var in move for var in ("SAN", "san")):
                     san = chess.getAllTextMoves(chess.SAN)
                     if san:
@@ -110,6 +167,10 @@ class ChessClient:
                     print(chess.getFEN())
                 elif move == "set":
                     chess.setFEN(input("Paste FEN: "))
+                    # the moves from here on are a new game from that position
+                    pgn.endGame("*")
+                    pgn.follow(chess, boardTags(chess, Event="Sample Games", Site="Fantasy Strike Website",
+                                                SetUp="1", FEN=chess.getFEN()))
                 elif move == "get": # Displaying available moves for a given space.
                     getter = input("> ")
                     print(str(getter))
@@ -125,6 +186,7 @@ class ChessClient:
                         while True:
                             location = input("> ")
                             if location == "exit":
+                                pgn.close()
                                 sys.exit(0)
                             elif len(location) != 2:
                                 print("Please only enter the square.")
@@ -138,276 +200,42 @@ class ChessClient:
                         print("You're not playing Two Kings!")
                 elif any(var in move for var in ("decline", "Decline", "skip", "s", "Skip", "S")):
                     if curArmy == chess.TWOKINGS:
-                        if chess._secondTurn:
+                        if chess.skipSecondTurn():
                             print("Second turn skipped.")
-                            chess._secondTurn = False
-                            if chess._turn == chess.BLACK:
-                                chess._turn = chess.WHITE
-                            else:
-                                chess._turn = chess.BLACK
                             turn = chess.getTurn()
                     else:
                         print("You're not playing Two Kings!")
                 else:
-                    res = chess.checkTextMove(move)
-                    # True: a correctly entered move
-                    if res is True:
-                        result = chess.addTextMove(move, secondTurn=chess._secondTurn)
-                        if result:
+                    prepared = chess.prepareTextMove(move)
+                    # None: The move couldn't be parsed or is ambiguous or wrong
+                    if prepared is None:
+                        print("{}".format(chess.move_reason_list[chess.getReason()]))
+                    else:
+                        duel = None
+                        # TIME TO DU-DU-DU-DUEL
+                        if prepared.duel:
+                            duel = self.askDuel(chess, turn, prepared.cost)
+                        promotion = None
+                        if prepared.promotion and not prepared.promotionPiece:
+                            promotion = self.askPromotion(chess, turn)
+                        if chess.commitMove(prepared, duel=duel, promotion=promotion):
                             turn = chess.getTurn()
                             chess.updateRoyalLocations()
-                        elif chess.getReason() == chess.MUST_SET_PROMOTION:
-                            print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
-                            print('Please enter the letter of the piece: QRNB.')
-                            while True:
-                                promo = input("> ")
-                                promo = str(promo.upper())
-                                if len(promo) == 1:
-                                    if any(var in promo for var in ("Q", "R", "N", "B")):
-                                        break
-                                    print('Please enter the letter of the piece: QRNB.')
-                                print('Please enter the letter of the piece: QRNB.')
-                            result = chess.addTextMove(move+promo, secondTurn=chess._secondTurn)
-                            if result:
-                                turn = chess.getTurn()
-                                chess.updateRoyalLocations()
-                            else:
-                                print("{}".format(chess.move_reason_list[chess.getReason()]))
                         else:
                             print("{}".format(chess.move_reason_list[chess.getReason()]))
-                    # False: The move couldn't be parsed or is ambiguous or wrong
-                    elif res is False:
-                        print("{}".format(chess.move_reason_list[chess.getReason()]))
-                    # Other: TIME TO DU-DU-DU-DUEL
-                    else:
-                        print("{}, would you like to initiate a duel? It will cost {}.".format(str(chess.value_to_color_dict[not turn]), res))
-                        tmp_white = chess._white_stones
-                        tmp_black = chess._black_stones
-                        duel_cost = None
-                        while True:
-                            answer = input("> ")
-                            if answer == "exit":
-                                sys.exit(0)
-                            # Duel initiation
-                            elif any(var in answer for var in ('y', 'Y', 'Yes', 'yes')):
-                                duel_cost = res
-                                if turn == chess.WHITE:
-                                    tmp_white = tmp_white + res
-                                    tmp_att = tmp_white
-                                    tmp_def = tmp_black
-                                else:
-                                    tmp_black = tmp_black + res
-                                    tmp_att = tmp_black
-                                    tmp_def = tmp_white
-                                print("White stones: {}".format(tmp_white))
-                                print("Black stones: {}".format(tmp_black))
-                                print("{}, how much would you like to bid?".format(str(chess.value_to_color_dict[not turn])))
-                                # Defender Bid
-                                while True:
-                                    defending_bid = getpass.getpass("> ")
-                                    if defending_bid == "exit":
-                                        sys.exit(0)
-                                    elif defending_bid in string.digits:
-                                        if int(defending_bid) <= min(2, tmp_def):
-                                            if int(defending_bid) > -1:
-                                                defending_bid = int(defending_bid)
-                                                break
-                                            print("Please only bid a number of stones between 0 and {}.".format(min(2, tmp_def)))
-                                        print("Please only bid a number of stones between 0 and {}.".format(min(2, tmp_def)))
-                                    else:
-                                        print("Please only bid a number of stones between 0 and {}.".format(min(2, tmp_def)))
-                                print("{}, how much would you like to bid?".format(str(chess.value_to_color_dict[turn])))
-                                # Attacker Bid
-                                while True:
-                                    attacking_bid = getpass.getpass("> ")
-                                    if attacking_bid == "exit":
-                                        sys.exit(0)
-                                    elif attacking_bid in string.digits:
-                                        if int(attacking_bid) <= min(2, tmp_att):
-                                            if int(attacking_bid) > -1:
-                                                attacking_bid = int(attacking_bid)
-                                                break
-                                            print("Please only bid a number of stones between 0 and {}.".format(min(2, tmp_att)))
-                                        print("Please only bid a number of stones between 0 and {}.".format(min(2, tmp_att)))
-                                    else:
-                                        print("Please only bid a number of stones between 0 and {}.".format(min(2, tmp_att)))
-                                if attacking_bid == 0 and defending_bid == 0:
-                                    duel_results = chess.BLUFF
-                                elif attacking_bid >= defending_bid:
-                                    duel_results = chess.ATT_WIN
-                                else:
-                                    duel_results = chess.DEF_WIN
-                                # duel_results will now be either 0, 1, or 2
-                                print("{} bid: {}".format(chess.value_to_color_dict[turn], attacking_bid))
-                                print("{} bid: {}".format(chess.value_to_color_dict[not turn], defending_bid))
-                                if duel_results == chess.BLUFF:
-                                    print("{} called the bluff! Do you want to gain a stone or force {} to lose a stone?".format(
-                                        chess.value_to_color_dict[turn], chess.value_to_color_dict[not turn]))
-                                    while True:
-                                        bluff_choice = input("> ")
-                                        if bluff_choice == "exit":
-                                            sys.exit(0)
-                                        elif any(var in bluff_choice for var in ("g", "gain", "G", "Gain")):
-                                            att_result = chess.addTextMove(move, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "g")
-                                            if att_result:
-                                                turn = chess.getTurn()
-                                                chess.updateRoyalLocations()
-                                                break
-                                            elif chess.getReason() == chess.MUST_SET_PROMOTION:
-                                                print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
-                                                print('Please enter the letter of the piece: QRNB.')
-                                                while True:
-                                                    promo = input("> ")
-                                                    promo = str(promo.upper())
-                                                    if len(promo) == 1:
-                                                        if any(var in promo for var in ("Q", "R", "N", "B")):
-                                                            break
-                                                        print('Please enter the letter of the piece: QRNB.')
-                                                    print('Please enter the letter of the piece: QRNB.')
-                                                att_result = chess.addTextMove(move+promo, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "g")
-                                                if att_result:
-                                                    turn = chess.getTurn()
-                                                    chess.updateRoyalLocations()
-                                                else:
-                                                    print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                                    break
-                                            else:
-                                                print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                                break
-                                        elif any(var in bluff_choice for var in ("l", "lose", "L", "Lose")):
-                                            att_result = chess.addTextMove(move, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "l")
-                                            if att_result:
-                                                turn = chess.getTurn()
-                                                chess.updateRoyalLocations()
-                                                break
-                                            elif chess.getReason() == chess.MUST_SET_PROMOTION:
-                                                print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
-                                                print('Please enter the letter of the piece: QRNB.')
-                                                while True:
-                                                    promo = input("> ")
-                                                    promo = str(promo.upper())
-                                                    if len(promo) == 1:
-                                                        if any(var in promo for var in ("Q", "R", "N", "B")):
-                                                            break
-                                                        print('Please enter the letter of the piece: QRNB.')
-                                                    print('Please enter the letter of the piece: QRNB.')
-                                                att_result = chess.addTextMove(move+promo, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "l")
-                                                if att_result:
-                                                    turn = chess.getTurn()
-                                                    chess.updateRoyalLocations()
-                                                else:
-                                                    print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                                    break
-                                            else:
-                                                print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                                break
-                                        else:
-                                            print('Please choose between gaining a stone and forcing a lose of a stone.')
-                                elif duel_results == chess.ATT_WIN:
-                                    print("Attacker wins!")
-                                    att_result = chess.addTextMove(move, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "n")
-                                    if att_result:
-                                        turn = chess.getTurn()
-                                        chess.updateRoyalLocations()
-                                    elif chess.getReason() == chess.MUST_SET_PROMOTION:
-                                        print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
-                                        print('Please enter the letter of the piece: QRNB.')
-                                        while True:
-                                            promo = input("> ")
-                                            promo = str(promo.upper())
-                                            if len(promo) == 1:
-                                                if any(var in promo for var in ("Q", "R", "N", "B")):
-                                                    break
-                                                print('Please enter the letter of the piece: QRNB.')
-                                            print('Please enter the letter of the piece: QRNB.')
-                                        att_result = chess.addTextMove(move+promo, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "n")
-                                        if att_result:
-                                            turn = chess.getTurn()
-                                            chess.updateRoyalLocations()
-                                        else:
-                                            print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                    else:
-                                        print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                else:
-                                    print("Defender wins!")
-                                    att_result = chess.addTextMove(move, secondTurn=chess._secondTurn, clearLocation=True, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "n")
-                                    if att_result:
-                                        turn = chess.getTurn()
-                                        chess.updateRoyalLocations()
-                                    elif chess.getReason() == chess.MUST_SET_PROMOTION:
-                                        print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
-                                        print('Please enter the letter of the piece: QRNB.')
-                                        while True:
-                                            promo = input("> ")
-                                            promo = str(promo.upper())
-                                            if len(promo) == 1:
-                                                if any(var in promo for var in ("Q", "R", "N", "B")):
-                                                    break
-                                                print('Please enter the letter of the piece: QRNB.')
-                                            print('Please enter the letter of the piece: QRNB.')
-                                        att_result = chess.addTextMove(move+promo, secondTurn=chess._secondTurn, duel=str(duel_cost) + str(attacking_bid) + str(defending_bid) + "n")
-                                        if att_result:
-                                            turn = chess.getTurn()
-                                            chess.updateRoyalLocations()
-                                        else:
-                                            print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                    else:
-                                        print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                turn = chess.getTurn()
-                                break
-                            # Non-Duel initiation
-                            elif any(var in answer for var in ('n', 'N', 'No', 'no')):
-                                result = chess.addTextMove(move, secondTurn=chess._secondTurn)
-                                if result:
-                                    turn = chess.getTurn()
-                                    chess.updateRoyalLocations()
-                                elif chess.getReason() == chess.MUST_SET_PROMOTION:
-                                    print("{}, what do you want to promote to?".format(chess.value_to_color_dict[turn]))
-                                    print('Please enter the letter of the piece: QRNB.')
-                                    while True:
-                                        promo = input("> ")
-                                        promo = str(promo.upper())
-                                        if len(promo) == 1:
-                                            if any(var in promo for var in ("Q", "R", "N", "B")):
-                                                break
-                                            print('Please enter the letter of the piece: QRNB.')
-                                        print('Please enter the letter of the piece: QRNB.')
-                                    result = chess.addTextMove(move+promo, secondTurn=chess._secondTurn)
-                                    if result:
-                                        turn = chess.getTurn()
-                                        chess.updateRoyalLocations()
-                                    else:
-                                        print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                else:
-                                    print("{}".format(chess.move_reason_list[chess.getReason()]))
-                                break
-                            else:
-                                print('Please enter \'yes\' or \'no\'.')
-                            break
             else:
                 break
-        f = open('san.pgn', 'w')
-        acc = ""
-        save = chess.getAllTextMoves(chess.SAN)
-        for moves in save:
-            length, w, b = moves
-            if b is None:
-                b = ""
-            acc = acc + "{}. {} {} ".format(length, w, b)
-        acc = acc + chess.pgn_result_list[chess.getGameResult()]
-        pgn_details = prototype
-        pgn_details.append('[Result "' + chess.pgn_result_list[chess.getGameResult()] + '"]')
-        pgn_details.append('')
-        pgn_details.append(acc.rstrip())
-        for x in pgn_details:
-            f.write(str(x) + '\n')
-        f.close()
+        pgn.endGame()
+        pgn.close()
         print("Game over! {}".format(chess.game_result_list[chess.getGameResult()]))
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Play Chess 2 in the terminal.")
+    ChessProfile.addProfileArguments(parser, "ChessText")
+    args = parser.parse_args()
     g = ChessClient()
-    g.mainLoop()
+    ChessProfile.runSession(g.mainLoop, args)
 
 # this calls the 'main' function when this script is executed
 if __name__ == '__main__':
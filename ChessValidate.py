@@ -0,0 +1,216 @@
+﻿#/usr/bin/env python
+
+#####################################################################
+# ChessValidate is part of ChessBoard2 by Noah Bogart - http://twitter.com/NoahTheDuke
+# It's released under the Gnu Public Licence (GPL)
+# Have fun!
+#####################################################################
+
+# Replays every game of a directory of Chess 2 PGN files with ChessBoard,
+# in as many processes as there are CPUs, and reports the illegal moves and
+# the games whose result isn't the one ChessBoard finds, as they come in.
+#
+#   python ChessValidate.py archive/
+#   python ChessValidate.py archive/ games.pgn --jobs 8 --batch 100
+
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from ChessBoard import ChessBoard
+from ChessPGN import gameArmies, readGames, replayGame
+
+# A game that didn't replay as its PGN says: its file, its index in the file
+# (from 1), its armies, the move ChessBoard refused ("" if none) and why, and
+# the result of the PGN and of the board
+GameProblem = namedtuple('GameProblem', 'path index white black move reason expected result')
+
+
+class WorkerStats:
+    # what one process did, see validateBatch
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.batches = 0
+        self.games = 0
+        self.plies = 0
+        self.seconds = 0.0
+
+
+def findPGNFiles(paths):
+    # the .pgn files of the given files and directories, sorted
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.lower().endswith(".pgn"))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def readBatches(files, size):
+    # (path, index of the first game from 1, games) of up to size games at a time
+    for path in files:
+        batch = []
+        first = 1
+        for index, game in enumerate(readGames(path), 1):
+            if not batch:
+                first = index
+            batch.append(game)
+            if len(batch) == size:
+                yield path, first, batch
+                batch = []
+        if batch:
+            yield path, first, batch
+
+
+def moveLabel(move):
+    # a PGNMove with its number, "12. Bb3" or "12... Bb3"
+    dots = ". " if move.color == ChessBoard.WHITE else "... "
+    return "{}{}{}".format(move.number, dots, move.text)
+
+
+def checkGame(path, index, game, trusted=False):
+    # (plies, GameProblem or None) of one game
+    white, black = gameArmies(game)
+    expected = game.result
+    if expected == "*":
+        expected = game.tags.get("Result", "*")
+    try:
+        board, ok = replayGame(game, trusted)
+    except Exception as e:
+        return 0, GameProblem(path, index, white, black, "", "{}: {}".format(type(e).__name__, e), expected, "*")
+    plies = len(board._moves)
+    result = board.pgn_result_list[board.getGameResult()]
+    if not ok:
+        move = ""
+        if plies < len(game.moves):
+            move = moveLabel(game.moves[plies])
+        return plies, GameProblem(path, index, white, black, move, board.move_reason_list[board.getReason()],
+                                  expected, result)
+    if expected != "*" and expected != result:
+        return plies, GameProblem(path, index, white, black, "", "", expected, result)
+    return plies, None
+
+
+def validateBatch(path, first, games, trusted=False):
+    """
+    Replays a batch of games of a file and returns (WorkerStats of the batch,
+    GameProblems). Runs in the worker processes.
+    """
+    stats = WorkerStats(os.getpid())
+    problems = []
+    start = time.perf_counter()
+    for index, game in enumerate(games, first):
+        plies, problem = checkGame(path, index, game, trusted)
+        stats.plies += plies
+        if problem:
+            problems.append(problem)
+    stats.seconds = time.perf_counter() - start
+    stats.batches = 1
+    stats.games = len(games)
+    return stats, problems
+
+
+def formatProblem(problem):
+    # one line about a GameProblem
+    name = "{} game {} ({} vs {})".format(problem.path, problem.index, ChessBoard.army_name_dict.get(problem.white, "?"),
+                                          ChessBoard.army_name_dict.get(problem.black, "?"))
+    if problem.reason:
+        if problem.move:
+            return "{}: illegal move {}: {}".format(name, problem.move, problem.reason)
+        return "{}: {}".format(name, problem.reason)
+    return "{}: result {} in the PGN, {} on the board".format(name, problem.expected, problem.result)
+
+
+def validateFiles(files, jobs=None, batch=50, trusted=False, report=None):
+    """
+    Replays every game of files in jobs processes (default one per CPU), batch
+    games at a time, and calls report(WorkerStats, GameProblems) for every batch
+    as it's done. Returns a dict of pid -> WorkerStats of all the batches.
+    Only about two batches per process are read ahead, however big the files.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    workers = {}
+
+    def done(stats, problems):
+        total = workers.setdefault(stats.pid, WorkerStats(stats.pid))
+        total.batches += stats.batches
+        total.games += stats.games
+        total.plies += stats.plies
+        total.seconds += stats.seconds
+        if report:
+            report(stats, problems)
+
+    if jobs < 2:
+        for path, first, games in readBatches(files, batch):
+            done(*validateBatch(path, first, games, trusted))
+        return workers
+
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = set()
+        for path, first, games in readBatches(files, batch):
+            pending.add(pool.submit(validateBatch, path, first, games, trusted))
+            if len(pending) >= jobs * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done(*future.result())
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done(*future.result())
+    return workers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replays Chess 2 PGN files with ChessBoard and reports what doesn't replay.")
+    parser.add_argument("paths", nargs="+", help="PGN files, or directories to search for them")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="processes to replay in, 0 for one per CPU")
+    parser.add_argument("--batch", type=int, default=50, help="games sent to a process at a time")
+    parser.add_argument("--trusted", action="store_true",
+                        help="take the moves as legal and only check the end, see ChessBoard.replay")
+    args = parser.parse_args(argv)
+
+    files = findPGNFiles(args.paths)
+    if not files:
+        print("No PGN files found.")
+        return 1
+
+    counts = {"games": 0, "illegal": 0, "results": 0}
+    start = time.perf_counter()
+
+    def report(stats, problems):
+        counts["games"] += stats.games
+        for problem in problems:
+            if problem.reason:
+                counts["illegal"] += 1
+            else:
+                counts["results"] += 1
+            print(formatProblem(problem))
+        sys.stdout.flush()
+
+    workers = validateFiles(files, args.jobs or None, args.batch, args.trusted, report)
+    seconds = time.perf_counter() - start
+
+    games = counts["games"]
+    plies = sum(w.plies for w in workers.values())
+    print("")
+    print("{} games, {} plies in {} files: {} illegal, {} wrong results".format(
+        games, plies, len(files), counts["illegal"], counts["results"]))
+    print("{:.3f}s, {:.1f} games/s, {:.0f} plies/s".format(
+        seconds, games / seconds if seconds else 0, plies / seconds if seconds else 0))
+    print("")
+    print("{:>8} {:>8} {:>8} {:>10} {:>10} {:>9}".format("Worker", "Batches", "Games", "Plies", "Busy", "Games/s"))
+    for pid, stats in sorted(workers.items()):
+        print("{:>8} {:>8} {:>8} {:>10} {:>9.3f}s {:>9.1f}".format(
+            pid, stats.batches, stats.games, stats.plies, stats.seconds,
+            stats.games / stats.seconds if stats.seconds else 0))
+    return 1 if counts["illegal"] or counts["results"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
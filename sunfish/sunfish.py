@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
+import os
 import sys
 from itertools import count
 from collections import Counter, OrderedDict, namedtuple
@@ -732,6 +733,29 @@ Entry = namedtuple('Entry', 'depth score gamma move')
 tp = OrderedDict()
 
 
+def tableMemoryUsage(table=None):
+    """ returns (entries, bytes) of the transposition table, tp by default.
+        The bytes are the table, its positions and entries by sys.getsizeof,
+        with the objects they share, like the scores, counted once. """
+    if table is None:
+        table = tp
+    seen = set()
+    size = 0
+    todo = [table]
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, (tuple, list)):
+            todo.extend(obj)
+    return len(table), size
+
+
 ###############################################################################
 # Search logic
 ###############################################################################
@@ -887,6 +911,39 @@ def render(i):
     return chr(fil + ord('a')) + str(-rank + 1)
 
 
+def initialPosition(wArmy, bArmy):
+    """ returns the starting position of the two armies, white to move """
+    army_name_dict = {
+        1: ('RNBQKBNR', 'P' * 8),
+        2: ('RNBMCBNR', 'L' * 8),
+        3: ('ZYXOCXYZ', 'P' * 8),
+        4: ('GNBACBNG', 'P' * 8),
+        5: ('RNBUWBNR', 'P' * 8),
+        6: ('EHTJCTHE', 'P' * 8)}
+
+    blackArmy = str(army_name_dict[bArmy][0][::-1].lower())
+    blackPawns = str(army_name_dict[bArmy][1].lower())
+    whiteArmy = str(army_name_dict[wArmy][0])
+    whitePawns = str(army_name_dict[wArmy][1])
+
+    initial = (
+        '         \n'  #   0 -  9
+        '         \n'  #  10 - 19
+        ' '+blackArmy+'\n'  #  20 - 29
+        ' '+blackPawns+'\n'  #  30 - 39
+        ' ........\n'  #  40 - 49
+        ' ........\n'  #  50 - 59
+        ' ........\n'  #  60 - 69
+        ' ........\n'  #  70 - 79
+        ' '+whitePawns+'\n'  #  80 - 89
+        ' '+whiteArmy+'\n'  #  90 - 99
+        '         \n'  # 100 -109
+        '          '   # 110 -119
+    )
+
+    return Position(initial, 0, False, 0, wArmy, bArmy, 3, 3, (True,True), (True,True), 0, 0)
+
+
 def main():
 
     print("White Player, choose an army:")
@@ -919,35 +976,7 @@ def main():
             print('Please enter only one of the above.')
     bArmy = int(userInput)
 
-    army_name_dict = {
-        1: ('RNBQKBNR', 'P' * 8),
-        2: ('RNBMCBNR', 'L' * 8),
-        3: ('ZYXOCXYZ', 'P' * 8),
-        4: ('GNBACBNG', 'P' * 8),
-        5: ('RNBUWBNR', 'P' * 8),
-        6: ('EHTJCTHE', 'P' * 8)}
-
-    blackArmy = str(army_name_dict[bArmy][0][::-1].lower())
-    blackPawns = str(army_name_dict[bArmy][1].lower())
-    whiteArmy = str(army_name_dict[wArmy][0])
-    whitePawns = str(army_name_dict[wArmy][1])
-
-    initial = (
-        '         \n'  #   0 -  9
-        '         \n'  #  10 - 19
-        ' '+blackArmy+'\n'  #  20 - 29
-        ' '+blackPawns+'\n'  #  30 - 39
-        ' ........\n'  #  40 - 49
-        ' ........\n'  #  50 - 59
-        ' ........\n'  #  60 - 69
-        ' ........\n'  #  70 - 79
-        ' '+whitePawns+'\n'  #  80 - 89
-        ' '+whiteArmy+'\n'  #  90 - 99
-        '         \n'  # 100 -109
-        '          '   # 110 -119
-    )
-
-    pos = Position(initial, 0, False, 0, wArmy, bArmy, 3, 3, (True,True), (True,True), 0, 0)
+    pos = initialPosition(wArmy, bArmy)
     while True:
         # We add some spaces to the board before we print it.
         # That makes it more readable and pleasing.
@@ -1024,5 +1053,16 @@ def main():
             break
 
 
+def runMain(main):
+    # runs main, profiled with ChessProfile when SUNFISH_PROFILE names the
+    # files to write, and only sampled when SUNFISH_PROFILE_SAMPLE is set too
+    prefix = os.environ.get('SUNFISH_PROFILE')
+    if not prefix:
+        return main()
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+    import ChessProfile
+    return ChessProfile.profileCall(main, prefix, not os.environ.get('SUNFISH_PROFILE_SAMPLE'))
+
+
 if __name__ == '__main__':
-    main()
+    runMain(main)
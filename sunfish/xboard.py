@@ -238,4 +238,4 @@ def main():
             print("Error (unkown command):", smove)
 
 if __name__ == '__main__':
-    main()
+    sunfish.runMain(main)